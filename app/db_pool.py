@@ -0,0 +1,71 @@
+"""
+SQLite kapcsolatkészlet: szálanként egy, egyszer megnyitott és beállított kapcsolat.
+
+A kapcsolatok élettartama alatt a sqlite3 modul előkészített utasítás-gyorsítótára
+(cached_statements) is megmarad, így az állandó SQL-szövegű gyakori lekérdezések
+(beszúrás, slug-keresés, dolgozókeresés) nem fordítódnak újra minden kérésnél.
+WAL módban az admin olvasások nem blokkolják a form beszúrásait (és fordítva).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List
+
+
+class SQLitePool:
+    def __init__(self, path: Path, *, mmap_size: int = 64 * 1024 * 1024, cache_size_kib: int = 16384,
+                 busy_timeout_ms: int = 5000, cached_statements: int = 256):
+        self.path = Path(path)
+        self.mmap_size = int(mmap_size)
+        self.cache_size_kib = int(cache_size_kib)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.cached_statements = int(cached_statements)
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.opened = 0
+
+    def _open(self) -> sqlite3.Connection:
+        c = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0,
+                            cached_statements=self.cached_statements, check_same_thread=False)
+        c.row_factory = sqlite3.Row
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        c.execute(f"PRAGMA cache_size=-{self.cache_size_kib}")
+        c.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        c.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._all.append(c)
+            self.opened += 1
+        return c
+
+    def connection(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None or getattr(self._local, "generation", -1) != self._generation:
+            c = self._local.conn = self._open()
+            self._local.generation = self._generation
+        return c
+
+    def checkpoint(self) -> None:
+        """A WAL tartalmát visszaírja a fő fájlba (teljes fájlos másolás előtt kell)."""
+        self.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close_all(self) -> None:
+        """Minden kapcsolat lezárása (leállításkor vagy a DB-fájl cseréje előtt)."""
+        with self._lock:
+            conns, self._all = self._all, []
+            self._generation += 1
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open_connections": len(self._all), "opened_total": self.opened}
@@ -0,0 +1,295 @@
+"""
+Inkrementális app.db-replikáció a Drive-ra.
+
+A teljes adatbázis újrafeltöltése helyett:
+  * a replikált táblák (alapértelmezés: minden felhasználói tábla, lásd replicated_tables)
+    minden INSERT/UPDATE/DELETE-je triggerrel a repl_log táblába kerül
+    (seq, tábla, művelet, sor JSON-ban);
+  * szinkronkor a még nem szállított naplósorok egy kis, gzipelt JSON-lines szegmensbe kerülnek
+    ("app.db.seg.<from>-<to>.jsonl.gz") – a feltöltött bájtok száma a változással arányos,
+    nem az adatbázis méretével;
+  * minden DB_SNAPSHOT_EVERY szegmens után tömörített pillanatkép ("app.db.snapshot",
+    VACUUM INTO), a régi szegmensek ezután törölhetők;
+  * induláskor: pillanatkép letöltése + az utána következő szegmensek visszajátszása.
+
+A visszajátszás idempotens (INSERT OR REPLACE / DELETE rowid szerint, csak seq > aktuális),
+így egy kétszer feltöltött szegmens sem okoz gondot.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+SEGMENT_RE = re.compile(r"\.seg\.(\d+)-(\d+)\.jsonl\.gz$")
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# belső/származtatott táblák: a sémával együtt újra létrejönnek, nem kell őket naplózni
+NOT_REPLICATED = {"repl_log", "repl_meta", "schema_meta"}
+
+
+def replicated_tables(c: sqlite3.Connection) -> List[str]:
+    """
+    Minden felhasználói tábla, kivéve a sqlite_*, a napló/meta táblákat, a virtuális (FTS)
+    táblákat és azok árnyéktábláit – az FTS-indexet a forrástábla triggerei visszajátszáskor is építik.
+    """
+    rows = c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'").fetchall()
+    virtual = [r[0] for r in rows if (r[1] or "").upper().startswith("CREATE VIRTUAL TABLE")]
+    return sorted(
+        name for name, _ in rows
+        if not name.startswith("sqlite_") and name not in NOT_REPLICATED and name not in virtual
+        and not any(name.startswith(v + "_") for v in virtual)
+    )
+
+
+def ensure_replication_schema(c: sqlite3.Connection, tables: Optional[Iterable[str]] = None) -> None:
+    """
+    Naplótábla + triggerek; a triggereket minden induláskor újraépítjük (oszlopváltozás esetére).
+    tables=None: replicated_tables(). Ha a replikált táblák köre megváltozott, a következő
+    szinkron új pillanatképpel indul (a korábban nem naplózott táblák tartalma is átkerül).
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS repl_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_json TEXT
+        )
+    """)
+    c.execute("CREATE TABLE IF NOT EXISTS repl_meta (k TEXT PRIMARY KEY, v TEXT)")
+    tables = sorted(replicated_tables(c) if tables is None else tables)
+    crc = zlib.crc32(",".join(tables).encode("utf-8"))
+    if _meta_get(c, "tables_crc", -1) != crc:
+        _meta_set(c, "tables_crc", crc)
+        _meta_set(c, "snapshot_seq", -1)
+    for (tname,) in c.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'repl_%'").fetchall():
+        c.execute(f"DROP TRIGGER {_q(tname)}")
+    for tbl in tables:
+        cols = [r[1] for r in c.execute(f"PRAGMA table_info({_q(tbl)})").fetchall()]
+        if not cols:
+            continue
+        obj = lambda ref: "json_object(" + ", ".join(f"'{col}', {ref}.{_q(col)}" for col in cols) + ")"
+        c.execute(f"""CREATE TRIGGER {_q(f'repl_{tbl}_insert')} AFTER INSERT ON {_q(tbl)} BEGIN
+            INSERT INTO repl_log (tbl, op, row_id, row_json) VALUES ('{tbl}', 'U', NEW.rowid, {obj('NEW')}); END""")
+        c.execute(f"""CREATE TRIGGER {_q(f'repl_{tbl}_update')} AFTER UPDATE ON {_q(tbl)} BEGIN
+            INSERT INTO repl_log (tbl, op, row_id, row_json) VALUES ('{tbl}', 'U', NEW.rowid, {obj('NEW')}); END""")
+        c.execute(f"""CREATE TRIGGER {_q(f'repl_{tbl}_delete')} AFTER DELETE ON {_q(tbl)} BEGIN
+            INSERT INTO repl_log (tbl, op, row_id, row_json) VALUES ('{tbl}', 'D', OLD.rowid, NULL); END""")
+
+
+def remove_wal_files(db_path: Path) -> None:
+    """A fő fájl cseréje előtt: egy régi -wal/-shm a friss fájlra alkalmazva elrontaná azt."""
+    for suffix in ("-wal", "-shm"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+
+
+def _meta_get(c: sqlite3.Connection, k: str, default: int = 0) -> int:
+    try:
+        row = c.execute("SELECT v FROM repl_meta WHERE k = ?", (k,)).fetchone()
+    except sqlite3.OperationalError:
+        return default
+    return int(row[0]) if row and row[0] is not None else default
+
+
+def _meta_set(c: sqlite3.Connection, k: str, v: int) -> None:
+    c.execute("INSERT OR REPLACE INTO repl_meta (k, v) VALUES (?, ?)", (k, str(v)))
+
+
+def _apply_entry(c: sqlite3.Connection, e: dict) -> None:
+    tbl = e["t"]
+    if e["op"] == "D":
+        c.execute(f"DELETE FROM {_q(tbl)} WHERE rowid = ?", (e["rowid"],))
+        return
+    row = e["row"]
+    cols = list(row.keys())
+    c.execute(
+        f"INSERT OR REPLACE INTO {_q(tbl)} ({', '.join(_q(x) for x in cols)}) VALUES ({', '.join('?' * len(cols))})",
+        [row[x] for x in cols],
+    )
+
+
+class DbReplicator:
+    """
+    A Drive-műveleteket függvényként kapja (main.py drive_* helperei), így a helyi
+    LocalDriveService-szel és a valódi klienssel is ugyanígy működik.
+    """
+
+    def __init__(self, db_path: Path, name: str, *,
+                 upload: Callable[[str, bytes, Optional[str]], Optional[str]],
+                 list_files: Callable[[str], List[Tuple[str, str]]],
+                 download: Callable[[str], Optional[bytes]],
+                 delete: Callable[[str], bool],
+                 snapshot_every: int = 100):
+        self.db_path = Path(db_path)
+        self.name = name
+        self.snapshot_name = f"{name}.snapshot"
+        self._upload = upload
+        self._list = list_files
+        self._download = download
+        self._delete = delete
+        self.snapshot_every = max(1, int(snapshot_every))
+        self.snapshot_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self.bytes_uploaded = 0
+        self.segments_uploaded = 0
+        self.snapshots_uploaded = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        c = sqlite3.connect(self.db_path, timeout=30)
+        c.row_factory = sqlite3.Row
+        return c
+
+    def _segment_name(self, first: int, last: int) -> str:
+        return f"{self.name}.seg.{first:012d}-{last:012d}.jsonl.gz"
+
+    # --- feltöltés ---
+    def sync(self) -> Optional[str]:
+        """Szállítja a még nem feltöltött változásokat; szükség esetén pillanatképet is készít."""
+        with self._lock:
+            with self._conn() as c:
+                shipped = _meta_get(c, "shipped_seq")
+                rows = c.execute(
+                    "SELECT seq, tbl, op, row_id, row_json FROM repl_log WHERE seq > ? ORDER BY seq", (shipped,)
+                ).fetchall()
+                since_snap = _meta_get(c, "segments_since_snapshot")
+                has_snapshot = _meta_get(c, "snapshot_seq", -1) >= 0
+            if rows:
+                first, last = rows[0]["seq"], rows[-1]["seq"]
+                lines = []
+                for r in rows:
+                    e = {"seq": r["seq"], "t": r["tbl"], "op": r["op"], "rowid": r["row_id"]}
+                    if r["op"] != "D":
+                        e["row"] = json.loads(r["row_json"])
+                    lines.append(json.dumps(e, ensure_ascii=False, separators=(",", ":")))
+                blob = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), mtime=0)
+                if not self._upload(self._segment_name(first, last), blob, None):
+                    return None
+                self.bytes_uploaded += len(blob)
+                self.segments_uploaded += 1
+                with self._conn() as c:
+                    _meta_set(c, "shipped_seq", last)
+                    _meta_set(c, "segments_since_snapshot", since_snap + 1)
+                    c.execute("DELETE FROM repl_log WHERE seq <= ?", (last,))
+                since_snap += 1
+                print(f"DB replication: segment {first}-{last} ({len(rows)} changes, {len(blob)} bytes)")
+            if not has_snapshot or since_snap >= self.snapshot_every:
+                return self._snapshot()
+            return self.snapshot_id or self._find_snapshot_id() or "ok"
+
+    def _find_snapshot_id(self) -> Optional[str]:
+        for fid, fname in self._list(self.snapshot_name):
+            if fname == self.snapshot_name:
+                self.snapshot_id = fid
+                return fid
+        return None
+
+    def _snapshot(self) -> Optional[str]:
+        with self._conn() as c:
+            seq = _meta_get(c, "shipped_seq")
+            _meta_set(c, "snapshot_seq", seq)
+            _meta_set(c, "segments_since_snapshot", 0)
+        fd, tmp = tempfile.mkstemp(prefix="snapshot-", suffix=".db", dir=str(self.db_path.parent))
+        os.close(fd); os.unlink(tmp)
+        try:
+            c = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                c.execute("VACUUM INTO ?", (tmp,))
+            finally:
+                c.close()
+            data = gzip.compress(Path(tmp).read_bytes(), mtime=0)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        existing = self.snapshot_id or self._find_snapshot_id()
+        new_id = self._upload(self.snapshot_name, data, existing)
+        if not new_id:
+            with self._conn() as c:
+                _meta_set(c, "segments_since_snapshot", self.snapshot_every)   # következő körben újra
+            return None
+        self.snapshot_id = new_id
+        self.bytes_uploaded += len(data)
+        self.snapshots_uploaded += 1
+        print(f"DB replication: snapshot at seq {seq} ({len(data)} bytes), id={new_id}")
+        # a pillanatképben már benne lévő szegmensek feleslegesek
+        for fid, fname in self._list(f"{self.name}.seg."):
+            m = SEGMENT_RE.search(fname)
+            if m and int(m.group(2)) <= seq:
+                self._delete(fid)
+        return new_id
+
+    # --- visszaállítás ---
+    def restore(self) -> bool:
+        """Pillanatkép + szegmensek → db_path. False, ha nincs távoli pillanatkép."""
+        sid = self._find_snapshot_id()
+        if not sid:
+            return False
+        raw = self._download(sid)
+        if not raw:
+            print("DB replication: snapshot download returned no data")
+            return False
+        tmp = self.db_path.with_suffix(".restore")
+        tmp.write_bytes(gzip.decompress(raw))
+        c = sqlite3.connect(tmp)
+        try:
+            applied = max(_meta_get(c, "shipped_seq"), _meta_get(c, "snapshot_seq"))
+            segments = []
+            for fid, fname in self._list(f"{self.name}.seg."):
+                m = SEGMENT_RE.search(fname)
+                if m and int(m.group(2)) > applied:
+                    segments.append((int(m.group(1)), int(m.group(2)), fid))
+            # visszajátszás közben a triggerek ne naplózzanak újra
+            for (tname,) in c.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'repl_%'").fetchall():
+                c.execute(f"DROP TRIGGER {_q(tname)}")
+            n = 0
+            for first, last, fid in sorted(segments):
+                data = self._download(fid)
+                if not data:
+                    print(f"DB replication: segment {first}-{last} missing, stopping replay")
+                    break
+                for line in gzip.decompress(data).decode("utf-8").splitlines():
+                    if not line.strip():
+                        continue
+                    e = json.loads(line)
+                    if e["seq"] <= applied:
+                        continue
+                    _apply_entry(c, e)
+                    applied = e["seq"]; n += 1
+            # a seq-számláló ne induljon újra a már kiosztott értékek alá
+            c.execute("INSERT OR REPLACE INTO repl_log (seq, tbl, op, row_id) VALUES (?, '', 'X', 0)", (applied,))
+            c.execute("DELETE FROM repl_log WHERE seq <= ?", (applied,))
+            _meta_set(c, "shipped_seq", applied)
+            c.commit()
+        finally:
+            c.close()
+        remove_wal_files(self.db_path)
+        tmp.replace(self.db_path)
+        print(f"DB replication: restored snapshot + {len(segments)} segments ({n} changes), seq={applied}")
+        return True
+
+    def stats(self) -> dict:
+        with self._conn() as c:
+            try:
+                pending = c.execute("SELECT COUNT(*) FROM repl_log").fetchone()[0]
+            except sqlite3.OperationalError:
+                pending = 0
+            return {
+                "pending_changes": pending,
+                "shipped_seq": _meta_get(c, "shipped_seq"),
+                "snapshot_seq": _meta_get(c, "snapshot_seq", -1),
+                "segments_since_snapshot": _meta_get(c, "segments_since_snapshot"),
+                "segments_uploaded": self.segments_uploaded,
+                "snapshots_uploaded": self.snapshots_uploaded,
+                "bytes_uploaded": self.bytes_uploaded,
+            }
@@ -0,0 +1,130 @@
+"""
+Helyi "Drive" – a googleapiclient files() API-jának az a része, amit az app használ
+(create / update / list / get_media), egy könyvtárra leképezve.
+GDRIVE_LOCAL_DIR-rel bekapcsolva a feltöltési sor és a DB-tükrözés hálózat nélkül tesztelhető.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+
+
+class LocalMedia:
+    """A MediaIoBaseUpload helyettesítője (getbytes/size/mimetype interfész)."""
+
+    def __init__(self, data: bytes, mimetype: str):
+        self._data = data
+        self._mime = mimetype
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def getbytes(self, begin: int, length: int) -> bytes:
+        return self._data[begin:begin + length]
+
+    def mimetype(self) -> str:
+        return self._mime
+
+
+class _Call:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class _Files:
+    def __init__(self, svc: "LocalDriveService"):
+        self._svc = svc
+
+    def create(self, body: dict, media_body=None, fields: str = ""):
+        return _Call(lambda: self._svc._write(None, body.get("name") or "", media_body))
+
+    def update(self, fileId: str, media_body=None, body: Optional[dict] = None):
+        return _Call(lambda: self._svc._write(fileId, (body or {}).get("name"), media_body))
+
+    def list(self, q: str = "", fields: str = "", pageSize: int = 100, orderBy: str = "", pageToken: Optional[str] = None):
+        return _Call(lambda: {"files": self._svc._list(q, pageSize)})
+
+    def get_media(self, fileId: str):
+        return _Call(lambda: self._svc._read(fileId))
+
+    def delete(self, fileId: str):
+        return _Call(lambda: self._svc._delete(fileId))
+
+
+class LocalDriveService:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.root / "_index.json"
+        self._lock = threading.Lock()
+        self.fail_next = 0   # tesztekhez: ennyi hívás szándékosan elbukik (Drive-kiesés szimulálása)
+
+    def files(self) -> _Files:
+        return _Files(self)
+
+    # --- belső tárolás ---
+    def _index(self) -> dict:
+        try:
+            return json.loads(self._index_path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+
+    def _save_index(self, idx: dict) -> None:
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(idx, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self._index_path)
+
+    def _maybe_fail(self) -> None:
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise RuntimeError("local drive: simulated outage")
+
+    def _write(self, file_id: Optional[str], name: Optional[str], media) -> dict:
+        with self._lock:
+            self._maybe_fail()
+            idx = self._index()
+            if file_id is None:
+                file_id = uuid.uuid4().hex
+            elif file_id not in idx:
+                raise RuntimeError(f"local drive: no such file {file_id}")
+            data = media.getbytes(0, media.size()) if media is not None else b""
+            (self.root / file_id).write_bytes(data)
+            idx[file_id] = name or idx.get(file_id) or file_id
+            self._save_index(idx)
+            return {"id": file_id, "name": idx[file_id]}
+
+    def _list(self, q: str, limit: int) -> list:
+        with self._lock:
+            self._maybe_fail()
+            idx = self._index()
+        eq = re.search(r"name = '([^']*)'", q or "")
+        contains = re.search(r"name contains '([^']*)'", q or "")
+        out = []
+        for fid, name in sorted(idx.items(), key=lambda kv: kv[1]):
+            if eq and name != eq.group(1):
+                continue
+            if contains and contains.group(1) not in name:
+                continue
+            out.append({"id": fid, "name": name})
+        return out[:limit]
+
+    def _read(self, file_id: str) -> bytes:
+        with self._lock:
+            self._maybe_fail()
+            return (self.root / file_id).read_bytes()
+
+    def _delete(self, file_id: str) -> dict:
+        with self._lock:
+            idx = self._index()
+            idx.pop(file_id, None)
+            self._save_index(idx)
+            (self.root / file_id).unlink(missing_ok=True)
+            return {}
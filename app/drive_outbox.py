@@ -0,0 +1,256 @@
+"""
+Tartós, késleltetett írású (write-behind) Drive-feltöltési sor.
+
+A kérés csak beírja a feladatot egy helyi SQLite "outbox"-ba (data/outbox.db – szándékosan
+nem az app.db-ben, hogy ne kerüljön bele a tükrözött adatbázisba), a háttérfeltöltő pedig
+exponenciális visszalépéssel és korlátozott párhuzamossággal dolgozza fel.
+
+Összevonás (coalescing): az azonos coalesce_key-jű, még el nem indult feladatokból csak egy
+létezik, és az ablak (delay) lejártakor a *legfrissebb* állapotot tölti fel – így N beküldés
+egy ablakon belül egyetlen DB-tükrözést jelent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# handler(job) -> Drive fájl-azonosító (siker) vagy None (hiba, újrapróbáljuk)
+Handler = Callable[[sqlite3.Row], Optional[str]]
+
+
+class DropJob(Exception):
+    """A handler jelzi, hogy a feladat nem végrehajtható (pl. eltűnt a fájl) – nem próbáljuk újra."""
+
+
+class DriveOutbox:
+    def __init__(self, db_path: Path, handlers: Dict[str, Handler], *, concurrency: int = 2,
+                 base_delay: float = 2.0, max_delay: float = 900.0, poll_interval: float = 5.0):
+        self.db_path = Path(db_path)
+        self.handlers = handlers
+        self.concurrency = max(1, int(concurrency))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.uploaded = 0
+        self.failures = 0
+        self._init_db()
+
+    # --- tárolás ---
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            c.row_factory = sqlite3.Row
+            c.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = c
+        return c
+
+    def _init_db(self) -> None:
+        c = self._conn()
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mime TEXT,
+                path TEXT,
+                coalesce_key TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                claimed_at REAL,
+                done_at REAL,
+                result_id TEXT,
+                last_error TEXT
+            )
+        """)
+        # egy kulcshoz legfeljebb egy várakozó (nem futó, nem kész) feladat
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_outbox_pending_key ON outbox(coalesce_key) "
+                  "WHERE coalesce_key IS NOT NULL AND done_at IS NULL")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox(done_at, claimed_at, next_at)")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_outbox_name ON outbox(name)")
+        # összeomlás után: a félbehagyott feladatok újra sorra kerülnek
+        c.execute("UPDATE outbox SET claimed_at = NULL WHERE done_at IS NULL AND claimed_at IS NOT NULL")
+
+    def enqueue(self, kind: str, name: str, *, mime: Optional[str] = None, path: Optional[str] = None,
+                coalesce_key: Optional[str] = None, delay: float = 0.0) -> None:
+        """Szálbiztos; a kérés-kezelőből (szálkészletből) hívható."""
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR IGNORE INTO outbox (kind, name, mime, path, coalesce_key, next_at, created_at) "
+            "VALUES (?,?,?,?,?,?,?)",
+            (kind, name, mime, path, coalesce_key, now + delay, now),
+        )
+        self._notify()
+
+    def result_for(self, name: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT result_id FROM outbox WHERE name = ? AND result_id IS NOT NULL ORDER BY id DESC LIMIT 1",
+            (name,),
+        ).fetchone()
+        return row["result_id"] if row else None
+
+    def stats(self) -> dict:
+        c = self._conn()
+        row = c.execute(
+            "SELECT COUNT(*) AS pending, MAX(attempts) AS max_attempts, "
+            "SUM(CASE WHEN claimed_at IS NOT NULL THEN 1 ELSE 0 END) AS running "
+            "FROM outbox WHERE done_at IS NULL"
+        ).fetchone()
+        oldest = c.execute("SELECT MIN(created_at) AS t FROM outbox WHERE done_at IS NULL").fetchone()["t"]
+        return {
+            "pending": row["pending"] or 0,
+            "running": row["running"] or 0,
+            "max_attempts": row["max_attempts"] or 0,
+            "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "uploaded": self.uploaded,
+            "failures": self.failures,
+            "concurrency": self.concurrency,
+        }
+
+    # --- feldolgozás ---
+    def _claim(self, limit: int):
+        c = self._conn(); now = time.time()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            rows = c.execute(
+                "SELECT * FROM outbox WHERE done_at IS NULL AND claimed_at IS NULL AND next_at <= ? "
+                "ORDER BY next_at, id LIMIT ?", (now, limit)
+            ).fetchall()
+            for r in rows:
+                # a futó feladat leválik a kulcsról: a közben érkező változás új feladatot kap
+                c.execute("UPDATE outbox SET claimed_at = ?, coalesce_key = NULL WHERE id = ?", (now, r["id"]))
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _next_due(self) -> Optional[float]:
+        row = self._conn().execute(
+            "SELECT MIN(next_at) AS t FROM outbox WHERE done_at IS NULL AND claimed_at IS NULL"
+        ).fetchone()
+        return row["t"]
+
+    def _finish(self, job: sqlite3.Row, result_id: Optional[str], error: Optional[str], drop: bool = False) -> None:
+        c = self._conn(); now = time.time()
+        if result_id or drop:
+            c.execute("UPDATE outbox SET done_at = ?, result_id = ?, claimed_at = NULL, last_error = ? WHERE id = ?",
+                      (now, result_id, error, job["id"]))
+            return
+        attempts = job["attempts"] + 1
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1))) * random.uniform(0.8, 1.2)
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            key = job["coalesce_key"]  # a kiosztás előtti érték
+            superseded = False
+            if key is not None:
+                # ha közben újabb várakozó feladat jött ugyanarra a kulcsra, az lefedi ezt is
+                superseded = c.execute(
+                    "SELECT 1 FROM outbox WHERE coalesce_key = ? AND done_at IS NULL AND id != ?", (key, job["id"])
+                ).fetchone() is not None
+            if superseded:
+                c.execute("DELETE FROM outbox WHERE id = ?", (job["id"],))
+            else:
+                c.execute("UPDATE outbox SET attempts = ?, next_at = ?, claimed_at = NULL, last_error = ?, "
+                          "coalesce_key = ? WHERE id = ?", (attempts, now + delay, error, key, job["id"]))
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+
+    def _run_job(self, job: sqlite3.Row) -> None:
+        handler = self.handlers.get(job["kind"])
+        result_id = None; error = None; drop = False
+        try:
+            if handler is None:
+                raise RuntimeError(f"no handler for kind {job['kind']!r}")
+            result_id = handler(job)
+            if not result_id:
+                error = "handler returned no id"
+        except DropJob as e:
+            error = repr(e); drop = True
+        except Exception as e:
+            error = repr(e)
+        if result_id:
+            self.uploaded += 1
+        else:
+            self.failures += 1
+            print(f"Drive outbox: {job['kind']} {job['name']} failed (attempt {job['attempts'] + 1}): {error}")
+        self._finish(job, result_id, error, drop)
+
+    def _notify(self) -> None:
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Szinkron feldolgozás a most esedékes feladatokig (szkriptekhez, tesztekhez)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            jobs = self._claim(self.concurrency)
+            if not jobs:
+                return True
+            for job in jobs:
+                self._run_job(job)
+        return False
+
+    async def _loop_forever(self) -> None:
+        sem = asyncio.Semaphore(self.concurrency)
+        running = set()
+
+        async def one(job):
+            try:
+                await run_in_threadpool(self._run_job, job)
+            finally:
+                sem.release()
+                self._wake.set()
+
+        while True:
+            self._wake.clear()
+            free = self.concurrency - len(running)
+            jobs = await run_in_threadpool(self._claim, free) if free > 0 else []
+            for job in jobs:
+                await sem.acquire()
+                t = asyncio.create_task(one(job))
+                running.add(t); t.add_done_callback(running.discard)
+            timeout = self.poll_interval
+            due = await run_in_threadpool(self._next_due)
+            if due is not None:
+                timeout = min(timeout, max(0.05, due - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop_forever())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._loop = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+class GenerationBusy(Exception):
+    """A generáló sor megtelt – a kliens próbálja újra később (Retry-After)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"generation queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """GenerationPool.reserve(n) eredménye: n előre lefoglalt hely a sorban; release() többször is hívható."""
+
+    def __init__(self, pool: "GenerationPool", slots: int):
+        self.pool = pool
+        self.slots = slots
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.pool.pending -= self.slots
+            self.pool.reserved -= self.slots
+
+
+def _timed_call(fn: Callable, args: tuple):
+    # a worker-folyamatban fut: visszaadja, mikor kezdődött és ért véget a munka (epoch mp)
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+
+def _warm():
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class GenerationPool:
+    """
+    CPU-igényes dokumentumgenerálás (openpyxl, Pillow, ReportLab) folyamatkészletben,
+    korlátos várakozási sorral. A sor telítettségét az eseményhurok szálán számoljuk
+    (nincs szükség zárra), a várakozási időket a worker által visszaadott kezdési
+    időbélyegből mérjük.
+
+    workers <= 0: nincs külön folyamat, a munka az eseményhurok szálkészletében fut.
+
+    Elhalt worker (BrokenProcessPool) esetén egyszerre minden futó kérés hibát kap: a készletet
+    csak az első indítja újra (asyncio.Lock + generációszám), a többi megvárja és az új készleten
+    próbálkozik. Az újraindítás (fork + bemelegítés) szálban fut, nem állítja meg az eseményhurkot.
+    Megjegyzés: ilyenkor már élő szálak (szálkészlet, Drive-feltöltő) mellett forkolunk; a worker
+    csak a generáló kódot futtatja, a szülő zárjait nem használja.
+
+    A worker-ek saját memóriája folyamatonként külön van: a folyamaton belüli LRU-k (pl. a
+    leíráskép-cache) csak akkor találnak, ha ugyanaz a worker kapja a munkát.
+    """
+
+    def __init__(self, workers: int, queue_max: int, retry_after: int = 5, history: int = 512):
+        self.workers = max(0, int(workers))
+        self.queue_max = max(1, int(queue_max))
+        self.retry_after = max(1, int(retry_after))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation = 0          # minden (újra)indítás növeli
+        self._restart_lock: Optional[asyncio.Lock] = None
+        self.restarts = 0
+        self.pending = 0
+        self.reserved = 0             # a pending-ből előre lefoglalt (batch) helyek
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self._waits = deque(maxlen=history)
+        self._runs = deque(maxlen=history)
+
+    # --- életciklus ---
+    def start(self) -> None:
+        """Induláskor, még a szálkészletek előtt forkolunk: a worker-ek öröklik a lefordított sablont."""
+        if self.workers <= 0 or self._executor is not None:
+            return
+        try:
+            ctx = multiprocessing.get_context("fork")
+        except ValueError:
+            ctx = None
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        futures = [executor.submit(_warm) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+        self._executor = executor
+        self._generation += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _ensure_executor(self, broken_generation: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+        """
+        Az aktuális készlet; ha még nincs, vagy a broken_generation készlet elhalt, egyszer
+        (zár alatt) új indul szálban. A később érkezők már az új generációt látják.
+        """
+        if self.workers <= 0:
+            return None
+        if self._executor is not None and broken_generation != self._generation:
+            return self._executor
+        if self._restart_lock is None:
+            self._restart_lock = asyncio.Lock()
+        async with self._restart_lock:
+            if self._executor is not None and broken_generation == self._generation:
+                print("Generation pool broken, restarting")
+                old, self._executor = self._executor, None
+                old.shutdown(wait=False)   # a rajta lévő futures már hibásak; az új készletet nem érinti
+                self.restarts += 1
+            if self._executor is None:
+                await asyncio.to_thread(self.start)
+            return self._executor
+
+    # --- futtatás ---
+    def reserve(self, slots: int) -> Reservation:
+        """
+        slots hely lefoglalása előre (pl. egy batch párhuzamos munkáinak): a foglalás alatt
+        run(..., reservation=r) nem kér új helyet, így nem kaphat GenerationBusy-t, és a
+        többi kérés sem tudja kiszorítani. Ha nincs elég szabad hely: GenerationBusy.
+        """
+        slots = max(1, int(slots))
+        if self.pending + slots > self.queue_max:
+            self.rejected += 1
+            raise GenerationBusy(self.retry_after)
+        self.pending += slots
+        self.reserved += slots
+        return Reservation(self, slots)
+
+    async def run(self, fn: Callable, *args, reservation: Optional[Reservation] = None) -> Any:
+        own_slot = reservation is None or reservation.released
+        if own_slot:
+            if self.pending >= self.queue_max:
+                self.rejected += 1
+                raise GenerationBusy(self.retry_after)
+            self.pending += 1
+        submitted = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            executor = await self._ensure_executor()
+            generation = self._generation
+            try:
+                started, finished, result = await loop.run_in_executor(executor, _timed_call, fn, args)
+            except BrokenProcessPool:
+                # elhalt worker (pl. OOM): egyszeri újraindítás, egyszeri újrapróbálás
+                executor = await self._ensure_executor(broken_generation=generation)
+                started, finished, result = await loop.run_in_executor(executor, _timed_call, fn, args)
+            self._waits.append(max(0.0, started - submitted))
+            self._runs.append(max(0.0, finished - started))
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            if own_slot:
+                self.pending -= 1
+
+    # --- metrikák ---
+    @staticmethod
+    def _summary(values) -> dict:
+        if not values:
+            return {"count": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        xs = sorted(values)
+        pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))] * 1000.0
+        return {
+            "count": len(xs),
+            "avg_ms": round(sum(xs) / len(xs) * 1000.0, 2),
+            "p50_ms": round(pick(0.50), 2),
+            "p95_ms": round(pick(0.95), 2),
+            "max_ms": round(xs[-1] * 1000.0, 2),
+        }
+
+    def stats(self) -> dict:
+        capacity = self.workers or 1
+        return {
+            "mode": "process" if self.workers > 0 else "thread",
+            "workers": self.workers,
+            "queue_max": self.queue_max,
+            "in_flight": self.pending,
+            "reserved": self.reserved,
+            "queue_depth": max(0, self.pending - capacity),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "restarts": self.restarts,
+            "wait": self._summary(self._waits),
+            "run": self._summary(self._runs),
+        }
@@ -1,25 +1,48 @@
 from fastapi import FastAPI, Request, Form, Response, Body
-from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, JSONResponse, StreamingResponse
 from starlette.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 
-from openpyxl import load_workbook
+from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Alignment
 from openpyxl.drawing.image import Image as XLImage
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
 from openpyxl.worksheet.page import PageMargins
 
 from datetime import datetime, time
-from io import BytesIO
+from io import BytesIO, StringIO
+import asyncio
+import csv
+import gzip
+import hashlib
 import os
+import tempfile
 import uuid
-import textwrap
 import traceback
 import json
-import sqlite3
+import pickle
+import threading
+import zipfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List
+
+from app.xlsx_patch import PatchTemplate
+from app.gen_pool import GenerationPool, GenerationBusy
+from app.drive_outbox import DriveOutbox, DropJob
+from app.db_replication import DbReplicator, ensure_replication_schema, remove_wal_files
+from app.db_pool import SQLitePool
+from app.shards import ShardRouter
+from app.page_cache import PageCache, choose_encoding, etag_matches
+from app.static_assets import AssetManifest, HashedStaticFiles
+from app.storage import SUBMISSION_COLUMNS, open_storage
+from app.translation_cache import TranslationCache
+from app.translator_chain import CircuitBreaker, run_hedged
+from app.segments import split_segments, unique_segments, join_segments
+from app.translation_memory import GlossaryMatcher, TranslationMemory, restore_placeholders
+from app.worker_index import WorkerDirectory
+from starlette.concurrency import run_in_threadpool
 
 # Hálózat/HTTP
 import httpx
@@ -31,9 +54,18 @@ from urllib.parse import urlparse, urlencode
 GDRIVE_JSON = os.getenv("GDRIVE_SERVICE_ACCOUNT_JSON", "")
 GDRIVE_FOLDER_ID = os.getenv("GDRIVE_FOLDER_ID", "").strip()
 
-DRIVE_ENABLED = bool(GDRIVE_JSON and GDRIVE_FOLDER_ID)
+GDRIVE_LOCAL_DIR = os.getenv("GDRIVE_LOCAL_DIR", "").strip()   # fejlesztéshez/teszthez: helyi "Drive" könyvtár
+
+DRIVE_ENABLED = bool((GDRIVE_JSON and GDRIVE_FOLDER_ID) or GDRIVE_LOCAL_DIR)
 drive_svc = None
-if DRIVE_ENABLED:
+_drive_build = None   # a google kliens nem szálbiztos: szálanként saját példány
+_drive_tls = threading.local()
+if GDRIVE_LOCAL_DIR:
+    from app.drive_local import LocalDriveService, LocalMedia
+    drive_svc = LocalDriveService(GDRIVE_LOCAL_DIR)
+    GDRIVE_FOLDER_ID = GDRIVE_FOLDER_ID or "local"
+    print(f"Drive: local directory {GDRIVE_LOCAL_DIR}")
+elif DRIVE_ENABLED:
     try:
         from google.oauth2 import service_account
         from googleapiclient.discovery import build
@@ -42,19 +74,33 @@ if DRIVE_ENABLED:
             json.loads(GDRIVE_JSON),
             scopes=["https://www.googleapis.com/auth/drive.file"],
         )
-        drive_svc = build("drive", "v3", credentials=creds, cache_discovery=False)
+        _drive_build = lambda: build("drive", "v3", credentials=creds, cache_discovery=False)
+        drive_svc = _drive_build()
     except Exception as e:
         print("Drive init failed:", repr(e))
         DRIVE_ENABLED = False
         drive_svc = None
 
+def drive_service():
+    if _drive_build is None:
+        return drive_svc
+    svc = getattr(_drive_tls, "svc", None)
+    if svc is None:
+        svc = _drive_tls.svc = _drive_build()
+    return svc
+
+def _drive_media(data: bytes, mime: str):
+    if GDRIVE_LOCAL_DIR:
+        return LocalMedia(data, mime)
+    return MediaIoBaseUpload(BytesIO(data), mimetype=mime, resumable=False)
+
 def drive_upload_bytes(filename: str, data: bytes, mime: str) -> Optional[str]:
     if not (DRIVE_ENABLED and drive_svc):
         return None
     try:
-        media = MediaIoBaseUpload(BytesIO(data), mimetype=mime, resumable=False)
+        media = _drive_media(data, mime)
         meta = {"name": filename, "parents": [GDRIVE_FOLDER_ID]}
-        file = drive_svc.files().create(body=meta, media_body=media, fields="id").execute()
+        file = drive_service().files().create(body=meta, media_body=media, fields="id").execute()
         return file.get("id")
     except Exception as e:
         print("Drive upload failed:", repr(e))
@@ -69,7 +115,7 @@ def drive_find_file_id_by_name(name: str) -> Optional[str]:
         return None
     try:
         q = f"name = '{name}' and '{GDRIVE_FOLDER_ID}' in parents and trashed = false"
-        res = drive_svc.files().list(q=q, fields="files(id,name)", pageSize=1).execute()
+        res = drive_service().files().list(q=q, fields="files(id,name)", pageSize=1).execute()
         files = res.get("files", [])
         if files:
             return files[0]["id"]
@@ -78,11 +124,43 @@ def drive_find_file_id_by_name(name: str) -> Optional[str]:
         print("Drive find file failed:", repr(e))
         return None
 
+def drive_list_files(name_part: str) -> List[Tuple[str, str]]:
+    """(id, name) párok, amelyek neve tartalmazza name_part-ot (lapozással)."""
+    if not (DRIVE_ENABLED and drive_svc):
+        return []
+    out, token = [], None
+    try:
+        q = f"name contains '{name_part}' and '{GDRIVE_FOLDER_ID}' in parents and trashed = false"
+        while True:
+            kw = {"q": q, "fields": "nextPageToken, files(id,name)", "pageSize": 1000}
+            if token:
+                kw["pageToken"] = token
+            res = drive_service().files().list(**kw).execute()
+            out.extend((f["id"], f["name"]) for f in res.get("files", []))
+            token = res.get("nextPageToken")
+            if not token:
+                return out
+    except Exception as e:
+        print("Drive list failed:", repr(e))
+        return out
+
+def drive_delete_file(file_id: str) -> bool:
+    if not (DRIVE_ENABLED and drive_svc and file_id):
+        return False
+    try:
+        drive_service().files().delete(fileId=file_id).execute()
+        return True
+    except Exception as e:
+        print("Drive delete failed:", repr(e))
+        return False
+
 def drive_download_file(file_id: str) -> Optional[bytes]:
     if not (DRIVE_ENABLED and drive_svc and file_id):
         return None
     try:
-        req = drive_svc.files().get_media(fileId=file_id)
+        req = drive_service().files().get_media(fileId=file_id)
+        if GDRIVE_LOCAL_DIR:
+            return req.execute()
         buf = BytesIO()
         downloader = MediaIoBaseDownload(buf, req)
         done = False
@@ -97,13 +175,13 @@ def drive_upload_or_update(filename: str, data: bytes, mime: str, existing_id: O
     if not (DRIVE_ENABLED and drive_svc):
         return None
     try:
-        media = MediaIoBaseUpload(BytesIO(data), mimetype=mime, resumable=False)
+        media = _drive_media(data, mime)
         if existing_id:
-            file = drive_svc.files().update(fileId=existing_id, media_body=media).execute()
+            file = drive_service().files().update(fileId=existing_id, media_body=media).execute()
             return file.get("id")
         else:
             meta = {"name": filename, "parents": [GDRIVE_FOLDER_ID]}
-            file = drive_svc.files().create(body=meta, media_body=media, fields="id").execute()
+            file = drive_service().files().create(body=meta, media_body=media, fields="id").execute()
             return file.get("id")
     except Exception as e:
         print("Drive upload/update failed:", repr(e))
@@ -129,23 +207,47 @@ except Exception:
 
 # ---- App / statikus / sablonok ----
 app = FastAPI()
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# tartalom-hash-elt, előtömörített, immutable statikus fájlok (app/static_assets.py); az eredeti nevek is mennek
+try:
+    STATIC_RECHECK_S = float(os.getenv("STATIC_RECHECK_S", "2"))
+except Exception:
+    STATIC_RECHECK_S = 2.0
+static_assets = AssetManifest(Path("app/static"), "/static", recheck_s=STATIC_RECHECK_S)
+app.mount("/static", HashedStaticFiles(directory="app/static", manifest=static_assets), name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = static_assets.url
 
 # ---- Session a bejelentkezéshez ----
 SESSION_SECRET = os.getenv("SESSION_SECRET", "change-me-dev-secret")
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET, same_site="lax")
 
-# ---- Tenant gyökér-átirányítás (opcionális köztesréteg) ----
+# ---- Tenant-nyilvántartás (Host -> cég, memóriában; companies-verzió szerint frissítve) ----
+from app.tenants import TenantRegistry, request_host
+BASE_DOMAIN = os.getenv("BASE_DOMAIN", "metori.de").strip().lower()
+MAIN_DOMAINS = [BASE_DOMAIN, f"www.{BASE_DOMAIN}"]
+# X-Forwarded-Host csak akkor számít, ha az app olyan proxy mögött fut, amely ezt a fejlécet
+# maga állítja be (a kliensét felülírja); közvetlen elérésnél bárki másik tenantot adhatna meg vele
+TRUST_FORWARDED_HOST = os.getenv("TRUST_FORWARDED_HOST", "0").strip().lower() in ("1", "true", "yes", "on")
+try:
+    TENANT_RECHECK_S = float(os.getenv("TENANT_RECHECK_S", "5"))
+    TENANT_NEGATIVE_TTL = float(os.getenv("TENANT_NEGATIVE_TTL", "60"))
+except Exception:
+    TENANT_RECHECK_S, TENANT_NEGATIVE_TTL = 5.0, 60.0
+# a storage lent jön létre – a lambdák hívásidőben oldják fel
+tenant_registry = TenantRegistry(lambda: storage.companies(), lambda: storage.tenant_registry_version(),
+                                 base_domain=BASE_DOMAIN, main_domains=MAIN_DOMAINS,
+                                 recheck_s=TENANT_RECHECK_S, negative_ttl=TENANT_NEGATIVE_TTL)
+
+# ---- Tenant gyökér-átirányítás + tenant feloldás a request.state-re (köztesréteg) ----
 try:
     from app.tenant_redirect_middleware import TenantRootRedirectMiddleware
-    BASE_DOMAIN = os.getenv("BASE_DOMAIN", "metori.de").strip().lower()
-    MAIN_DOMAINS = [BASE_DOMAIN, f"www.{BASE_DOMAIN}"]
     app.add_middleware(
         TenantRootRedirectMiddleware,
         base_domain=BASE_DOMAIN,
         main_domains=MAIN_DOMAINS,
         login_target="/login?next=/form",
+        registry=tenant_registry,
+        trust_forwarded_host=TRUST_FORWARDED_HOST,
     )
 except Exception:
     pass
@@ -170,11 +272,31 @@ DATA_DIR.mkdir(exist_ok=True)
 GEN_DIR.mkdir(exist_ok=True)
 DB_PATH = DATA_DIR / "app.db"
 
+# sqlite (alapértelmezés, Drive-tükrözéssel) | postgres (DATABASE_URL, több app-példányhoz)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite").strip().lower()
+USE_SQLITE = DB_BACKEND == "sqlite"
+
+# full: a teljes app.db újrafeltöltése (régi viselkedés); incremental: pillanatkép + változásszegmensek
+DB_REPLICATION = os.getenv("DB_REPLICATION", "incremental").strip().lower()
+REPLICATED_TABLES = None   # None: minden felhasználói tábla (companies, workers is), az FTS és a meta táblák nélkül
+db_replicator = DbReplicator(
+    DB_PATH, DB_DRIVE_NAME,
+    upload=lambda name, data, existing: drive_upload_or_update(name, data, "application/octet-stream", existing),
+    list_files=drive_list_files, download=drive_download_file, delete=drive_delete_file,
+    snapshot_every=int(os.getenv("DB_SNAPSHOT_EVERY", "100") or 100),
+)
+
 def try_sync_db_from_drive():
     global DB_DRIVE_ID
-    if not DRIVE_ENABLED:
+    if not DRIVE_ENABLED or not USE_SQLITE:
         print("Drive DB sync: disabled")
         return
+    if DB_REPLICATION == "incremental":
+        try:
+            if db_replicator.restore():
+                return
+        except Exception as e:
+            print("DB replication restore failed:", repr(e))
     try:
         fid = drive_find_file_id_by_name(DB_DRIVE_NAME)
         if not fid:
@@ -182,6 +304,7 @@ def try_sync_db_from_drive():
             return
         data = drive_download_file(fid)
         if data:
+            remove_wal_files(DB_PATH)
             DB_PATH.write_bytes(data)
             DB_DRIVE_ID = fid
             print(f"Drive DB sync: downloaded {DB_DRIVE_NAME} ({len(data)} bytes)")
@@ -192,47 +315,166 @@ def try_sync_db_from_drive():
 
 try_sync_db_from_drive()
 
+# szálanként egy tartós kapcsolat (WAL, synchronous=NORMAL, mmap, cache) – a `with db_conn() as c:`
+# minta változatlan: a blokk végén commit/rollback, a kapcsolat nyitva marad
+db_pool = SQLitePool(
+    DB_PATH,
+    mmap_size=int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024))),
+    cache_size_kib=int(os.getenv("DB_CACHE_SIZE_KIB", "16384")),
+)
+
 def db_conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+    return db_pool.connection()
+
+# submissions/companies/workers a háttértár-független rétegen keresztül (app/storage.py)
+storage = open_storage(
+    DB_BACKEND, sqlite_pool=db_pool, dsn=os.getenv("DATABASE_URL", ""),
+    pool_min=int(os.getenv("DB_POOL_MIN", "1")), pool_max=int(os.getenv("DB_POOL_MAX", "10")),
+)
 
 def init_db():
-    with db_conn() as c:
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            created_at TEXT NOT NULL,
-            datum TEXT,
-            bau TEXT,
-            basf_beauftragter TEXT,
-            beschreibung TEXT,
-            break_minutes INTEGER,
-            vorname1 TEXT, nachname1 TEXT, ausweis1 TEXT, beginn1 TEXT, ende1 TEXT, vorhaltung1 TEXT,
-            vorname2 TEXT, nachname2 TEXT, ausweis2 TEXT, beginn2 TEXT, ende2 TEXT, vorhaltung2 TEXT,
-            vorname3 TEXT, nachname3 TEXT, ausweis3 TEXT, beginn3 TEXT, ende3 TEXT, vorhaltung3 TEXT,
-            vorname4 TEXT, nachname4 TEXT, ausweis4 TEXT, beginn4 TEXT, ende4 TEXT, vorhaltung4 TEXT,
-            vorname5 TEXT, nachname5 TEXT, ausweis5 TEXT, beginn5 TEXT, ende5 TEXT, vorhaltung5 TEXT,
-            excel_filename TEXT,
-            payload_json TEXT
-        )
-        """)
+    storage.init_schema()
+    if USE_SQLITE and DB_REPLICATION == "incremental":
+        with db_conn() as c:
+            ensure_replication_schema(c, REPLICATED_TABLES)
 init_db()
 
-def sync_db_to_drive():
+# ---- Cégenkénti SQLite-shardok (DB_SHARDING=tenant) ----
+# A tenant beküldései data/tenants/<slug>.db-be kerülnek (saját írózár, saját Drive-replika);
+# az app.db marad a companies/workers és a tenant nélküli beküldések helye. Lásd app/shards.py.
+DB_SHARDING = os.getenv("DB_SHARDING", "off").strip().lower() == "tenant" and USE_SQLITE
+SHARD_DIR = DATA_DIR / "tenants"
+shard_pools: Dict[str, SQLitePool] = {}
+shard_replicators: Dict[str, DbReplicator] = {}
+shard_drive_ids: Dict[str, Optional[str]] = {}   # full módban a shard-fájl Drive-azonosítója
+
+def _shard_drive_name(slug: str) -> str:
+    return f"app-{slug}.db"
+
+def _restore_shard_file(slug: str, path: Path) -> None:
+    """full mód: a shard Drive-azonosítójának kikeresése (a feltöltés ezt frissíti), és a teljes
+    fájl letöltése, ha helyben még nincs meg."""
+    name = _shard_drive_name(slug)
+    shard_drive_ids.setdefault(slug, None)
+    try:
+        fid = drive_find_file_id_by_name(name)
+        shard_drive_ids[slug] = fid
+        if not fid or path.exists():
+            return
+        data = drive_download_file(fid)
+        if data:
+            remove_wal_files(path)
+            path.write_bytes(data)
+            print(f"DB shard {slug}: downloaded {name} ({len(data)} bytes)")
+    except Exception as e:
+        print(f"DB shard {slug}: download failed:", repr(e))
+
+def _open_shard(slug: str, path: Path):
+    if not DRIVE_ENABLED:
+        print(f"WARNING: DB shard {slug}: Drive disabled – {path} is not replicated, back it up separately")
+    elif DB_REPLICATION != "incremental":
+        _restore_shard_file(slug, path)
+    else:
+        rep = DbReplicator(
+            path, _shard_drive_name(slug),
+            upload=lambda name, data, existing: drive_upload_or_update(name, data, "application/octet-stream", existing),
+            list_files=drive_list_files, download=drive_download_file, delete=drive_delete_file,
+            snapshot_every=int(os.getenv("DB_SNAPSHOT_EVERY", "100") or 100),
+        )
+        if not path.exists():
+            try:
+                rep.restore()
+            except Exception as e:
+                print(f"DB shard {slug}: restore failed:", repr(e))
+        shard_replicators[slug] = rep
+    pool = SQLitePool(
+        path,
+        mmap_size=int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024))),
+        cache_size_kib=int(os.getenv("DB_CACHE_SIZE_KIB", "16384")),
+    )
+    store = open_storage("sqlite", sqlite_pool=pool)
+    store.init_schema()
+    if DB_REPLICATION == "incremental":
+        with pool.connection() as c:
+            ensure_replication_schema(c, REPLICATED_TABLES)
+    shard_pools[slug] = pool
+    return store
+
+shard_router = ShardRouter(storage, SHARD_DIR, _open_shard, enabled=DB_SHARDING)
+
+def sync_db_to_drive() -> Optional[str]:
     global DB_DRIVE_ID
     if not DRIVE_ENABLED:
-        return
+        return None
     try:
+        db_pool.checkpoint()   # WAL módban a friss írások még a -wal fájlban lehetnek
         data = DB_PATH.read_bytes()
         new_id = drive_upload_or_update(DB_DRIVE_NAME, data, "application/octet-stream", DB_DRIVE_ID)
         if new_id:
             DB_DRIVE_ID = new_id
             print(f"Drive DB sync: uploaded {DB_DRIVE_NAME} ({len(data)} bytes), id={DB_DRIVE_ID}")
-        else:
-            print("Drive DB sync: upload returned no id")
+            return new_id
+        print("Drive DB sync: upload returned no id")
     except Exception as e:
         print("Drive DB sync (upload) failed:", repr(e))
+    return None
+
+def sync_shard_to_drive(slug: str) -> Optional[str]:
+    """full mód: a shard teljes fájljának feltöltése (mint sync_db_to_drive az app.db-nél)."""
+    pool = shard_pools.get(slug)
+    if pool is None:
+        return None
+    name = _shard_drive_name(slug)
+    pool.checkpoint()
+    data = Path(pool.path).read_bytes()
+    new_id = drive_upload_or_update(name, data, "application/octet-stream", shard_drive_ids.get(slug))
+    if not new_id:
+        raise RuntimeError(f"upload of {name} returned no id")
+    shard_drive_ids[slug] = new_id
+    print(f"Drive DB sync: uploaded {name} ({len(data)} bytes), id={new_id}")
+    return new_id
+
+# ---- Drive write-behind sor ----
+# A kérés csak sorba állítja a feltöltést; a háttérfeltöltő újrapróbál (exponenciális visszalépés),
+# a DB-tükrözést pedig DRIVE_SYNC_WINDOW másodpercenként legfeljebb egyszer végzi el.
+DRIVE_SYNC_WINDOW = float(os.getenv("DRIVE_SYNC_WINDOW", "10"))
+DRIVE_OUTBOX_CONCURRENCY = int(os.getenv("DRIVE_OUTBOX_CONCURRENCY", "2") or 2)
+
+def _outbox_upload_file(job) -> Optional[str]:
+    fp = Path(job["path"])
+    if not fp.exists():
+        raise DropJob(f"{fp} missing")
+    return drive_upload_bytes(filename=job["name"], data=fp.read_bytes(), mime=job["mime"] or "application/octet-stream")
+
+def _outbox_sync_db(job) -> Optional[str]:
+    slug = job["name"][len("app-"):-len(".db")] if job["name"] != DB_DRIVE_NAME else None
+    if slug is not None:
+        # shard: incremental módban saját replikátor, full módban a teljes shard-fájl
+        rep = shard_replicators.get(slug)
+        if rep is not None:
+            return rep.sync()
+        if slug in shard_drive_ids:
+            return sync_shard_to_drive(slug)
+        raise DropJob(f"shard {slug} not opened")
+    if DB_REPLICATION == "incremental":
+        return db_replicator.sync()
+    return sync_db_to_drive()
+
+drive_outbox = DriveOutbox(
+    DATA_DIR / "outbox.db",
+    {"file": _outbox_upload_file, "db": _outbox_sync_db},
+    concurrency=DRIVE_OUTBOX_CONCURRENCY,
+)
+
+def schedule_db_sync(store=None):
+    """store: a tároló, amelybe írtunk – shardnál annak a replikáját ütemezzük."""
+    if not (DRIVE_ENABLED and USE_SQLITE):
+        return
+    slug = next((k for k, v in shard_router.opened().items() if v is store), None) if store is not None else None
+    if slug is None:
+        drive_outbox.enqueue("db", DB_DRIVE_NAME, coalesce_key="db", delay=DRIVE_SYNC_WINDOW)
+    elif slug in shard_replicators or slug in shard_drive_ids:
+        drive_outbox.enqueue("db", _shard_drive_name(slug), coalesce_key=f"db:{slug}", delay=DRIVE_SYNC_WINDOW)
 
 # ---------- helpers (Excel stb.) ----------
 def merged_ranges(ws):
@@ -242,18 +484,20 @@ def in_range(rng, r, c):
     r1, c1, r2, c2 = rng
     return (r1 <= r <= r2) and (c1 <= c <= c2)
 
-def block_of(ws, r, c):
+def block_of(ws, r, c, layout=None):
+    if layout is not None:
+        return layout.block_of(r, c)
     for rng in merged_ranges(ws):
         if in_range(rng, r, c):
             return rng
     return (r, c, r, c)
 
-def top_left_of_block(ws, r, c):
-    r1, c1, _, _ = block_of(ws, r, c)
+def top_left_of_block(ws, r, c, layout=None):
+    r1, c1, _, _ = block_of(ws, r, c, layout)
     return r1, c1
 
-def set_text(ws, r, c, text, wrap=False, align_left=False, valign_top=False):
-    rr, cc = top_left_of_block(ws, r, c)
+def set_text(ws, r, c, text, wrap=False, align_left=False, valign_top=False, layout=None):
+    rr, cc = top_left_of_block(ws, r, c, layout)
     cell = ws.cell(row=rr, column=cc)
     cell.value = text
     cell.alignment = Alignment(
@@ -262,9 +506,9 @@ def set_text(ws, r, c, text, wrap=False, align_left=False, valign_top=False):
         vertical=("top" if valign_top else cell.alignment.vertical or "center"),
     )
 
-def set_text_addr(ws, addr, text, *, wrap=False, horizontal="left", vertical="center"):
+def set_text_addr(ws, addr, text, *, wrap=False, horizontal="left", vertical="center", layout=None):
     cell = ws[addr]
-    rr, cc = top_left_of_block(ws, cell.row, cell.column)
+    rr, cc = top_left_of_block(ws, cell.row, cell.column, layout)
     tgt = ws.cell(row=rr, column=cc)
     tgt.value = text
     tgt.alignment = Alignment(wrap_text=wrap, horizontal=horizontal, vertical=vertical)
@@ -385,71 +629,155 @@ def _get_col_pixel_width(ws, col_index):
 LEFT_INSET_PX = 25
 BOTTOM_CROP   = 0.92
 
+class TemplateLayout:
+    """
+    A sablon egyszer kiszámolt elrendezése: cella -> merge-blokk tábla, fejlécoszlopok,
+    adatsor-kezdet, összesítő cellák és a leírásblokk (a leíráskép méretével együtt).
+    Sablonverziónként egyszer készül; utána minden lookup O(1), a kérések nem pásztázzák a lapot.
+    """
+
+    def __init__(self, ws):
+        self.blocks = {}
+        for rng in merged_ranges(ws):
+            r1, c1, r2, c2 = rng
+            for r in range(r1, r2 + 1):
+                for c in range(c1, c2 + 1):
+                    self.blocks[(r, c)] = rng
+        self.header = find_header_positions(ws)
+        self.data_start_row = self.header["data_start_row"]
+        self.right_of_label, self.stunden_total = find_total_cells(ws, self.header["stunden_col"])
+        self.description_block = find_description_block(ws)
+        r1, c1, r2, c2 = self.description_block
+        block_w_px, block_h_px = _get_block_pixel_size(ws, r1, c1, r2, c2)
+        colA_w_px = _get_col_pixel_width(ws, 1)
+        self.description_image_size = (max(40, block_w_px - colA_w_px - LEFT_INSET_PX), int(block_h_px * BOTTOM_CROP))
+        self.filled = frozenset(filled_cells(ws))
+
+    def block_of(self, r, c):
+        return self.blocks.get((r, c)) or (r, c, r, c)
+
+    def top_left(self, r, c):
+        r1, c1, _, _ = self.block_of(r, c)
+        return r1, c1
+
+# ---- Leíráskép: betű-, metrika- és képgyorsítótár ----
+DESC_FONT_CANDIDATES = ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
+DESC_FONT_SIZE = 14
+try:
+    DESC_IMAGE_CACHE_SIZE = int(os.getenv("DESC_IMAGE_CACHE_SIZE", "64"))
+except Exception:
+    DESC_IMAGE_CACHE_SIZE = 64
+_FONT_LOCK = threading.Lock()   # a FreeType-arc nem szálbiztos: mérés/rajzolás egyszerre csak egy szálon
+
+class FontMetrics:
+    """Betöltött betűtípus + glifánkénti előretolás (advance) és sormagasság, (font, méret) szerint egyszer."""
+
+    def __init__(self, font):
+        self.font = font
+        ascent, descent = font.getmetrics()
+        self.line_h = ascent + descent + 4
+        self._advance = {}
+
+    def width(self, s: str) -> float:
+        adv = self._advance; total = 0.0
+        for ch in s:
+            w = adv.get(ch)
+            if w is None:
+                w = adv[ch] = self.font.getlength(ch)
+            total += w
+        return total
+
+    def wrap(self, para: str, max_w: float) -> List[str]:
+        """Szavankénti tördelés valódi pixelszélességgel (a túl hosszú szó nem törik, mint eddig)."""
+        lines = []; cur = ""; cur_w = 0.0
+        space_w = self.width(" ")
+        for word in para.split(" "):
+            if not word:
+                continue
+            w = self.width(word)
+            if cur and cur_w + space_w + w <= max_w:
+                cur += " " + word; cur_w += space_w + w
+            else:
+                if cur:
+                    lines.append(cur)
+                cur, cur_w = word, w
+        if cur:
+            lines.append(cur)
+        return lines
+
+@lru_cache(maxsize=8)
+def get_font_metrics(size: int = DESC_FONT_SIZE) -> FontMetrics:
+    for name in DESC_FONT_CANDIDATES:
+        try:
+            return FontMetrics(ImageFont.truetype(name, size))
+        except Exception:
+            continue
+    return FontMetrics(ImageFont.load_default())
+
 def _make_description_image(text, w_px, h_px):
     if not PIL_AVAILABLE:
         raise RuntimeError("PIL not available")
     img = PILImage.new("RGB", (w_px, h_px), (255, 255, 255))
     draw = ImageDraw.Draw(img)
-    font = None
-    for name in ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]:
-        try:
-            font = ImageFont.truetype(name, 14); break
-        except Exception:
-            font = None
-    if font is None:
-        font = ImageFont.load_default()
 
     pad_left, pad_top, pad_right, pad_bottom = 12, 10, 0, 10
     avail_w = max(10, w_px - (pad_left + pad_right))
     avail_h = max(10, h_px - (pad_top + pad_bottom))
 
-    sample = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 .,:;-"
-    avg_w = max(6, sum(draw.textlength(ch, font=font) for ch in sample) / len(sample))
-    avg_w_eff = avg_w * 0.90
-    max_chars_per_line = max(10, int(avail_w / avg_w_eff))
-
-    paragraphs = (text or "").replace("\r\n","\n").replace("\r","\n").split("\n")
-    lines = []
-    for para in paragraphs:
-        if not para:
-            lines.append("")
-            continue
-        lines.extend(textwrap.wrap(para, width=max_chars_per_line, replace_whitespace=False, break_long_words=False))
-
-    ascent, descent = font.getmetrics()
-    line_h = ascent + descent + 4
-    max_lines = max(1, int(avail_h // line_h))
-    if len(lines) > max_lines:
-        lines = lines[:max_lines - 1] + ["…"]
-
-    x = pad_left; y = pad_top
-    for ln in lines:
-        draw.text((x, y), ln, fill=(0, 0, 0), font=font)
-        y += line_h
+    with _FONT_LOCK:
+        fm = get_font_metrics(DESC_FONT_SIZE)
+        paragraphs = (text or "").replace("\r\n","\n").replace("\r","\n").split("\n")
+        lines = []
+        for para in paragraphs:
+            if not para:
+                lines.append("")
+                continue
+            lines.extend(fm.wrap(para, avail_w))
+
+        line_h = fm.line_h
+        max_lines = max(1, int(avail_h // line_h))
+        if len(lines) > max_lines:
+            lines = lines[:max_lines - 1] + ["…"]
+
+        x = pad_left; y = pad_top
+        for ln in lines:
+            draw.text((x, y), ln, fill=(0, 0, 0), font=fm.font)
+            y += line_h
     return img
 
-def _xlimage_from_pil(pil_img):
-    buf = BytesIO(); pil_img.save(buf, format="PNG"); buf.seek(0); return XLImage(buf)
+@lru_cache(maxsize=DESC_IMAGE_CACHE_SIZE)
+def render_description_png(text: str, w_px: int, h_px: int) -> bytes:
+    """A kész leíráskép PNG-bájtjai; (szöveg, szélesség, magasság) szerint LRU – az Excel és a PDF út közösen használja.
+    GEN_WORKERS > 0 esetén a cache worker-folyamatonként külön van: az azonos leírású Excel és PDF
+    csak akkor használja újra a képet, ha ugyanarra a worker-re kerül."""
+    buf = BytesIO(); _make_description_image(text, w_px, h_px).save(buf, format="PNG")
+    return buf.getvalue()
 
-def insert_description_as_image(ws, r1, c1, r2, c2, text):
+def _description_image_spec(layout, text):
+    """A leíráskép PNG-ként + horgony/méret: (png, anchor_row, anchor_col, w_px, h_px) vagy None."""
     if not PIL_AVAILABLE:
-        print("IMG: PIL not available"); return False
+        print("IMG: PIL not available"); return None
     try:
-        block_w_px, block_h_px = _get_block_pixel_size(ws, r1, c1, r2, c2)
-        colA_w_px = _get_col_pixel_width(ws, 1)
-        anchor_col = c1 + 1
-        anchor = f"{get_column_letter(anchor_col)}{r1}"
-        new_w_px = max(40, block_w_px - colA_w_px - LEFT_INSET_PX)
-        new_h_px = int(block_h_px * BOTTOM_CROP)
-        pil_img = _make_description_image(text or "", new_w_px, new_h_px)
-        xlimg = _xlimage_from_pil(pil_img)
-        ws.add_image(xlimg, anchor)
-        set_text(ws, r1, c1, "", wrap=False, align_left=True, valign_top=True)
-        return True
+        r1, c1, _, _ = layout.description_block
+        new_w_px, new_h_px = layout.description_image_size
+        png = render_description_png(text or "", new_w_px, new_h_px)
+        return (png, r1, c1 + 1, new_w_px, new_h_px)
     except Exception as e:
-        print("IMG insert failed:", repr(e)); traceback.print_exc(); return False
+        print("IMG render failed:", repr(e)); traceback.print_exc(); return None
+
+def filled_cells(ws):
+    """A sablonban ténylegesen kitöltött cellák a használt tartományon belül (sablonverziónként egyszer fut)."""
+    return {(cell.row, cell.column)
+            for row in ws.iter_rows(min_row=ws.min_row, max_row=ws.max_row,
+                                    min_col=ws.min_column, max_col=ws.max_column, values_only=False)
+            for cell in row if cell.value not in (None, "")}
 
-def set_print_defaults(ws):
+def extent_print_area(filled) -> str:
+    last_data_row = max([1] + [r for r, _ in filled])
+    last_data_col = max([1] + [c for _, c in filled])
+    return f"A1:{get_column_letter(last_data_col)}{last_data_row}"
+
+def set_print_defaults(ws, print_area: Optional[str] = None):
     ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
     ws.page_setup.paperSize = ws.PAPERSIZE_A4
     ws.page_setup.fitToWidth = 0
@@ -458,17 +786,101 @@ def set_print_defaults(ws):
     if hasattr(ws, "sheet_properties") and hasattr(ws.sheet_properties, "pageSetUpPr"):
         ws.sheet_properties.pageSetUpPr.fitToPage = False
     ws.page_margins = PageMargins(left=0.2, right=0.2, top=0.2, bottom=0.2, header=0, footer=0)
-    last_data_row = 1; last_data_col = 1
-    for r in range(1, ws.max_row + 1):
-        for c in range(1, ws.max_column + 1):
-            if ws.cell(row=r, column=c).value not in (None, ""):
-                last_data_row = max(last_data_row, r); last_data_col = max(last_data_col, c)
-    last_col_letter = get_column_letter(last_data_col)
-    ws.print_area = f"A1:{last_col_letter}{last_data_row}"
+    ws.print_area = print_area or extent_print_area(filled_cells(ws))
     ws.print_options.horizontalCentered = False
     ws.print_options.verticalCentered = False
 
-def _build_pdf_preview(date_text, bau, basf_beauftragter, beschreibung, ws, r1, c1, r2, c2, workers, total_hours):
+# ---------- Excel-terv: motorfüggetlen cellaírások ----------
+class ExcelPlan:
+    """
+    Egy beküldés összes cellaírása (bal felső cellára feloldva) + a leíráskép.
+    Az openpyxl-es és az OOXML-foltozó motor is ebből állítja elő a fájlt.
+    """
+
+    def __init__(self, layout: TemplateLayout):
+        self.layout = layout
+        self.writes: List[tuple] = []   # (row, col, value, wrap, horizontal, vertical|None)
+        self.image = None               # (png, anchor_row, anchor_col, w_px, h_px)
+        self.total_hours = 0.0
+
+    def put(self, r, c, value, wrap=False, align_left=False, valign_top=False):
+        rr, cc = self.layout.top_left(r, c)
+        self.writes.append((rr, cc, value, wrap, "left" if align_left else "center", "top" if valign_top else None))
+
+    def put_addr(self, addr, value, *, wrap=False, horizontal="left", vertical="center"):
+        rr, cc = self.layout.top_left(*coordinate_to_tuple(addr))
+        self.writes.append((rr, cc, value, wrap, horizontal, vertical))
+
+    def print_area(self) -> str:
+        """Nyomtatási terület a sablon kitöltött celláiból + a terv írásaiból, a rács bejárása nélkül."""
+        filled = set(self.layout.filled)
+        for (r, c, value, *_) in self.writes:
+            if value in (None, ""):
+                filled.discard((r, c))
+            else:
+                filled.add((r, c))
+        return extent_print_area(filled)
+
+def build_excel_plan(layout: TemplateLayout, date_text, bau, basf_beauftragter, text_in, workers, break_minutes) -> ExcelPlan:
+    """workers: [(vn, nn, aw, bg, en, vh), ...]"""
+    plan = ExcelPlan(layout)
+    plan.put_addr("B2", date_text, horizontal="left")
+    plan.put_addr("B3", bau,       horizontal="left")
+    if (basf_beauftragter or "").strip():
+        plan.put_addr("E3", basf_beauftragter, horizontal="left")
+
+    r1, c1, r2, c2 = layout.description_block
+    if text_in:
+        plan.image = _description_image_spec(layout, text_in)
+    if plan.image:
+        plan.put(r1, c1, "", wrap=False, align_left=True, valign_top=True)
+    else:
+        plan.put(r1, c1+1, text_in, wrap=True, align_left=True, valign_top=True)
+
+    pos = layout.header; row = layout.data_start_row
+    vorhaltung_col = pos.get("vorhaltung_col", None)
+    total_hours = 0.0
+    for (vn, nn, aw, bg, en, vh) in workers:
+        plan.put(row, pos["name_col"], nn, wrap=False, align_left=True)
+        plan.put(row, pos["vorname_col"], vn, wrap=False, align_left=True)
+        plan.put(row, pos["ausweis_col"], aw, wrap=False, align_left=True)
+        plan.put(row, pos["beginn_col"], bg, wrap=False, align_left=True)
+        plan.put(row, pos["ende_col"], en, wrap=False, align_left=True)
+        if vorhaltung_col and (vh or "").strip():
+            plan.put(row, vorhaltung_col, vh, wrap=True, align_left=True, valign_top=True)
+        hb = parse_hhmm(bg); he = parse_hhmm(en)
+        h = round(hours_with_breaks(hb, he, int(break_minutes)), 2)
+        total_hours += h; plan.put(row, pos["stunden_col"], h, wrap=False, align_left=True); row += 1
+
+    if layout.stunden_total:
+        tr, tc = layout.stunden_total; plan.put(tr, tc, round(total_hours, 2), wrap=False, align_left=True)
+    if layout.right_of_label:
+        rr, rc = layout.right_of_label; plan.put(rr, rc, "", wrap=False, align_left=True)
+    plan.total_hours = total_hours
+    return plan
+
+def apply_description_row_heights(ws):
+    r1, _, r2, _ = find_description_block(ws)
+    for r in range(r1, r2 + 1):
+        if ws.row_dimensions.get(r) is None or ws.row_dimensions[r].height is None:
+            ws.row_dimensions[r].height = 22
+
+def apply_excel_plan(ws, plan: ExcelPlan):
+    """openpyxl-es motor: a terv cellaírásai a set_text() szemantikájával."""
+    for (r, c, value, wrap, horizontal, vertical) in plan.writes:
+        cell = ws.cell(row=r, column=c)
+        cell.value = value
+        cell.alignment = Alignment(wrap_text=wrap, horizontal=horizontal,
+                                   vertical=(vertical or cell.alignment.vertical or "center"))
+    if plan.image:
+        png, ar, ac, _, _ = plan.image
+        ws.add_image(XLImage(BytesIO(png)), f"{get_column_letter(ac)}{ar}")
+    try:
+        set_print_defaults(ws, plan.print_area())
+    except Exception as e:
+        print("PRINT SETUP WARN:", repr(e))
+
+def _build_pdf_preview(date_text, bau, basf_beauftragter, beschreibung, layout, workers, total_hours):
     if not (REPORTLAB_AVAILABLE and PIL_AVAILABLE):
         raise RuntimeError("ReportLab/PIL missing")
     from reportlab.pdfgen import canvas
@@ -487,17 +899,14 @@ def _build_pdf_preview(date_text, bau, basf_beauftragter, beschreibung, ws, r1,
         c.drawString(margin_left, y, f"BASF Beauftragter: {basf_beauftragter}"); y -= 10
     y -= 6
 
-    block_w_px, block_h_px = _get_block_pixel_size(ws, r1, c1, r2, c2)
-    colA_w_px = _get_col_pixel_width(ws, 1)
-    new_w_px = max(40, block_w_px - colA_w_px - LEFT_INSET_PX)
-    new_h_px = int(block_h_px * BOTTOM_CROP)
-    pil_img = _make_description_image(beschreibung or "", new_w_px, new_h_px)
+    new_w_px, new_h_px = layout.description_image_size
+    png = render_description_png(beschreibung or "", new_w_px, new_h_px)
     w_pt = new_w_px * 0.75; h_pt = new_h_px * 0.75
     max_w_pt = pw - margin_left - margin_right
     if w_pt > max_w_pt:
         scale = max_w_pt / w_pt; w_pt *= scale; h_pt *= scale
     y -= h_pt
-    c.drawImage(ImageReader(pil_img), margin_left, y, width=w_pt, height=h_pt, preserveAspectRatio=True, mask='auto'); y -= 12
+    c.drawImage(ImageReader(BytesIO(png)), margin_left, y, width=w_pt, height=h_pt, preserveAspectRatio=True, mask='auto'); y -= 12
 
     c.setFont("Helvetica-Bold", 11)
     headers = ["Name", "Vorname", "Ausweis", "Beginn", "Ende", "Stunden", "Vorhaltung"]
@@ -520,6 +929,125 @@ def _build_pdf_preview(date_text, bau, basf_beauftragter, beschreibung, ws, r1,
     y -= 6; c.setFont("Helvetica-Bold", 11); c.drawString(margin_left, y, f"Gesamtstunden: {total_hours:.2f}")
     c.showPage(); c.save(); buf.seek(0); return buf.read()
 
+# ---------- Sablon (GP-t.xlsx) gyorsítótár ----------
+TEMPLATE_PATH = BASE_DIR / "GP-t.xlsx"
+# "openpyxl" (alapértelmezett) vagy "ooxml" (közvetlen XML-foltozás, lásd app/xlsx_patch.py)
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "openpyxl").strip().lower()
+
+class CompiledTemplate:
+    """
+    A GP-t.xlsx egyszer beolvasott ("lefordított") állapota.
+    A munkafüzetet pickle-blobként tartjuk, kérésenként ebből készül olcsó,
+    független másolat – így nem kell minden beküldésnél újra feldolgozni az OOXML csomagot.
+    """
+
+    def __init__(self, path: Path, mtime_ns: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        data = path.read_bytes()
+        wb = load_workbook(BytesIO(data))
+        self._blob = pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+        # az elrendezést egy eldobható másolaton számoljuk ki egyszer (a pásztázás cellákat hoz létre)
+        ws = self.clone().active
+        apply_description_row_heights(ws)
+        self.layout = TemplateLayout(ws)
+        self.patch = None
+        if EXCEL_ENGINE == "ooxml":
+            try:
+                r1, _, r2, _ = self.layout.description_block
+                heights = {r: 22 for r in range(r1, r2 + 1)}
+                self.patch = PatchTemplate(data, default_row_heights=heights)
+            except Exception as e:
+                print("OOXML engine: template not supported, using openpyxl:", repr(e))
+
+    def clone(self):
+        return pickle.loads(self._blob)
+
+_TEMPLATE: Optional[CompiledTemplate] = None
+_TEMPLATE_LOCK = threading.Lock()
+
+def get_template() -> CompiledTemplate:
+    """Visszaadja a gyorsítótárazott sablont; ha a fájl mtime-ja változott, újrafordítja."""
+    global _TEMPLATE
+    mtime_ns = TEMPLATE_PATH.stat().st_mtime_ns
+    tpl = _TEMPLATE
+    if tpl is not None and tpl.mtime_ns == mtime_ns:
+        return tpl
+    with _TEMPLATE_LOCK:
+        if _TEMPLATE is None or _TEMPLATE.mtime_ns != mtime_ns:
+            _TEMPLATE = CompiledTemplate(TEMPLATE_PATH, mtime_ns)
+            print(f"Template cache: compiled {TEMPLATE_PATH.name} (mtime_ns={mtime_ns})")
+        return _TEMPLATE
+
+def render_excel(tpl: CompiledTemplate, plan: ExcelPlan) -> bytes:
+    if tpl.patch is not None:
+        try:
+            return tpl.patch.render(plan.writes, plan.image, plan.print_area())
+        except Exception as e:
+            print("OOXML engine fallback to openpyxl:", repr(e))
+    wb = tpl.clone(); ws = wb.active
+    apply_description_row_heights(ws)
+    apply_excel_plan(ws, plan)
+    buf = BytesIO(); wb.save(buf)
+    return buf.getvalue()
+
+try:
+    get_template()
+except Exception as e:
+    print("Template cache warmup failed:", repr(e))
+
+# ---------- Generáló folyamatkészlet (CPU-igényes rész az eseményhurkon kívül) ----------
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+GEN_WORKERS = _env_int("GEN_WORKERS", min(4, os.cpu_count() or 1))   # 0 = szálkészlet, nincs külön folyamat
+GEN_QUEUE_MAX = _env_int("GEN_QUEUE_MAX", max(4, 4 * max(1, GEN_WORKERS)))
+GEN_RETRY_AFTER = _env_int("GEN_RETRY_AFTER", 5)
+gen_pool = GenerationPool(GEN_WORKERS, GEN_QUEUE_MAX, GEN_RETRY_AFTER)
+
+def excel_job(date_text, bau, basf_beauftragter, text_in, workers, break_minutes) -> bytes:
+    """A generáló worker-ben fut: terv + renderelés a (forkkal örökölt) lefordított sablonból."""
+    tpl = get_template()
+    plan = build_excel_plan(tpl.layout, date_text, bau, basf_beauftragter, text_in, workers, break_minutes)
+    return render_excel(tpl, plan)
+
+def pdf_job(date_text, bau, basf_beauftragter, beschreibung, workers, total_hours) -> bytes:
+    return _build_pdf_preview(
+        date_text=date_text, bau=bau, basf_beauftragter=basf_beauftragter, beschreibung=beschreibung,
+        layout=get_template().layout, workers=workers, total_hours=total_hours
+    )
+
+def _busy_response(e: GenerationBusy):
+    return PlainTextResponse(
+        "Zu viele gleichzeitige Anfragen – bitte in einigen Sekunden erneut versuchen.",
+        status_code=503, headers={"Retry-After": str(e.retry_after), "Cache-Control": "no-store"},
+    )
+
+@app.on_event("startup")
+async def _gen_pool_startup():
+    try:
+        gen_pool.start()
+    except Exception as e:
+        print("Generation pool start failed:", repr(e))
+
+@app.on_event("shutdown")
+async def _gen_pool_shutdown():
+    gen_pool.shutdown()
+
+@app.on_event("startup")
+async def _drive_outbox_startup():
+    if DRIVE_ENABLED:
+        drive_outbox.start()
+
+@app.on_event("shutdown")
+async def _drive_outbox_shutdown():
+    await drive_outbox.stop()
+    shard_router.close_all()
+    storage.close()
+
 # ---------- User Login / Logout ----------
 @app.get("/login", response_class=HTMLResponse)
 async def login_form(request: Request, next: str = "/"):
@@ -564,20 +1092,10 @@ async def home(request: Request):
     return templates.TemplateResponse("home.html", {"request": request})
 
 # ---------- Dolgozói űrlap – statikus index.html szolgálása, BŐVÍTETT INJEKCIÓVAL ----------
-@app.get("/form", response_class=HTMLResponse)
-async def form_page_static(request: Request):
-    if not _is_user(request):
-        return RedirectResponse("/login?next=/form", status_code=303)
-
-    lang = (request.query_params.get("lang") or "").strip().lower() or "de"
-    app_dir = Path(__file__).resolve().parent
-    static_index = app_dir / "static" / "index.html"
-
-    try:
-        html = static_index.read_text(encoding="utf-8", errors="ignore")
-    except Exception as e:
-        return PlainTextResponse(f"index.html not found: {e}", status_code=500)
+FORM_INDEX_PATH = Path(__file__).resolve().parent / "static" / "index.html"
+FORM_LANG_RE = re.compile(r"^[a-z]{2,3}(?:-[a-z0-9]{2,8})?$")
 
+def _build_form_page(html: str, lang: str) -> str:
     # INJEKCIÓ – pótolja a jellemzően Jinja-ból érkező globálokat
     inject = (
         "<script>(function(){try{"
@@ -600,12 +1118,39 @@ async def form_page_static(request: Request):
         "})();</script>"
     )
 
+    html = static_assets.rewrite_html(html)   # /static/… → hash-elt, immutable URL-ek
     if "</head>" in html:
-        html = html.replace("</head>", inject + safety + "</head>", 1)
-    else:
-        html = inject + safety + html
+        return html.replace("</head>", inject + safety + "</head>", 1)
+    return inject + safety + html
 
-    return HTMLResponse(html, media_type="text/html; charset=utf-8")
+# nyelvenként egyszer felépítve, előtömörítve (gzip/br), erős ETag-gel; az index.html mtime-ja érvényteleníti
+try:
+    FORM_CACHE_RECHECK_S = float(os.getenv("FORM_CACHE_RECHECK_S", "2"))
+except Exception:
+    FORM_CACHE_RECHECK_S = 2.0
+form_page_cache = PageCache(FORM_INDEX_PATH, _build_form_page, recheck_s=FORM_CACHE_RECHECK_S,
+                            depends=static_assets.refresh)
+
+@app.get("/form", response_class=HTMLResponse)
+async def form_page_static(request: Request):
+    if not _is_user(request):
+        return RedirectResponse("/login?next=/form", status_code=303)
+
+    lang = (request.query_params.get("lang") or "").strip().lower() or "de"
+    if not FORM_LANG_RE.match(lang):
+        lang = "de"
+    try:
+        page = form_page_cache.fresh(lang) or await run_in_threadpool(form_page_cache.get, lang)
+    except Exception as e:
+        return PlainTextResponse(f"index.html not found: {e}", status_code=500)
+
+    body, encoding, etag = page.select(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), page.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="text/html; charset=utf-8", headers=headers)
 
 # ---------- Excel generálás + DB mentés + Drive feltöltés ----------
 @app.post("/generate_excel")
@@ -626,32 +1171,12 @@ async def generate_excel(
     if not _is_user(request):
         return RedirectResponse("/login?next=/", status_code=303)
 
-    wb = load_workbook(os.path.join(os.getcwd(), "GP-t.xlsx")); ws = wb.active
-
     date_text = datum
     try:
         dt = datetime.strptime(datum.strip(), "%Y-%m-%d"); date_text = dt.strftime("%d.%m.%Y")
     except Exception:
         pass
-    set_text_addr(ws, "B2", date_text, horizontal="left")
-    set_text_addr(ws, "B3", bau,        horizontal="left")
-    if (basf_beauftragter or "").strip():
-        set_text_addr(ws, "E3", basf_beauftragter, horizontal="left")
-
-    r1, c1, r2, c2 = find_description_block(ws)
-    for r in range(r1, r2 + 1):
-        if ws.row_dimensions.get(r) is None or ws.row_dimensions[r].height is None:
-            ws.row_dimensions[r].height = 22
-
-    inserted = False
     text_in = (beschreibung or "").strip()
-    if text_in:
-        inserted = insert_description_as_image(ws, r1, c1, r2, c2, text_in)
-    if not inserted:
-        set_text(ws, r1, c1+1, text_in, wrap=True, align_left=True, valign_top=True)
-
-    pos = find_header_positions(ws); row = pos["data_start_row"]
-    vorhaltung_col = pos.get("vorhaltung_col", None)
 
     workers: List[Tuple[str,str,str,str,str,str]] = []
     for i in range(1, 6):
@@ -664,42 +1189,12 @@ async def generate_excel(
         if not (vn or nn or aw or bg or en or vh): continue
         workers.append((vn, nn, aw, bg, en, vh))
 
-    total_hours = 0.0
-    for (vn, nn, aw, bg, en, vh) in workers:
-        set_text(ws, row, pos["name_col"], nn, wrap=False, align_left=True)
-        set_text(ws, row, pos["vorname_col"], vn, wrap=False, align_left=True)
-        set_text(ws, row, pos["ausweis_col"], aw, wrap=False, align_left=True)
-        set_text(ws, row, pos["beginn_col"], bg, wrap=False, align_left=True)
-        set_text(ws, row, pos["ende_col"], en, wrap=False, align_left=True)
-        if vorhaltung_col and (vh or "").strip():
-            set_text(ws, row, vorhaltung_col, vh, wrap=True, align_left=True, valign_top=True)
-        hb = parse_hhmm(bg); he = parse_hhmm(en)
-        h = round(hours_with_breaks(hb, he, int(break_minutes)), 2)
-        total_hours += h; set_text(ws, row, pos["stunden_col"], h, wrap=False, align_left=True); row += 1
-
-    right_of_label, stunden_total = find_total_cells(ws, pos["stunden_col"])
-    if stunden_total:
-        tr, tc = stunden_total; set_text(ws, tr, tc, round(total_hours, 2), wrap=False, align_left=True)
-    if right_of_label:
-        rr, rc = right_of_label; set_text(ws, rr, rc, "", wrap=False, align_left=True)
-
     try:
-        set_print_defaults(ws)
-    except Exception as e:
-        print("PRINT SETUP WARN:", repr(e))
+        excel_bytes = await gen_pool.run(excel_job, date_text, bau, basf_beauftragter, text_in, workers, int(break_minutes))
+    except GenerationBusy as e:
+        return _busy_response(e)
 
     excel_name = f"leistungsnachweis_{uuid.uuid4().hex[:8]}.xlsx"
-    excel_path = GEN_DIR / excel_name
-    wb.save(excel_path.as_posix())
-    with open(excel_path, "rb") as f:
-        excel_bytes = f.read()
-
-    drive_file_id = drive_upload_bytes(
-        filename=excel_name,
-        data=excel_bytes,
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
     payload = {
         "datum": datum, "bau": bau, "basf_beauftragter": basf_beauftragter,
         "beschreibung": text_in,
@@ -710,39 +1205,20 @@ async def generate_excel(
              "ende": locals().get(f"ende{i}", ""), "vorhaltung": locals().get(f"vorhaltung{i}", "")}
             for i in range(1, 6)
         ],
-        "drive_file_id": drive_file_id
+        "drive_file_id": None
     }
-    with db_conn() as c:
-        c.execute("""
-            INSERT INTO submissions (
-                created_at, datum, bau, basf_beauftragter, beschreibung, break_minutes,
-                vorname1, nachname1, ausweis1, beginn1, ende1, vorhaltung1,
-                vorname2, nachname2, ausweis2, beginn2, ende2, vorhaltung2,
-                vorname3, nachname3, ausweis3, beginn3, ende3, vorhaltung3,
-                vorname4, nachname4, ausweis4, beginn4, ende4, vorhaltung4,
-                vorname5, nachname5, ausweis5, beginn5, ende5, vorhaltung5,
-                excel_filename, payload_json
-            ) VALUES (
-                ?,?,?,?,?,?,
-                ?,?,?,?,?,?,
-                ?,?,?,?,?,?,
-                ?,?,?,?,?,?,
-                ?,?,?,?,?,?,
-                ?,?,?,?,?,?,
-                ?,?
-            )
-        """, (
-            datetime.utcnow().isoformat(),
-            datum, bau, basf_beauftragter, payload.get("beschreibung",""), int(break_minutes),
-            locals().get("vorname1",""), locals().get("nachname1",""), locals().get("ausweis1",""), locals().get("beginn1",""), locals().get("ende1",""), locals().get("vorhaltung1",""),
-            locals().get("vorname2",""), locals().get("nachname2",""), locals().get("ausweis2",""), locals().get("beginn2",""), locals().get("ende2",""), locals().get("vorhaltung2",""),
-            locals().get("vorname3",""), locals().get("nachname3",""), locals().get("ausweis3",""), locals().get("beginn3",""), locals().get("ende3",""), locals().get("vorhaltung3",""),
-            locals().get("vorname4",""), locals().get("nachname4",""), locals().get("ausweis4",""), locals().get("beginn4",""), locals().get("ende4",""), locals().get("vorhaltung4",""),
-            locals().get("vorname5",""), locals().get("nachname5",""), locals().get("ausweis5",""), locals().get("beginn5",""), locals().get("ende5",""), locals().get("vorhaltung5",""),
-            excel_name, json.dumps(payload, ensure_ascii=False)
-        ))
-
-    sync_db_to_drive()
+    values = [
+        datetime.utcnow().isoformat(),
+        datum, bau, basf_beauftragter, payload.get("beschreibung",""), int(break_minutes),
+        locals().get("vorname1",""), locals().get("nachname1",""), locals().get("ausweis1",""), locals().get("beginn1",""), locals().get("ende1",""), locals().get("vorhaltung1",""),
+        locals().get("vorname2",""), locals().get("nachname2",""), locals().get("ausweis2",""), locals().get("beginn2",""), locals().get("ende2",""), locals().get("vorhaltung2",""),
+        locals().get("vorname3",""), locals().get("nachname3",""), locals().get("ausweis3",""), locals().get("beginn3",""), locals().get("ende3",""), locals().get("vorhaltung3",""),
+        locals().get("vorname4",""), locals().get("nachname4",""), locals().get("ausweis4",""), locals().get("beginn4",""), locals().get("ende4",""), locals().get("vorhaltung4",""),
+        locals().get("vorname5",""), locals().get("nachname5",""), locals().get("ausweis5",""), locals().get("beginn5",""), locals().get("ende5",""), locals().get("vorhaltung5",""),
+    ]
+    # fájl + Drive + sqlite szinkron I/O: szálkészletben, hogy ne álljon meg az eseményhurok
+    store = await _request_storage(request)
+    await run_in_threadpool(store_excel_submission, excel_name, excel_bytes, payload, values, store)
 
     headers = {
         "Content-Disposition": f'attachment; filename="{excel_name}"',
@@ -751,6 +1227,218 @@ async def generate_excel(
     }
     return Response(content=excel_bytes, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
 
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _submission_row(excel_name: str, payload: dict, values: list) -> dict:
+    row = dict(zip(SUBMISSION_COLUMNS, (*values, excel_name, json.dumps(payload, ensure_ascii=False))))
+    row["workers"] = submission_worker_rows(row)   # ugyanabban a tranzakcióban kerül a submission_workers-be
+    return row
+
+def store_excel_submission(excel_name: str, excel_bytes: bytes, payload: dict, values: list, store=None):
+    """values: a submissions-sor mezői created_at-tól vorhaltung5-ig (excel_filename/payload_json nélkül).
+    store: a kérés tenantjának tárolója (shard); alapból a vezérlő tároló."""
+    store = store or storage
+    (GEN_DIR / excel_name).write_bytes(excel_bytes)
+    # a Drive-azonosító a háttérfeltöltés után az outboxból olvasható ki (admin_view)
+    store.insert_submission(_submission_row(excel_name, payload, values))
+
+    if DRIVE_ENABLED:
+        drive_outbox.enqueue("file", excel_name, mime=XLSX_MIME, path=str(GEN_DIR / excel_name))
+    schedule_db_sync(store)
+
+def submission_worker_rows(sub) -> List[dict]:
+    """A lapos vorname1..vorhaltung5 mezőkből normalizált dolgozósorok, kiszámolt órákkal.
+    Az új beküldés dict-jére és a régi DB-sorokra (backfill) egyaránt működik."""
+    try:
+        break_minutes = int(sub["break_minutes"] if sub["break_minutes"] is not None else 60)
+    except (TypeError, ValueError):
+        break_minutes = 60
+    out = []
+    for i in range(1, 6):
+        vn, nn, aw, bg, en, vh = (sub[f"{f}{i}"] or "" for f in ("vorname", "nachname", "ausweis", "beginn", "ende", "vorhaltung"))
+        if not (vn or nn or aw or bg or en or vh):
+            continue
+        try:
+            hours = round(hours_with_breaks(parse_hhmm(bg), parse_hhmm(en), break_minutes), 2)
+        except Exception:
+            hours = 0.0
+        out.append({"slot": i, "vorname": vn, "nachname": nn, "ausweis": aw, "beginn": bg, "ende": en,
+                    "vorhaltung": vh, "hours": hours})
+    return out
+
+def _backfill_submission_workers():
+    try:
+        n = storage.backfill_submission_workers(submission_worker_rows)
+        if n:
+            print(f"submission_workers backfill: {n} submissions migrated")
+            schedule_db_sync()
+    except Exception as e:
+        print("submission_workers backfill failed:", repr(e))
+
+@app.on_event("startup")
+async def _submission_workers_backfill_startup():
+    # a háttérszálban futó migráció nem tartja fel az indulást; kötegenként commitol
+    threading.Thread(target=_backfill_submission_workers, name="sw-backfill", daemon=True).start()
+
+# ---------- Batch generálás (JSON → zip) ----------
+BATCH_MAX = _env_int("BATCH_MAX", 50)
+SLOT_FIELDS = ("vorname", "nachname", "ausweis", "beginn", "ende", "vorhaltung")
+
+class _ZipStream:
+    """Nem kereshető (unseekable) célfájl a zipfile-nak: a kiírt bájtokat gyűjti, drain() üríti."""
+    def __init__(self):
+        self._parts = []
+    def write(self, b):
+        self._parts.append(bytes(b)); return len(b)
+    def flush(self):
+        pass
+    def drain(self) -> bytes:
+        data = b"".join(self._parts); self._parts = []
+        return data
+
+def _batch_item(raw: dict) -> dict:
+    """Egy JSON-tétel ellenőrzése és normalizálása (ugyanazok a mezők, mint a /generate_excel formon)."""
+    if not isinstance(raw, dict):
+        raise ValueError("item must be an object")
+    datum = str(raw.get("datum") or "").strip()
+    bau = str(raw.get("bau") or "").strip()
+    if not datum or not bau:
+        raise ValueError("datum and bau are required")
+    workers_in = raw.get("workers") or []
+    if not isinstance(workers_in, list) or len(workers_in) > 5:
+        raise ValueError("workers must be a list of at most 5 entries")
+    slots = [{f: str((w or {}).get(f) or "") for f in SLOT_FIELDS} for w in workers_in]
+    slots += [{f: "" for f in SLOT_FIELDS} for _ in range(5 - len(slots))]
+    try:
+        break_minutes = int(raw.get("break_minutes", 60))
+    except (TypeError, ValueError):
+        raise ValueError("break_minutes must be an integer")
+    return {"datum": datum, "bau": bau, "basf_beauftragter": str(raw.get("basf_beauftragter") or ""),
+            "beschreibung": str(raw.get("beschreibung") or "").strip(), "break_minutes": break_minutes, "slots": slots}
+
+def _batch_job_args(item: dict) -> tuple:
+    date_text = item["datum"]
+    try:
+        date_text = datetime.strptime(item["datum"], "%Y-%m-%d").strftime("%d.%m.%Y")
+    except Exception:
+        pass
+    workers = [tuple(s[f] for f in SLOT_FIELDS) for s in item["slots"] if any(s.values())]
+    return (date_text, item["bau"], item["basf_beauftragter"], item["beschreibung"], workers, item["break_minutes"])
+
+def _batch_payload_values(item: dict):
+    payload = {k: item[k] for k in ("datum", "bau", "basf_beauftragter", "beschreibung", "break_minutes")}
+    payload["workers"] = item["slots"]
+    payload["drive_file_id"] = None
+    values = [datetime.utcnow().isoformat(), item["datum"], item["bau"], item["basf_beauftragter"],
+              item["beschreibung"], item["break_minutes"]]
+    for s_ in item["slots"]:
+        values += [s_[f] for f in SLOT_FIELDS]
+    return payload, values
+
+def store_excel_batch(done: List[tuple], store=None) -> List[int]:
+    """done: (excel_name, payload, values) – egy tranzakció az összes sorra, egy összevont DB-szinkron."""
+    store = store or storage
+    ids = store.insert_submissions([_submission_row(n, p, v) for n, p, v in done])
+    if DRIVE_ENABLED:
+        for name, _, _ in done:
+            drive_outbox.enqueue("file", name, mime=XLSX_MIME, path=str(GEN_DIR / name))
+    schedule_db_sync(store)
+    return ids
+
+@app.post("/api/generate_batch")
+async def generate_batch(request: Request, payload: dict = Body(...)):
+    """
+    {"submissions": [{datum, bau, basf_beauftragter, beschreibung, break_minutes,
+                      workers: [{vorname, nachname, ausweis, beginn, ende, vorhaltung}, ...]}, ...]}
+    → zip, a fájlok elkészülési sorrendjében streamelve; a végén manifest.json (id-k, hibák).
+    """
+    if not _is_user(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    raw_items = payload.get("submissions")
+    if not isinstance(raw_items, list) or not raw_items:
+        return JSONResponse({"detail": "submissions must be a non-empty list"}, status_code=400)
+    if len(raw_items) > BATCH_MAX:
+        return JSONResponse({"detail": f"at most {BATCH_MAX} submissions per batch"}, status_code=400)
+    try:
+        items = [_batch_item(x) for x in raw_items]
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+
+    # beengedés: egyszerre legfeljebb annyi dokumentum fut, ahány generáló worker van; ezeket a
+    # helyeket előre lefoglaljuk, így a batch nem kap GenerationBusy-t és a többi kérést sem szorítja ki
+    parallel = max(1, gen_pool.workers)
+    try:
+        reservation = gen_pool.reserve(parallel)
+    except GenerationBusy as e:
+        return _busy_response(e)
+    try:
+        store = await _request_storage(request)
+    except Exception:
+        reservation.release()
+        raise
+
+    async def body():
+        sem = asyncio.Semaphore(parallel)
+
+        async def one(idx, item):
+            async with sem:
+                try:
+                    return idx, await gen_pool.run(excel_job, *_batch_job_args(item), reservation=reservation), None
+                except Exception as e:
+                    return idx, None, repr(e)
+
+        out = _ZipStream()
+        zf = zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED)   # az xlsx már tömörített
+        done, manifest = [], []
+        tasks = [asyncio.ensure_future(one(i, it)) for i, it in enumerate(items)]
+        storing = False
+        try:
+            for fut in asyncio.as_completed(tasks):
+                idx, data, err = await fut
+                if err is not None:
+                    manifest.append({"index": idx, "error": err})
+                    continue
+                name = f"leistungsnachweis_{uuid.uuid4().hex[:8]}.xlsx"
+                await run_in_threadpool((GEN_DIR / name).write_bytes, data)
+                p, v = _batch_payload_values(items[idx])
+                done.append((name, p, v))
+                zf.writestr(name, data)
+                manifest.append({"index": idx, "file": name})
+                yield out.drain()
+            reservation.release()
+            if done:
+                storing = True
+                try:
+                    ids = await run_in_threadpool(store_excel_batch, done, store)
+                    by_name = {n: sid for (n, _, _), sid in zip(done, ids)}
+                    for m_ in manifest:
+                        if "file" in m_:
+                            m_["id"] = by_name.get(m_["file"])
+                except Exception as e:
+                    print("Batch store failed:", repr(e))
+                    manifest.append({"error": f"store failed: {e!r}"})
+            manifest.sort(key=lambda m_: m_.get("index", len(items)))
+            zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=1))
+            zf.close()
+            yield out.drain()
+        finally:
+            # kliens-bontás: a hátralévő munkák leállnak, a foglalás felszabadul, és a még
+            # el nem mentett (adatbázisba nem került) fájlok nem maradnak árván a GEN_DIR-ben
+            for t in tasks:
+                t.cancel()
+            reservation.release()
+            if not storing:
+                for name, _, _ in done:
+                    try:
+                        (GEN_DIR / name).unlink(missing_ok=True)
+                    except Exception as e:
+                        print("Batch cleanup failed:", name, repr(e))
+
+    return StreamingResponse(body(), media_type="application/zip", headers={
+        "Content-Disposition": f'attachment; filename="leistungsnachweise_{uuid.uuid4().hex[:6]}.zip"',
+        "Cache-Control": "no-store",
+    })
+
 # ---------- PDF előnézet ----------
 @app.post("/generate_pdf")
 async def generate_pdf(
@@ -759,7 +1447,7 @@ async def generate_pdf(
     bau: str = Form(...),
     basf_beauftragter: str = Form(""),
     geraet: str = Form(""),
-    beschrijving: str = Form(""),
+    beschreibung: str = Form(""),
     break_minutes: int = Form(60),
     vorname1: str = Form(""), nachname1: str = Form(""), ausweis1: str = Form(""), beginn1: str = Form(""), ende1: str = Form(""), vorhaltung1: str = Form(""),
     vorname2: str = Form(""), nachname2: str = Form(""), ausweis2: str = Form(""), beginn2: str = Form(""), ende2: str = Form(""), vorhaltung2: str = Form(""),
@@ -772,14 +1460,12 @@ async def generate_pdf(
     if not (REPORTLAB_AVAILABLE and PIL_AVAILABLE):
         return PlainTextResponse("PDF előállítás nem elérhető (telepítsd: reportlab, pillow).", status_code=501)
 
-    wb = load_workbook(os.path.join(os.getcwd(), "GP-t.xlsx")); ws = wb.active
     date_text = datum
     try:
         dt = datetime.strptime(datum.strip(), "%Y-%m-%d"); date_text = dt.strftime("%d.%m.%Y")
     except Exception:
         pass
 
-    r1, c1, r2, c2 = find_description_block(ws)
     workers = []
     for i in range(1, 6):
         vn = locals().get(f"vorname{i}", "") or ""
@@ -795,10 +1481,10 @@ async def generate_pdf(
     for (_, _, _, bg, en, _) in workers:
         hb = parse_hhmm(bg); he = parse_hhmm(en); total_hours += hours_with_breaks(hb, he, int(break_minutes))
 
-    pdf_bytes = _build_pdf_preview(
-        date_text=date_text, bau=bau, basf_beauftragter=basf_beauftragter, beschrijving=beschrijving,
-        ws=ws, r1=r1, c1=c1, r2=r2, c2=c2, workers=workers, total_hours=total_hours
-    )
+    try:
+        pdf_bytes = await gen_pool.run(pdf_job, date_text, bau, basf_beauftragter, (beschreibung or "").strip(), workers, total_hours)
+    except GenerationBusy as e:
+        return _busy_response(e)
 
     fname = f"leistungsnachweis_preview_{uuid.uuid4().hex[:8]}.pdf"
     headers = {"Content-Disposition": f'attachment; filename="{fname}"', "Content-Length": str(len(pdf_bytes)), "Cache-Control": "no-store"}
@@ -825,10 +1511,65 @@ def _headers_for(endpoint: str, base_headers: dict | None = None) -> dict:
         base.setdefault("Host", LT_VIRTUAL_HOST or "libretranslate.com")
     return base
 
+# Közös, hosszú életű async kliens: végpontonként (origin) megmaradó keep-alive kapcsolatok,
+# így a fordítás nem fizeti minden kattintásnál a TCP+TLS felépítést, és nem blokkolja a hurkot.
+TRANSLATE_HTTP2 = os.getenv("TRANSLATE_HTTP2", "0").strip().lower() in ("1", "true", "yes", "on")
+TRANSLATE_MAX_CONNECTIONS = _env_int("TRANSLATE_MAX_CONNECTIONS", 20)
+TRANSLATE_KEEPALIVE = _env_int("TRANSLATE_KEEPALIVE", 10)
+_translator_http: Optional[httpx.AsyncClient] = None
+
+def _new_translator_http() -> httpx.AsyncClient:
+    http2 = TRANSLATE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx[http2])
+        except ImportError:
+            print("Translator HTTP/2 requested but the 'h2' package is missing – using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2, follow_redirects=True, timeout=LT_TIMEOUT,
+        limits=httpx.Limits(max_connections=TRANSLATE_MAX_CONNECTIONS,
+                            max_keepalive_connections=TRANSLATE_KEEPALIVE, keepalive_expiry=60.0),
+    )
+
+def translator_http() -> httpx.AsyncClient:
+    global _translator_http
+    if _translator_http is None or _translator_http.is_closed:
+        _translator_http = _new_translator_http()   # induláson kívül (pl. szkriptből) lustán
+    return _translator_http
+
+@app.on_event("startup")
+async def _translator_http_startup():
+    translator_http()
+
+@app.on_event("shutdown")
+async def _translator_http_shutdown():
+    global _translator_http
+    cli, _translator_http = _translator_http, None
+    if cli is not None:
+        await cli.aclose()
+
 def azure_ready() -> bool:
     return bool(AZURE_EP and AZURE_KEY and AZURE_RG)
 
-def _azure_translate(text: str, source: str, target: str, timeout: float = 12.0) -> str:
+# Azure /translate: egy kérésben legfeljebb 1000 elem és 50 000 karakter – óvatosabb korlátokkal daraboljuk
+AZURE_BATCH_ITEMS = 100
+AZURE_BATCH_CHARS = 40000
+
+async def _azure_translate(texts: List[str], source: str, target: str, timeout: float = 12.0) -> List[str]:
+    """Több szöveg egy (vagy néhány) kötegelt hívásban; az eredmény sorrendje a bemenetéé."""
+    out: List[str] = []
+    batch: List[str] = []; size = 0
+    for t in texts:
+        if batch and (len(batch) >= AZURE_BATCH_ITEMS or size + len(t) > AZURE_BATCH_CHARS):
+            out += await _azure_translate_batch(batch, source, target, timeout)
+            batch, size = [], 0
+        batch.append(t); size += len(t)
+    if batch:
+        out += await _azure_translate_batch(batch, source, target, timeout)
+    return out
+
+async def _azure_translate_batch(texts: List[str], source: str, target: str, timeout: float = 12.0) -> List[str]:
     if not azure_ready():
         raise RuntimeError("Azure translator not configured")
     url = f"{AZURE_EP}/translate"
@@ -840,39 +1581,172 @@ def _azure_translate(text: str, source: str, target: str, timeout: float = 12.0)
         "Accept": "application/json",
         "User-Agent": "pdf-edit/azure"
     }
-    body = [{"text": text}]
-    with httpx.Client(timeout=timeout, follow_redirects=True) as cli:
-        r = cli.post(f"{url}?{urlencode(qs)}", headers=headers, json=body)
+    body = [{"text": t} for t in texts]
+    r = await translator_http().post(f"{url}?{urlencode(qs)}", headers=headers, json=body, timeout=timeout)
     if r.status_code != 200:
         raise RuntimeError(f"Azure HTTP {r.status_code}: {(r.text or '')[:200]}")
     jr = r.json()
     try:
-        return jr[0]["translations"][0]["text"]
+        out = [item["translations"][0]["text"] for item in jr]
     except Exception:
         raise RuntimeError(f"Azure parse error: {jr}")
+    if len(out) != len(texts):
+        raise RuntimeError(f"Azure returned {len(out)} items for {len(texts)} texts")
+    return out
 
-def _lt_translate(text: str, source: str, target: str, timeout: float = 12.0) -> str:
-    eps = [e for e in [LT_ENDPOINT, LT_BACKUP_ENDPOINT] if e]
-    if not eps:
-        raise RuntimeError("LibreTranslate endpoint not configured")
+async def _lt_translate_one(ep: str, text: str, source: str, target: str, timeout: float = 12.0) -> str:
     base_headers = {"Accept": "application/json", "Content-Type": "application/json", "User-Agent": "pdf-edit/lt"}
     data = {"q": text, "source": source, "target": target, "format": "text"}
-    last = None
-    for ep in eps:
-        try:
-            headers = _headers_for(ep, base_headers)
-            with httpx.Client(timeout=timeout, follow_redirects=True) as cli:
-                r = cli.post(ep, headers=headers, json=data)
-            if r.status_code == 200:
-                jr = r.json()
-                for key in ("translatedText", "translation", "translated"):
-                    if isinstance(jr, dict) and isinstance(jr.get(key), str) and jr.get(key):
-                        return jr[key]
-                raise RuntimeError(f"LT parse error: {jr}")
-            last = f"LT HTTP {r.status_code}: {(r.text or '')[:200]}"
-        except Exception as e:
-            last = repr(e)
-    raise RuntimeError(last or "LT unknown error")
+    headers = _headers_for(ep, base_headers)
+    r = await translator_http().post(ep, headers=headers, json=data, timeout=timeout)
+    if r.status_code != 200:
+        raise RuntimeError(f"LT HTTP {r.status_code}: {(r.text or '')[:200]}")
+    jr = r.json()
+    for key in ("translatedText", "translation", "translated"):
+        if isinstance(jr, dict) and isinstance(jr.get(key), str) and jr.get(key):
+            return jr[key]
+    raise RuntimeError(f"LT parse error: {jr}")
+
+async def _lt_translate(ep: str, texts: List[str], source: str, target: str, timeout: float = 12.0) -> List[str]:
+    # a LibreTranslate q-ja egy szöveg: a szegmensek párhuzamosan mennek ugyanazon a kapcsolatkészleten
+    return list(await asyncio.gather(*(_lt_translate_one(ep, t, source, target, timeout) for t in texts)))
+
+# ---------- Fordító-lánc: Azure → LT primary → LT backup, megszakítókkal és fedezéssel ----------
+# TRANSLATE_HEDGE_MS: alapból 0 = nincs fedezés, csak hibánál/megszakítónál lép tovább a lánc.
+# Bekapcsolás: TRANSLATE_HEDGE_MS=3000 (ennyi ms válasz nélkül a következő végpont is indul) – csak
+# akkor érdemes, ha a tartalék végpont bírja a plusz kéréseket és az Azure-kvóta nem szűkös, mert
+# egy lassú kérés így két helyen is fut.
+# TRANSLATE_DEADLINE: a teljes lánc felső korlátja mp-ben (alapból LT_TIMEOUT, nem 3×LT_TIMEOUT);
+# fedezés nélkül a végpontok egymás után, a hátralévő idő rájuk eső részével próbálkoznak.
+try:
+    TRANSLATE_DEADLINE = float(os.getenv("TRANSLATE_DEADLINE", str(LT_TIMEOUT)))
+except Exception:
+    TRANSLATE_DEADLINE = LT_TIMEOUT
+TRANSLATE_HEDGE_MS = _env_int("TRANSLATE_HEDGE_MS", 0)
+BREAKER_FAILURES = _env_int("TRANSLATE_BREAKER_FAILURES", 3)
+BREAKER_RESET_S = _env_int("TRANSLATE_BREAKER_RESET_S", 30)
+TRANSLATE_PROBE_INTERVAL = _env_int("TRANSLATE_PROBE_INTERVAL", 15)
+
+translator_breakers = {
+    name: CircuitBreaker(name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_S)
+    for name in ("azure", "lt_primary", "lt_backup")
+}
+
+def _translator_backends() -> List[tuple]:
+    """(breaker-név, motor, hívás(texts, source, target, timeout) -> fordítások) – csak a beállított végpontok."""
+    out = []
+    if azure_ready():
+        out.append(("azure", "azure", _azure_translate))
+    for name, ep in (("lt_primary", LT_ENDPOINT), ("lt_backup", LT_BACKUP_ENDPOINT)):
+        if ep:
+            out.append((name, "libretranslate",
+                        lambda texts, source, target, timeout=LT_TIMEOUT, ep=ep: _lt_translate(ep, texts, source, target, timeout)))
+    return out
+
+async def _translate_chain(texts: List[str], source: str, target: str) -> Tuple[List[str], str, List[str]]:
+    """(fordítások, motor, a kihagyott/hibás végpontok üzenetei) vagy RuntimeError."""
+    backends = _translator_backends()
+    if not backends:
+        raise RuntimeError("no translator configured")
+    engines = {name: engine for name, engine, _ in backends}
+    chain = [(translator_breakers[name], (lambda fn=fn: fn(texts, source, target, timeout=LT_TIMEOUT)))
+             for name, _, fn in backends]
+    tr, br, errors = await run_hedged(chain, hedge_after=TRANSLATE_HEDGE_MS / 1000.0, deadline=TRANSLATE_DEADLINE)
+    return tr, engines[br.name], errors
+
+async def _probe_open_translators():
+    """Háttér-próba: a nyitott megszakítójú végpontokat egy rövid fordítással teszteli."""
+    while True:
+        await asyncio.sleep(TRANSLATE_PROBE_INTERVAL)
+        for name, _, fn in _translator_backends():
+            br = translator_breakers[name]
+            if not br.due_for_probe() or not br.allow():
+                continue
+            t0 = asyncio.get_running_loop().time()
+            try:
+                await fn(["test"], "en", "de", timeout=min(LT_TIMEOUT, 5.0))
+                br.record_success(asyncio.get_running_loop().time() - t0)
+                print(f"Translator breaker {name}: closed after probe")
+            except Exception as e:
+                br.record_failure(repr(e))
+
+_translator_probe_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def _translator_probe_startup():
+    global _translator_probe_task
+    if TRANSLATE_PROBE_INTERVAL > 0:
+        _translator_probe_task = asyncio.create_task(_probe_open_translators())
+
+@app.on_event("shutdown")
+async def _translator_probe_shutdown():
+    global _translator_probe_task
+    task, _translator_probe_task = _translator_probe_task, None
+    if task is not None:
+        task.cancel()
+
+# Fordítási gyorsítótár: LRU + data/translations.db. TRANSLATE_CACHE_ONLY=1: fordító nélkül, csak a cache-ből.
+TRANSLATE_CACHE_ONLY = os.getenv("TRANSLATE_CACHE_ONLY", "0").strip().lower() in ("1", "true", "yes", "on")
+translation_cache = TranslationCache(
+    DATA_DIR / "translations.db",
+    memory_items=_env_int("TRANSLATE_CACHE_MEMORY", 2048),
+    max_rows=_env_int("TRANSLATE_CACHE_MAX_ROWS", 50000),
+    ttl_seconds=_env_int("TRANSLATE_CACHE_TTL_DAYS", 90) * 86400,
+)
+
+# Helyi motor: glosszárium (Aho–Corasick) + jóváhagyott fordítások memóriája (n-gram index)
+GLOSSARY_PATH = Path(os.getenv("GLOSSARY_PATH", str(Path(__file__).resolve().parent / "glossary.json")))
+# 1.0 = csak pontos (normalizált) egyezés; < 1.0 bekapcsolja a szavankénti elgépelés-tűrést (pl. 0.9)
+try:
+    TM_MIN_SIMILARITY = float(os.getenv("TM_MIN_SIMILARITY", "1.0"))
+except Exception:
+    TM_MIN_SIMILARITY = 1.0
+
+def _load_glossary() -> GlossaryMatcher:
+    try:
+        terms = json.loads(GLOSSARY_PATH.read_text(encoding="utf-8"))
+        if isinstance(terms, dict):
+            return GlossaryMatcher({str(k): str(v) for k, v in terms.items()})
+        print("Glossary: expected a JSON object:", GLOSSARY_PATH)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print("Glossary load failed:", repr(e))
+    return GlossaryMatcher({})
+
+glossary = _load_glossary()
+translation_memory = TranslationMemory(DATA_DIR / "translations.db", min_similarity=TM_MIN_SIMILARITY)
+
+def _translate_local(segs: List[str], source: str, target: str) -> dict:
+    """{szegmens: (fordítás, motor)} – ami hálózat nélkül megvan (memóriából, mikroszekundumok alatt)."""
+    out = {}
+    for sg in segs:
+        tr = glossary.only_terms(sg)
+        if tr is not None:
+            out[sg] = (tr, "glossary"); continue
+        hit = translation_memory.lookup(sg, source, target)
+        if hit is not None:
+            out[sg] = (hit[0], "memory")
+    return out
+
+async def _translate_remote(texts: List[str], source: str, target: str) -> Tuple[List[str], str, List[str]]:
+    """A fordító-lánc, a glosszárium-kifejezések helyőrzővel védve; ahol a fordító elrontja
+    a helyőrzőt, azt a szegmenst védelem nélkül még egyszer lefordíttatjuk."""
+    protected = [glossary.protect(t) for t in texts]
+    trs, engine, errors = await _translate_chain([p for p, _ in protected], source, target)
+    out = []
+    retry = []
+    for i, ((_, targets), tr) in enumerate(zip(protected, trs)):
+        restored = restore_placeholders(tr, targets) if targets else tr
+        if restored is None:
+            retry.append(i)
+        out.append(restored)
+    if retry:
+        trs2, _, errors2 = await _translate_chain([texts[i] for i in retry], source, target)
+        for i, tr in zip(retry, trs2):
+            out[i] = tr
+        errors += errors2
+    return out, engine, errors
 
 @app.post("/api/translate")
 async def api_translate(payload: dict = Body(...)):
@@ -882,19 +1756,80 @@ async def api_translate(payload: dict = Body(...)):
     if not text:
         return JSONResponse({"translated": ""})
 
-    try:
-        tr = _azure_translate(text, source, target, timeout=LT_TIMEOUT)
-        return JSONResponse({"translated": tr, "engine": "azure"})
-    except Exception as e1:
-        err_az = repr(e1)
+    local = _translate_local([text], source, target)
+    if local:
+        tr, engine = local[text]
+        return JSONResponse({"translated": tr, "engine": engine, "local": True})
+    hit = await run_in_threadpool(translation_cache.get, text, source, target)
+    if hit is not None:
+        return JSONResponse({"translated": hit[0], "engine": hit[1], "cached": True})
+
+    # mondatokra/sorokra bontás: csak az ismeretlen (pl. szerkesztett) szegmensek mennek a fordítóhoz,
+    # ismétlés nélkül, egy kötegelt hívásban
+    pairs = split_segments(text)
+    segs = unique_segments(pairs)
+    local = _translate_local(segs, source, target)
+    known = await run_in_threadpool(translation_cache.get_many, [sg for sg in segs if sg not in local], source, target)
+    known.update(local)
+    missing = [sg for sg in segs if sg not in known]
+    translated = {sg: hit[0] for sg, hit in known.items()}
+    out = {"segments": len(segs), "cached_segments": len(known) - len(local), "local_segments": len(local)}
+    if missing and TRANSLATE_CACHE_ONLY:
+        return JSONResponse({"error": "Translation not cached (cache-only mode)", **out}, status_code=503)
+
+    engine = next(iter(known.values()))[1] if known else ""
+    if missing:
+        try:
+            trs, engine, errors = await _translate_remote(missing, source, target)
+            translated.update(zip(missing, trs))
+            await run_in_threadpool(translation_cache.put_many, dict(zip(missing, trs)), source, target, engine)
+            if errors:
+                out["errors"] = errors
+        except Exception as e:
+            # egyik fordító sem érhető el: a lejárt bejegyzés is jobb a semminél
+            stale = await run_in_threadpool(lambda: translation_cache.get_many(missing, source, target, allow_stale=True))
+            if len(stale) < len(missing):
+                return JSONResponse({"error": f"Translator error. {e}"}, status_code=502)
+            translated.update({sg: hit[0] for sg, hit in stale.items()})
+            out["stale"] = True
+    else:
+        out["cached"] = True
 
-    try:
-        tr = _lt_translate(text, source, target, timeout=LT_TIMEOUT)
-        return JSONResponse({"translated": tr, "engine": "libretranslate", "azure_error": err_az})
-    except Exception as e2:
-        err_lt = repr(e2)
+    tr = join_segments(pairs, translated)
+    if len(segs) > 1 and not out.get("stale"):
+        await run_in_threadpool(translation_cache.put, text, source, target, tr, engine)
+    return JSONResponse({"translated": tr, "engine": engine, **out})
 
-    return JSONResponse({"error": f"Translator error. azure={err_az}; lt={err_lt}"}, status_code=502)
+@app.get("/api/translate_cache_stats")
+async def translate_cache_stats(request: Request):
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    data = {"cache_only": TRANSLATE_CACHE_ONLY, **await run_in_threadpool(translation_cache.stats),
+            "memory": translation_memory.stats(), "glossary_terms": len(glossary.terms)}
+    return JSONResponse(data, headers={"Cache-Control": "no-store"})
+
+@app.post("/api/translation_memory")
+async def translation_memory_add(request: Request, payload: dict = Body(...)):
+    """
+    Jóváhagyott fordítások felvétele (admin):
+    {"source": "hr", "target": "de", "entries": [{"text": "...", "translated": "..."}, ...]}
+    """
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    source = (payload.get("source") or "hr").strip() or "hr"
+    target = (payload.get("target") or "de").strip() or "de"
+    entries = payload.get("entries")
+    if entries is None and payload.get("text"):
+        entries = [{"text": payload.get("text"), "translated": payload.get("translated")}]
+    if not isinstance(entries, list) or not entries:
+        return JSONResponse({"detail": "entries must be a non-empty list"}, status_code=400)
+    try:
+        for e in entries:
+            await run_in_threadpool(translation_memory.add, source, target,
+                                    str((e or {}).get("text") or ""), str((e or {}).get("translated") or ""))
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    return JSONResponse({"ok": True, **translation_memory.stats()})
 
 # ---------- DIAG ----------
 @app.get("/api/translator_info")
@@ -908,7 +1843,13 @@ async def translator_info():
         },
         "lt": {
             "primary": LT_ENDPOINT, "backup": LT_BACKUP_ENDPOINT, "virtual_host": LT_VIRTUAL_HOST, "timeout": LT_TIMEOUT
-        }
+        },
+        "http": {"http2": TRANSLATE_HTTP2, "max_connections": TRANSLATE_MAX_CONNECTIONS,
+                 "keepalive": TRANSLATE_KEEPALIVE, "open": _translator_http is not None and not _translator_http.is_closed},
+        "cache": {"cache_only": TRANSLATE_CACHE_ONLY, **translation_cache.stats()},
+        "memory": {**translation_memory.stats(), "glossary_terms": len(glossary.terms)},
+        "chain": {"hedge_ms": TRANSLATE_HEDGE_MS, "deadline_s": TRANSLATE_DEADLINE,
+                  "breakers": {name: br.stats() for name, br in translator_breakers.items()}},
     }
     dns = []
     for ep in [LT_ENDPOINT, LT_BACKUP_ENDPOINT]:
@@ -936,58 +1877,125 @@ async def translate_probe(payload: dict = Body(...)):
     if not text:
         return JSONResponse({"ok": True, "note": "empty text"})
 
+    # végpontonként, a megszakító állapotától függetlenül – az eredmény viszont táplálja a megszakítót
     trace = []
-    a = {"engine": "azure", "endpoint": AZURE_EP, "region": AZURE_RG, "configured": azure_ready()}
-    try:
-        if azure_ready():
-            tr = _azure_translate(text, source, target, timeout=LT_TIMEOUT)
-            a["ok"] = True; a["translated"] = tr; trace.append(a)
-            return JSONResponse({"ok": True, "engine_used": "azure", "translated": tr, "trace": trace})
+    if not azure_ready():
+        trace.append({"engine": "azure", "endpoint": AZURE_EP, "region": AZURE_RG, "configured": False,
+                      "ok": False, "error": "not configured"})
+    for name, engine, fn in _translator_backends():
+        br = translator_breakers[name]
+        a = {"engine": engine, "backend": name, "breaker": br.state}
+        if engine == "azure":
+            a.update({"endpoint": AZURE_EP, "region": AZURE_RG, "configured": True})
         else:
-            a["ok"] = False; a["error"] = "not configured"; trace.append(a)
-    except Exception as e:
-        a["ok"] = False; a["error"] = repr(e); trace.append(a)
-
-    l = {"engine": "libretranslate", "endpoints": [LT_ENDPOINT, LT_BACKUP_ENDPOINT]}
-    try:
-        tr = _lt_translate(text, source, target, timeout=LT_TIMEOUT)
-        l["ok"] = True; l["translated"] = tr; trace.append(l)
-        return JSONResponse({"ok": True, "engine_used": "libretranslate", "translated": tr, "trace": trace})
-    except Exception as e:
-        l["ok"] = False; l["error"] = repr(e); trace.append(l)
+            a["endpoint"] = LT_ENDPOINT if name == "lt_primary" else LT_BACKUP_ENDPOINT
+        t0 = asyncio.get_running_loop().time()
+        try:
+            tr = (await fn([text], source, target, timeout=LT_TIMEOUT))[0]
+            br.record_success(asyncio.get_running_loop().time() - t0)
+            a["ok"] = True; a["translated"] = tr; trace.append(a)
+            return JSONResponse({"ok": True, "engine_used": engine, "translated": tr, "trace": trace})
+        except Exception as e:
+            br.record_failure(repr(e))
+            a["ok"] = False; a["error"] = repr(e); trace.append(a)
 
     return JSONResponse({"ok": False, "trace": trace}, status_code=502)
 
 # ===================== ADMIN =====================
 
+ADMIN_PAGE_SIZE = 50
+
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_index(request: Request, q_bau: str = "", q_date: str = ""):
+async def admin_index(request: Request, q: str = "", q_bau: str = "", q_date: str = "",
+                      after: str = "", before: str = ""):
+    if not _is_admin(request):
+        return RedirectResponse("/admin/login?next=/admin", status_code=303)
+    store = await _request_storage(request)
+    rows, older, newer = await run_in_threadpool(
+        store.list_submissions, q, q_bau, q_date, after or None, before or None, ADMIN_PAGE_SIZE
+    )
+    base = {k: v for k, v in (("q", q), ("q_bau", q_bau), ("q_date", q_date)) if v.strip()}
+    older_url = f"/admin?{urlencode({**base, 'after': older})}" if older else None
+    newer_url = f"/admin?{urlencode({**base, 'before': newer})}" if newer else None
+    return templates.TemplateResponse("admin.html", {
+        "request": request, "rows": rows, "q": q, "q_bau": q_bau, "q_date": q_date,
+        "older_url": older_url, "newer_url": newer_url,
+        "first_url": f"/admin?{urlencode(base)}" if (after or before) else None,
+    })
+
+# ---------- Admin export (CSV / xlsx, streamelve) ----------
+EXPORT_HEADER = ["Id", "Erstellt (UTC)", "Datum", "Bau", "BASF-Beauftragter", "Beschreibung", "Pause (min)",
+                 "Nr.", "Vorname", "Name", "Ausweis", "Beginn", "Ende", "Vorhaltung", "Stunden", "Excel"]
+
+def _export_lines(store, date_from: str, date_to: str, bau: str):
+    """Soronként egy dolgozó; dolgozó nélküli beküldésből egy sor üres dolgozómezőkkel."""
+    for sub, workers in store.iter_export(date_from, date_to, bau):
+        head = [sub["id"], sub["created_at"], sub["datum"], sub["bau"], sub["basf_beauftragter"] or "",
+                sub["beschreibung"] or "", sub["break_minutes"]]
+        tail = [sub["excel_filename"] or ""]
+        if not workers:
+            yield head + [""] * 8 + tail
+        for w in workers:
+            yield head + [w["slot"], w["vorname"], w["nachname"], w["ausweis"], w["beginn"], w["ende"],
+                          w["vorhaltung"], w["hours"]] + tail
+
+def _export_csv(store, date_from: str, date_to: str, bau: str, chunk_rows: int = 500):
+    buf = StringIO()
+    writer = csv.writer(buf, delimiter=";", lineterminator="\n")
+    writer.writerow(EXPORT_HEADER)
+    yield "\ufeff".encode("utf-8")   # BOM: az Excel így UTF-8-ként nyitja meg
+    n = 0
+    for line in _export_lines(store, date_from, date_to, bau):
+        writer.writerow(line); n += 1
+        if n % chunk_rows == 0:
+            yield buf.getvalue().encode("utf-8"); buf.seek(0); buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+def _export_xlsx(store, date_from: str, date_to: str, bau: str, chunk_size: int = 64 * 1024):
+    # write_only: a sorok ideiglenes fájlba íródnak, nem maradnak a memóriában; a kész zip-et darabolva küldjük
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Export")
+    ws.append(EXPORT_HEADER)
+    for line in _export_lines(store, date_from, date_to, bau):
+        ws.append(line)
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+@app.get("/admin/export")
+async def admin_export(request: Request, fmt: str = "csv", date_from: str = "", date_to: str = "", bau: str = ""):
     if not _is_admin(request):
         return RedirectResponse("/admin/login?next=/admin", status_code=303)
-    sql = "SELECT id, created_at, datum, bau, basf_beauftragter, excel_filename FROM submissions "
-    clauses = []; params = []
-    if q_bau.strip():
-        clauses.append("bau LIKE ?"); params.append(f"%{q_bau.strip()}%")
-    if q_date.strip():
-        clauses.append("datum LIKE ?"); params.append(f"%{q_date.strip()}%")
-    if clauses: sql += "WHERE " + " AND ".join(clauses) + " "
-    sql += "ORDER BY created_at DESC LIMIT 200"
-    with db_conn() as c:
-        rows = c.execute(sql, params).fetchall()
-    return templates.TemplateResponse("admin.html", {"request": request, "rows": rows, "q_bau": q_bau, "q_date": q_date})
+    store = await _request_storage(request)
+    stem = "_".join(x for x in ("export", date_from.strip(), date_to.strip(), re.sub(r"[^\w-]", "", bau)) if x)
+    if fmt == "xlsx":
+        body, media, fname = _export_xlsx(store, date_from, date_to, bau), XLSX_MIME, f"{stem}.xlsx"
+    else:
+        body, media, fname = _export_csv(store, date_from, date_to, bau), "text/csv; charset=utf-8", f"{stem}.csv"
+    # szinkron generátor: a StreamingResponse szálkészletben lépteti, az eseményhurok nem áll meg
+    return StreamingResponse(body, media_type=media, headers={
+        "Content-Disposition": f'attachment; filename="{fname}"', "Cache-Control": "no-store",
+    })
 
 @app.get("/admin/view/{sid}", response_class=HTMLResponse)
 async def admin_view(request: Request, sid: int):
     if not _is_admin(request):
         return RedirectResponse(f"/admin/login?next=/admin/view/{sid}", status_code=303)
-    with db_conn() as c:
-        row = c.execute("SELECT * FROM submissions WHERE id = ?", (sid,)).fetchone()
+    store = await _request_storage(request)
+    row = await run_in_threadpool(store.get_submission, sid)
     if not row:
         return PlainTextResponse("Nincs ilyen bejegyzés.", status_code=404)
     try:
         payload = json.loads(row["payload_json"] or "{}")
     except Exception:
         payload = {}
+    if not payload.get("drive_file_id") and row["excel_filename"]:
+        payload["drive_file_id"] = drive_outbox.result_for(row["excel_filename"])
     return templates.TemplateResponse("admin_detail.html", {"request": request, "sub": row, "payload": payload})
 
 @app.get("/download/{fname}")
@@ -1004,6 +2012,38 @@ async def download_file(request: Request, fname: str):
         headers={"Content-Disposition": f'attachment; filename="{fname}"'}
     )
 
+@app.get("/api/generation_stats")
+async def generation_stats(request: Request):
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    return JSONResponse(gen_pool.stats(), headers={"Cache-Control": "no-store"})
+
+@app.get("/api/page_cache_stats")
+async def page_cache_stats(request: Request):
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    data = {"form": form_page_cache.stats(), "static": static_assets.stats()}
+    return JSONResponse(data, headers={"Cache-Control": "no-store"})
+
+@app.get("/api/worker_index_stats")
+async def worker_index_stats(request: Request):
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    data = {**worker_directory.stats(), "tenant_registry": tenant_registry.stats()}
+    return JSONResponse(data, headers={"Cache-Control": "no-store"})
+
+@app.get("/api/drive_outbox_stats")
+async def drive_outbox_stats(request: Request):
+    if not _is_admin(request):
+        return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+    data = {"enabled": DRIVE_ENABLED, **drive_outbox.stats(), "db_replication": DB_REPLICATION,
+            "db_sharding": shard_router.stats()}
+    if DB_REPLICATION == "incremental":
+        data["replication"] = db_replicator.stats()
+        if shard_replicators:
+            data["shard_replication"] = {slug: rep.stats() for slug, rep in shard_replicators.items()}
+    return JSONResponse(data, headers={"Cache-Control": "no-store"})
+
 # ---------- Health ----------
 @app.get("/healthz")
 async def healthz():
@@ -1018,67 +2058,98 @@ if __name__ == "__main__":
 from fastapi import Depends
 from fastapi.responses import PlainTextResponse
 
-def _company_slug_from_host(host: str) -> str | None:
-    # pl. host = "muster.metori.de" -> "muster"
-    host = (host or "").split(":")[0].lower()
-    parts = host.split(".")
-    if len(parts) >= 3:  # subdomain.domain.tld
-        return parts[0]
-    return None
-
 @app.get("/api/workers.csv")
 async def api_workers_csv(request: Request):
-    slug = _company_slug_from_host(request.headers.get("host", ""))
-    if not slug:
+    tenant = await _request_tenant(request)
+    if tenant is None and not _request_tenant_slug(request):
         # fallback: 'muster', hogy most működjön egy aldomén nélküli hívásnál is
-        slug = "muster"
-    with db_conn() as c:
-        row = c.execute("SELECT id FROM companies WHERE slug = ?", (slug,)).fetchone()
-        if not row:
-            return PlainTextResponse("Name;Vorname;Ausweis\n", media_type="text/csv; charset=utf-8")
-        company_id = row["id"]
-        rows = c.execute(
-            "SELECT last_name, first_name, COALESCE(badge,'') AS badge "
-            "FROM workers WHERE company_id = ? ORDER BY last_name, first_name",
-            (company_id,)
-        ).fetchall()
-
-    # ugyanaz a fejléckészlet, mint eddig
-    out_lines = ["Name;Vorname;Ausweis"]
-    for r in rows:
-        # pontosvesszővel elválasztva, soronként
-        out_lines.append(f"{r['last_name']};{r['first_name']};{r['badge']}")
-    csv_text = "\n".join(out_lines) + "\n"
-    return PlainTextResponse(csv_text, media_type="text/csv; charset=utf-8")
+        tenant = tenant_registry.lookup("muster")
+    company_id = tenant.company_id if tenant else None
+    if not company_id:
+        return PlainTextResponse("Name;Vorname;Ausweis\n", media_type="text/csv; charset=utf-8")
+    index = await _worker_index(company_id)
+
+    def build() -> bytes:
+        # ugyanaz a fejléckészlet, mint eddig; pontosvesszővel elválasztva, soronként
+        out_lines = ["Name;Vorname;Ausweis"]
+        for r in index.rows:
+            out_lines.append(f"{r['last_name']};{r['first_name']};{r['badge']}")
+        return ("\n".join(out_lines) + "\n").encode("utf-8")
+
+    return await _versioned_response(request, company_id, index, ("csv",), build, "text/csv; charset=utf-8")
 
 
 
 # --- API: dolgozók listája tenant (aldomain) alapján -------------------------
 from fastapi import Query
 
-def _tenant_slug_from_host(request: Request) -> str | None:
-    """
-    Hostból (pl. 'muster.metori.de') kinyeri a tenant slugot ('muster').
-    A fő domaineken (metori.de, www.metori.de) nincs slug.
-    """
-    host = (request.headers.get("x-forwarded-host") or request.url.hostname or "").lower()
-    if not host:
-        return None
-    # ha porttal jön (dev), vágjuk le
-    host = host.split(":")[0]
-    if host in MAIN_DOMAINS:
-        return None
-    # pl. muster.metori.de -> ['muster','metori','de']
-    parts = host.split(".")
-    base_parts = BASE_DOMAIN.split(".")
-    if len(parts) <= len(base_parts):
-        return None
-    # az első komponens az aldomain
-    return parts[0] or None
+def _request_tenant_slug(request: Request) -> str | None:
+    """A tenant slug (pl. 'muster.metori.de' -> 'muster'); a fő domaineken (metori.de, www) None."""
+    slug = getattr(request.state, "tenant_slug", None)
+    return slug if slug is not None else tenant_registry.slug_for_host(request_host(request, TRUST_FORWARDED_HOST))
 
-def _company_id_for_slug(c, slug: str) -> int | None:
-    row = c.execute("SELECT id FROM companies WHERE slug = ?", (slug,)).fetchone()
-    return int(row["id"]) if row else None
+async def _request_tenant(request: Request):
+    """A köztesréteg által feloldott tenant (Tenant | None); nélküle (pl. importhiba) itt oldjuk fel."""
+    try:
+        return request.state.tenant
+    except AttributeError:
+        return (await tenant_registry.resolve(request_host(request, TRUST_FORWARDED_HOST)))[1]
+
+async def _request_storage(request: Request):
+    """A beküldések tárolója a kérés tenantja szerint (DB_SHARDING=tenant: a cég shardja)."""
+    if not shard_router.enabled:
+        return storage
+    tenant = await _request_tenant(request)
+    if tenant is None:
+        return storage
+    # az első használat megnyitja (és szükség esetén visszaállítja) a shardot: szálkészletben
+    return shard_router.peek(tenant.slug) or await run_in_threadpool(shard_router.for_tenant, tenant)
+
+@app.on_event("startup")
+async def _load_tenant_registry():
+    try:
+        await run_in_threadpool(tenant_registry.refresh)
+    except Exception as e:
+        print(f"Tenant registry load failed: {e}")
+
+# Dolgozókereső: cégenként memóriában (előtag + trigram index), a workers-triggerek által
+# léptetett verzió szerint újraépítve; a verziót legfeljebb WORKER_INDEX_RECHECK_S mp-enként kérdezzük.
+try:
+    WORKER_INDEX_RECHECK_S = float(os.getenv("WORKER_INDEX_RECHECK_S", "1"))
+except Exception:
+    WORKER_INDEX_RECHECK_S = 1.0
+worker_directory = WorkerDirectory(storage.worker_directory_version, storage.workers_for_company,
+                                   recheck_s=WORKER_INDEX_RECHECK_S)
+async def _worker_index(company_id: int):
+    return worker_directory.fresh(company_id) or await run_in_threadpool(worker_directory.get, company_id)
+
+# Verziózott válaszok: ETag = cég + dolgozólista-verzió (+ változat); a törzs és a gzip-változat
+# verziónként egyszer készül el (az index objektumán, így a régi verzióval együtt szabadul fel).
+# A kliens If-None-Match-csel újraellenőriz, változatlan listára 304 jön, törzs nélkül.
+WORKERS_CACHE_CONTROL = "private, no-cache"
+
+async def _versioned_response(request: Request, company_id: int, index, key: tuple, build, media_type: str,
+                              prebuild: bool = True):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:10]
+    etag = f'"wk{company_id}-v{index.version}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": WORKERS_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = index.responses.get(key) if prebuild else None
+    if cached is None:
+        def make():
+            body = build()
+            return body, (gzip.compress(body, compresslevel=6, mtime=0) if len(body) > 512 else None)
+        cached = await run_in_threadpool(make)
+        if prebuild:
+            index.responses[key] = cached
+    body, gz = cached
+    if gz is not None and choose_encoding(request.headers.get("accept-encoding", ""), ("gzip",)):
+        headers["ETag"] = etag[:-1] + '-gz"'
+        headers["Content-Encoding"] = "gzip"
+        return Response(gz, media_type=media_type, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
 
 @app.get("/api/workers")
 async def api_workers(
@@ -1090,48 +2161,29 @@ async def api_workers(
     if not _is_user(request):
         return JSONResponse({"detail": "Unauthorized"}, status_code=401)
 
-    slug = _tenant_slug_from_host(request)
-    # Ha nincs slug (pl. fő domain), opcionálisan megtagadhatjuk vagy fallback.
-    if not slug:
-        # üres lista a biztonság kedvéért
+    # Ha nincs tenant (fő domain vagy ismeretlen aldomain): üres lista a biztonság kedvéért
+    tenant = await _request_tenant(request)
+    if tenant is None:
         return JSONResponse([], status_code=200)
-
-    with db_conn() as c:
-        cid = _company_id_for_slug(c, slug)
-        if not cid:
-            return JSONResponse([], status_code=200)
-
-        params = [cid]
-        where = "WHERE company_id = ?"
-        if q.strip():
-            where += " AND (LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ? OR badge LIKE ?)"
-            like = f"%{q.strip().lower()}%"
-            params += [like, like, f"%{q.strip()}%"]
-
-        sql = f"""
-            SELECT first_name, last_name, badge
-              FROM workers
-            {where}
-            ORDER BY last_name COLLATE NOCASE, first_name COLLATE NOCASE
-            LIMIT ?
-        """
-        params.append(limit)
-        rows = c.execute(sql, params).fetchall()
-
-    # A JS a következő kulcsokat várja: first_name/last_name/badge (vagy vorname/nachname/ausweis).
-    out = [
-        {
-            "first_name": r["first_name"],
-            "last_name": r["last_name"],
-            "badge": r["badge"],
-            # kompatibilitás a régi klienssel
-            "vorname": r["first_name"],
-            "nachname": r["last_name"],
-            "ausweis": r["badge"],
-        }
-        for r in rows
-    ]
-    return JSONResponse(out, headers={
-        # kis cache a böngészőben, de ne legyen agresszív
-        "Cache-Control": "private, max-age=60"
-    })
+    cid = tenant.company_id
+    index = await _worker_index(cid)
+
+    def build() -> bytes:
+        # A JS a következő kulcsokat várja: first_name/last_name/badge (vagy vorname/nachname/ausweis).
+        out = [
+            {
+                "first_name": r["first_name"],
+                "last_name": r["last_name"],
+                "badge": r["badge"],
+                # kompatibilitás a régi klienssel
+                "vorname": r["first_name"],
+                "nachname": r["last_name"],
+                "ausweis": r["badge"],
+            }
+            for r in index.search(q, limit)
+        ]
+        return json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # a teljes lista (form betöltés) verziónként előre elkészül; a keresések csak ETag-et kapnak
+    return await _versioned_response(request, cid, index, ("json", q.strip(), limit), build,
+                                     "application/json", prebuild=not q.strip())
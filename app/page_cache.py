@@ -0,0 +1,159 @@
+"""
+Előre elkészített, előre tömörített HTML-oldalak (a /form oldalhoz).
+
+Az oldal kulcsonként (nyelvenként) egyszer épül fel a forrásfájlból, és memóriában marad
+nyersen + gzip-pel (+ brotlival, ha a brotli csomag telepítve van), erős ETag-gel.
+A forrásfájl mtime-ját legfeljebb recheck_s másodpercenként nézzük meg; változáskor az
+összes változat újraépül. Kérésenként így nincs fájlolvasás és nincs szövegmunka, csak
+az Accept-Encoding szerinti változat kiválasztása.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+try:
+    import brotli  # opcionális (pip install brotli)
+    BROTLI_AVAILABLE = True
+except Exception:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# előnyben a kisebb: br, aztán gzip
+ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding → {kódolás: q}; a q=0 tiltás is bekerül (0-val)."""
+    out: Dict[str, float] = {}
+    for part in (header or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        out[name.strip()] = q
+    return out
+
+
+def choose_encoding(header: str, available) -> Optional[str]:
+    """A legjobb elérhető tömörítés (br > gzip), vagy None (nyers)."""
+    acc = accepted_encodings(header)
+    for enc in ("br", "gzip"):
+        if enc in available and acc.get(enc, acc.get("*", 0.0)) > 0:
+            return enc
+    return None
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match illesztés: lista, W/ előtag, '*', és ugyanannak a tartalomnak a tömörített változatai."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    base = etag.strip('"')
+    variants = {base} | {base + s for s in ENCODING_SUFFIX.values()}
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') in variants:
+            return True
+    return False
+
+
+class CompressedPage:
+    __slots__ = ("body", "variants", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+        self.variants: Dict[str, bytes] = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            self.variants["br"] = brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+
+    def select(self, accept_encoding: str):
+        """(törzs, Content-Encoding | None, ETag) – minden kódolt változatnak saját erős ETag-je van."""
+        enc = choose_encoding(accept_encoding, self.variants)
+        if enc is None:
+            return self.body, None, self.etag
+        return self.variants[enc], enc, self.etag[:-1] + ENCODING_SUFFIX[enc] + '"'
+
+
+class PageCache:
+    """
+    build(source_text, key) → HTML; a source fájl mtime-jához kötött, kulcsonkénti gyorsítótár.
+    depends(): további függőség jelzője (pl. a statikus fájlok verziója) – változáskor szintén újraépül.
+    """
+
+    def __init__(self, source: Path, build: Callable[[str, str], str], *, recheck_s: float = 2.0,
+                 max_entries: int = 32, depends: Optional[Callable[[], object]] = None):
+        self.source = Path(source)
+        self._build = build
+        self._depends = depends
+        self.recheck_s = float(recheck_s)
+        self.max_entries = int(max_entries)
+        self._pages: Dict[str, CompressedPage] = {}
+        self._mtime_ns: Optional[int] = None
+        self._token = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def _check_source(self) -> None:
+        now = time.monotonic()
+        if self._mtime_ns is not None and now - self._checked_at < self.recheck_s:
+            return
+        mtime_ns = self.source.stat().st_mtime_ns
+        token = (mtime_ns, self._depends() if self._depends else None)
+        self._checked_at = now
+        if token != self._token:
+            with self._lock:
+                if token != self._token:
+                    self._pages = {}
+                    self._mtime_ns, self._token = mtime_ns, token
+
+    def fresh(self, key: str) -> Optional[CompressedPage]:
+        """A kész oldal, ha a forrást recheck_s-en belül ellenőriztük (ilyenkor semmi I/O); egyébként None."""
+        if self._mtime_ns is None or time.monotonic() - self._checked_at >= self.recheck_s:
+            return None
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+        return page
+
+    def get(self, key: str) -> CompressedPage:
+        self._check_source()
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                text = self.source.read_text(encoding="utf-8", errors="ignore")
+                page = CompressedPage(self._build(text, key).encode("utf-8"))
+                self.builds += 1
+                if len(self._pages) < self.max_entries:
+                    self._pages[key] = page
+            return page
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source.name, "mtime_ns": self._mtime_ns, "pages": sorted(self._pages),
+            "builds": self.builds, "hits": self.hits, "brotli": BROTLI_AVAILABLE,
+            "bytes": {k: {"raw": len(p.body), **{e: len(b) for e, b in p.variants.items()}}
+                      for k, p in self._pages.items()},
+        }
@@ -0,0 +1,56 @@
+"""
+Leírások mondatokra/sorokra bontása a szegmensenkénti fordításhoz.
+
+A szöveget (szegmens, elválasztó) párokra vágjuk úgy, hogy a párok összefűzése pontosan
+visszaadja az eredetit – a fordítás után ugyanezekkel az elválasztókkal rakjuk össze,
+így a sortörések és a felsorolások formája megmarad. Ismétlődő szegmens csak egyszer
+kerül a fordítóhoz; betű nélküli darabok ("1.", "-", "08:00") érintetlenül maradnak.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Tuple
+
+# sortörés(ek), vagy mondatvégi írásjel utáni szóköz (de nem "z.B. " / "1. " után: előtte legalább 3 betű)
+_SPLIT_RE = re.compile(r"(\s*\n\s*|(?<=[^\W\d_]{3}[.!?])[ \t]+)")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def split_segments(text: str) -> List[Tuple[str, str]]:
+    parts = _SPLIT_RE.split(text or "")
+    out = []
+    for i in range(0, len(parts), 2):
+        seg = parts[i]
+        sep = parts[i + 1] if i + 1 < len(parts) else ""
+        out.append((seg, sep))
+    return out
+
+
+def needs_translation(segment: str) -> bool:
+    return bool(_LETTER_RE.search(segment))
+
+
+def unique_segments(pairs: List[Tuple[str, str]]) -> List[str]:
+    """A fordítandó szegmensek, első előfordulás szerinti sorrendben, ismétlés nélkül."""
+    seen: Dict[str, None] = {}
+    for seg, _ in pairs:
+        s = seg.strip()
+        if s and needs_translation(s) and s not in seen:
+            seen[s] = None
+    return list(seen)
+
+
+def join_segments(pairs: List[Tuple[str, str]], translated: Dict[str, str]) -> str:
+    out = []
+    for seg, sep in pairs:
+        s = seg.strip()
+        if s in translated:
+            # a szegmens körüli szóközök (pl. behúzás) megmaradnak
+            lead = seg[:len(seg) - len(seg.lstrip())]
+            trail = seg[len(seg.rstrip()):]
+            out.append(lead + translated[s] + trail)
+        else:
+            out.append(seg)
+        out.append(sep)
+    return "".join(out)
@@ -0,0 +1,187 @@
+"""
+Cégenkénti SQLite-sharding (DB_SHARDING=tenant).
+
+Minden tenant beküldései (submissions + submission_workers) saját fájlba kerülnek:
+data/tenants/<slug>.db – saját kapcsolatkészlettel, tehát saját írózárral (a cégek nem
+várnak egymásra), és saját Drive-replikával (kis fájl, cégenkénti mentés/visszaállítás).
+A vezérlő adatbázis (data/app.db) marad a companies/workers (tenant-nyilvántartás,
+dolgozókereső) és a tenant nélküli (fődomain) beküldések helye.
+
+A tenant → shard hozzárendelést a ShardRouter tartja: csak a nyilvántartásban szereplő
+(TenantRegistry által feloldott) cég kap shardot, így kitalált aldomainek nem hoznak létre fájlt.
+A shard első használatkor nyílik meg (a main.py open_shard-ja: Drive-visszaállítás, séma).
+
+Meglévő app.db szétosztása (a beküldéseknek nincs cég-oszlopa, ezért a hozzárendelés explicit):
+
+    python -m app.shards split --tenant muster                       # minden beküldés -> muster
+    python -m app.shards split --tenant acme --where "bau LIKE ?" --param "%ACME%" --move
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+SLUG_RE = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$")
+
+
+def shard_path(shard_dir: Path, slug: str) -> Path:
+    slug = (slug or "").strip().lower()
+    if not SLUG_RE.match(slug):
+        raise ValueError(f"invalid tenant slug {slug!r}")
+    return Path(shard_dir) / f"{slug}.db"
+
+
+class ShardRouter:
+    """
+    tenant → Storage. open_shard(slug, path) a shard Storage-át adja (megnyitás + séma);
+    kikapcsolt shardingnál, vagy tenant nélkül mindig a vezérlő (default) tároló.
+    """
+
+    def __init__(self, default, shard_dir: Path, open_shard: Callable[[str, Path], object], *, enabled: bool = True):
+        self.default = default
+        self.shard_dir = Path(shard_dir)
+        self.enabled = bool(enabled)
+        self._open_shard = open_shard
+        self._shards: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        if self.enabled:
+            self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    def for_tenant(self, tenant):
+        """tenant: app.tenants.Tenant vagy None."""
+        if not self.enabled or tenant is None:
+            return self.default
+        return self.for_slug(tenant.slug)
+
+    def for_slug(self, slug: str):
+        store = self._shards.get(slug)
+        if store is not None:
+            return store
+        with self._lock:
+            store = self._shards.get(slug)
+            if store is None:
+                path = shard_path(self.shard_dir, slug)
+                store = self._open_shard(slug, path)
+                self._shards[slug] = store
+                print(f"DB shard: opened {slug} ({path})")
+            return store
+
+    def peek(self, slug: str):
+        """A már megnyitott shard (zár és I/O nélkül), egyébként None."""
+        return self._shards.get(slug)
+
+    def opened(self) -> Dict[str, object]:
+        return dict(self._shards)
+
+    def on_disk(self) -> list:
+        """A shard-könyvtár fájljai alapján ismert tenantok (megnyitás nélkül)."""
+        if not self.shard_dir.exists():
+            return []
+        return sorted(p.stem for p in self.shard_dir.glob("*.db") if SLUG_RE.match(p.stem))
+
+    def close_all(self) -> None:
+        with self._lock:
+            shards, self._shards = self._shards, {}
+        for store in shards.values():
+            try:
+                store.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        out = {"enabled": self.enabled, "shard_dir": str(self.shard_dir), "opened": sorted(self._shards)}
+        if self.enabled:
+            sizes = {}
+            for slug in self.on_disk():
+                p = shard_path(self.shard_dir, slug)
+                sizes[slug] = p.stat().st_size + (Path(str(p) + "-wal").stat().st_size
+                                                  if Path(str(p) + "-wal").exists() else 0)
+            out["bytes"] = sizes
+        return out
+
+
+# ---------- meglévő app.db szétosztása ----------
+
+def _columns(c: sqlite3.Connection, schema: str, table: str) -> list:
+    return [r[1] for r in c.execute(f'PRAGMA "{schema}".table_info("{table}")').fetchall()]
+
+
+def split_database(src: Path, dst: Path, *, where: str = "", params: Sequence = (), move: bool = False,
+                   prepare: Optional[Callable[[Path], None]] = None) -> int:
+    """
+    A src submissions-sorai (where-rel szűrve) és dolgozósoraik átmásolása a dst shardba,
+    az id-k megtartásával (INSERT OR IGNORE: újrafuttatható). move=True: utána törlés a src-ből.
+    prepare(dst): a shard sémájának létrehozása (FTS, triggerek) – a main.py-val azonos módon.
+    Visszaadja az átvitt beküldések számát.
+    """
+    src, dst = Path(src), Path(dst)
+    if prepare is not None:
+        prepare(dst)
+    cond = f"WHERE {where}" if where.strip() else ""
+    c = sqlite3.connect(dst, timeout=30)
+    try:
+        c.execute("ATTACH DATABASE ? AS src", (str(src),))
+        with c:
+            c.execute(f"CREATE TEMP TABLE split_ids AS SELECT id FROM src.submissions {cond}", tuple(params))
+            for table, key in (("submissions", "id"), ("submission_workers", "submission_id")):
+                cols = [col for col in _columns(c, "main", table) if col in set(_columns(c, "src", table))]
+                if not cols:
+                    continue
+                col_sql = ", ".join(f'"{col}"' for col in cols)
+                c.execute(f'INSERT OR IGNORE INTO main."{table}" ({col_sql}) SELECT {col_sql} FROM src."{table}" '
+                          f'WHERE "{key}" IN (SELECT id FROM temp.split_ids)')
+            n = c.execute("SELECT COUNT(*) FROM temp.split_ids").fetchone()[0]
+            ids = [r[0] for r in c.execute("SELECT id FROM temp.split_ids").fetchall()]
+        c.execute("DETACH DATABASE src")
+    finally:
+        c.close()
+    if move and ids:
+        # külön kapcsolaton, hogy a src saját triggerei (FTS, replikációs napló) lefussanak
+        s = sqlite3.connect(src, timeout=30)
+        try:
+            with s:
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    marks = ", ".join("?" * len(chunk))
+                    s.execute(f"DELETE FROM submission_workers WHERE submission_id IN ({marks})", chunk)
+                    s.execute(f"DELETE FROM submissions WHERE id IN ({marks})", chunk)
+        finally:
+            s.close()
+    return n
+
+
+def _prepare_shard(path: Path) -> None:
+    from app.db_pool import SQLitePool
+    from app.storage import SQLiteStorage
+    pool = SQLitePool(path)
+    try:
+        SQLiteStorage(pool).init_schema()
+    finally:
+        pool.close_all()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.shards")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("split", help="beküldések átvitele az app.db-ből egy tenant shardjába")
+    sp.add_argument("--tenant", required=True, help="a cég slugja (pl. muster)")
+    sp.add_argument("--src", default="data/app.db")
+    sp.add_argument("--shard-dir", default="data/tenants")
+    sp.add_argument("--where", default="", help="SQL-feltétel a submissions sorokra (? paraméterekkel)")
+    sp.add_argument("--param", action="append", default=[], help="a --where paraméterei, sorrendben")
+    sp.add_argument("--move", action="store_true", help="átvitel után törlés a forrásból")
+    args = ap.parse_args()
+    dst = shard_path(Path(args.shard_dir), args.tenant)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    n = split_database(Path(args.src), dst, where=args.where, params=args.param, move=args.move,
+                       prepare=_prepare_shard)
+    print(f"{n} submissions {'moved' if args.move else 'copied'} to {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -174,7 +174,7 @@ Funkciók:
 
     // 1) JSON
     try {
-      const r = await fetch("/api/workers", { cache: "no-store" });
+      const r = await fetch("/api/workers", { cache: "no-cache" });
       if (r.ok && (r.headers.get("content-type") || "").includes("json")) {
         const arr = await r.json();
         (arr || []).forEach((w) => {
@@ -194,7 +194,7 @@ Funkciók:
 
     // 2) CSV fallback
     try {
-      const resp = await fetch("/api/workers.csv", { cache: "no-store" });
+      const resp = await fetch("/api/workers.csv", { cache: "no-cache" });
       if (!resp.ok) return;
       let text = await resp.text();
       if (text && text.charCodeAt(0) === 0xFEFF) text = text.slice(1);
@@ -0,0 +1,156 @@
+"""
+Tartalom-hash-elt statikus fájlok, előtömörítve, "immutable" gyorsítótárazással.
+
+Induláskor az app/static minden fájlja kap egy ujjlenyomatot (sha256 első 12 jegye):
+style.css → style.3f2a9c01b7de.css. A sablonok az asset_url('style.css') helperrel kérik
+az URL-t, a /form oldal (static/index.html) /static/… hivatkozásait rewrite_html cseréli.
+A hash-elt név tartalma sosem változik, ezért a böngésző egy évig kérés nélkül használja
+(Cache-Control: immutable); változáskor új név jön, így a kézi ?v=NN léptetés megszűnik.
+
+A szöveges fájlok (css, js, html, svg, json, csv…) gzip- (és ha telepítve van, brotli-)
+változata egyszer, memóriában készül el; kiszolgáláskor csak az Accept-Encoding dönt.
+A fájlok mtime-ját legfeljebb recheck_s másodpercenként nézzük (fejlesztés közbeni
+módosításhoz); a régi hash-elt nevek kiszolgálhatók maradnak a még régi HTML-t tartó klienseknek.
+Az eredeti nevek (/static/style.css) változatlanul, a StaticFiles alapértelmezéseivel mennek.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from app.page_cache import BROTLI_AVAILABLE, ENCODING_SUFFIX, brotli, choose_encoding, etag_matches
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".css", ".js", ".html", ".htm", ".svg", ".json", ".csv", ".txt", ".xml", ".map"}
+HASH_LEN = 12
+
+
+class Asset:
+    __slots__ = ("name", "hashed", "digest", "media_type", "body", "variants", "mtime_ns")
+
+    def __init__(self, name: str, data: bytes, mtime_ns: int):
+        self.name = name
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+        stem, dot, ext = name.rpartition(".")
+        self.hashed = f"{stem}.{self.digest}.{ext}" if dot and "/" not in ext else f"{name}.{self.digest}"
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type in ("application/javascript", "text/javascript"):
+            self.media_type += "; charset=utf-8"
+        self.body = data
+        self.mtime_ns = mtime_ns
+        self.variants: Dict[str, bytes] = {}
+        if Path(name).suffix.lower() in COMPRESSIBLE and len(data) > 256:
+            self.variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                self.variants["br"] = brotli.compress(data, quality=11)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+class AssetManifest:
+    def __init__(self, root: Path, url_prefix: str = "/static", *, recheck_s: float = 2.0):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.recheck_s = float(recheck_s)
+        self._by_name: Dict[str, Asset] = {}      # eredeti relatív név -> aktuális Asset
+        self._by_hashed: Dict[str, Asset] = {}    # hash-elt név -> Asset (a régiek is)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.version = 0
+        self.scan()
+
+    def scan(self) -> None:
+        """Új/módosult fájlok ujjlenyomatozása és tömörítése (változatlan fájlt nem olvas újra)."""
+        with self._lock:
+            changed = 0
+            for p in sorted(self.root.rglob("*")):
+                if not p.is_file() or any(part.startswith(".") for part in p.relative_to(self.root).parts):
+                    continue
+                name = p.relative_to(self.root).as_posix()
+                mtime_ns = p.stat().st_mtime_ns
+                cur = self._by_name.get(name)
+                if cur is not None and cur.mtime_ns == mtime_ns:
+                    continue
+                asset = Asset(name, p.read_bytes(), mtime_ns)
+                if cur is None or cur.digest != asset.digest:
+                    changed += 1
+                self._by_name[name] = asset
+                self._by_hashed[asset.hashed] = asset
+            self._checked_at = time.monotonic()
+            if changed:
+                self.version += 1
+                print(f"Static assets: {changed} fingerprinted ({len(self._by_name)} files, v{self.version})")
+
+    def refresh(self) -> int:
+        """Legfeljebb recheck_s-enként újraszkennel; a (lehet, hogy új) verziót adja."""
+        if time.monotonic() - self._checked_at >= self.recheck_s:
+            try:
+                self.scan()
+            except Exception as e:
+                print("Static asset rescan failed:", repr(e))
+        return self.version
+
+    def url(self, name: str) -> str:
+        """asset_url('style.css') → '/static/style.<hash>.css'; ismeretlen fájlnál az eredeti URL."""
+        self.refresh()
+        rel = name.split("?", 1)[0].lstrip("/")
+        if rel.startswith(self.url_prefix.lstrip("/") + "/"):
+            rel = rel[len(self.url_prefix.lstrip("/")) + 1:]
+        asset = self._by_name.get(rel)
+        return f"{self.url_prefix}/{asset.hashed if asset else rel}"
+
+    def rewrite_html(self, html: str) -> str:
+        """A src/href="/static/…" hivatkozások cseréje hash-elt URL-re (a ?v=… lekérdezés elhagyva)."""
+        pattern = re.compile(r'((?:src|href)\s*=\s*["\'])' + re.escape(self.url_prefix) + r'/([^"\'?#]+)(?:\?[^"\'#]*)?')
+        return pattern.sub(lambda m: m.group(1) + self.url(m.group(2)), html)
+
+    def hashed(self, path: str) -> Optional[Asset]:
+        return self._by_hashed.get(path)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version, "files": len(self._by_name), "servable": len(self._by_hashed),
+            "brotli": BROTLI_AVAILABLE,
+            "assets": {n: {"url": f"{self.url_prefix}/{a.hashed}", "raw": len(a.body),
+                           **{e: len(b) for e, b in a.variants.items()}} for n, a in self._by_name.items()},
+        }
+
+
+class HashedStaticFiles(StaticFiles):
+    """StaticFiles, amely a hash-elt neveket memóriából, előtömörítve és immutable-ként szolgálja ki."""
+
+    def __init__(self, *, manifest: AssetManifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset = self.manifest.hashed(path.replace("\\", "/"))
+        if asset is None:
+            return await super().get_response(path, scope)
+        headers = dict((k.decode("latin-1").lower(), v.decode("latin-1")) for k, v in scope.get("headers") or [])
+        enc = choose_encoding(headers.get("accept-encoding", ""), asset.variants)
+        out = {"Cache-Control": IMMUTABLE,
+               "ETag": asset.etag if enc is None else asset.etag[:-1] + ENCODING_SUFFIX[enc] + '"'}
+        if asset.variants:
+            out["Vary"] = "Accept-Encoding"
+        if etag_matches(headers.get("if-none-match", ""), asset.etag):
+            return Response(status_code=304, headers=out)
+        if enc is not None:
+            out["Content-Encoding"] = enc
+        body = asset.variants[enc] if enc else asset.body
+        if scope.get("method") == "HEAD":
+            out["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=out, media_type=asset.media_type)
+        return Response(body, headers=out, media_type=asset.media_type)
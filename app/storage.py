@@ -0,0 +1,620 @@
+"""
+Tárolási réteg: submissions, companies, workers – cserélhető háttértárral.
+
+  DB_BACKEND=sqlite    (alapértelmezés) data/app.db, SQLitePool-on keresztül, Drive-tükrözéssel
+  DB_BACKEND=postgres  DATABASE_URL-re kapcsolódó psycopg_pool.ConnectionPool – több app-példány
+                       használhatja ugyanazt az adatbázist (ilyenkor nincs Drive DB-tükrözés)
+
+A visszaadott sorok név szerint indexelhetők (sqlite3.Row, ill. dict), így a sablonok és a
+route-ok mindkét háttértárral ugyanúgy működnek.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import re
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.db_pool import SQLitePool
+
+SUBMISSION_COLUMNS = (
+    "created_at", "datum", "bau", "basf_beauftragter", "beschreibung", "break_minutes",
+    *(f"{f}{i}" for i in range(1, 6) for f in ("vorname", "nachname", "ausweis", "beginn", "ende", "vorhaltung")),
+    "excel_filename", "payload_json",
+)
+
+ADMIN_LIST_COLUMNS = "s.id, s.created_at, s.datum, s.bau, s.basf_beauftragter, s.excel_filename"
+
+# normalizált dolgozósorok: egy sor / kitöltött dolgozóhely, kiszámolt órákkal
+SUBMISSION_WORKER_COLUMNS = ("slot", "vorname", "nachname", "ausweis", "beginn", "ende", "vorhaltung", "hours")
+
+# a submissions indexei (admin szűrés/rendezés) és a dolgozótábla indexei (Ausweis-keresés, kapcsolás)
+INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_submissions_datum ON submissions(datum)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_bau ON submissions(bau)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_created_at ON submissions(created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_submission_workers_ausweis ON submission_workers(ausweis)",
+)
+
+BACKFILL_KEY = "submission_workers_backfill"
+FTS_KEY = "submissions_fts"
+
+# teljes szöveges keresés: Bau, BASF-Beauftragter, leírás és a dolgozók (név + Ausweis)
+def _fts_workers_expr(ref: str) -> str:
+    parts = [f"coalesce({ref}.{f}{i},'')" for i in range(1, 6) for f in ("vorname", "nachname", "ausweis")]
+    return " || ' ' || ".join(parts)
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text or "")
+
+
+def encode_cursor(created_at: str, sid: int) -> str:
+    raw = json.dumps([created_at, int(sid)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, sid = json.loads(raw)
+        return str(created_at), int(sid)
+    except Exception:
+        return None
+
+
+class Storage(ABC):
+    """
+    A háttértárak közös felülete. Minden metódus szinkron (szálkészletből hívandó).
+    Az @abstractmethod-okat minden háttértár megvalósítja; a többi közös SQL a _sql()-en át.
+    """
+
+    backend = "base"
+    P = "?"   # paraméter-jelölő
+
+    @abstractmethod
+    def _transaction(self):
+        """Kapcsolat egy tranzakcióhoz (@contextmanager); a blokk végén commit, hibánál rollback."""
+
+    def _sql(self, sql: str) -> str:
+        return sql.replace("?", self.P)
+
+    def _insert_workers(self, c, submission_id: int, workers: Sequence[Dict[str, Any]]) -> None:
+        sql = self._sql(
+            f"INSERT INTO submission_workers (submission_id, {', '.join(SUBMISSION_WORKER_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' * len(SUBMISSION_WORKER_COLUMNS))}) ON CONFLICT (submission_id, slot) DO NOTHING"
+        )
+        for w in workers:
+            c.execute(sql, [submission_id, *(w.get(k) for k in SUBMISSION_WORKER_COLUMNS)])
+
+    def _meta_get(self, c, k: str) -> Optional[str]:
+        row = c.execute(self._sql("SELECT v FROM schema_meta WHERE k = ?"), (k,)).fetchone()
+        return row["v"] if row else None
+
+    def _meta_set(self, c, k: str, v: str) -> None:
+        c.execute(self._sql("INSERT INTO schema_meta (k, v) VALUES (?, ?) ON CONFLICT (k) DO UPDATE SET v = excluded.v"), (k, v))
+
+    def backfill_submission_workers(self, compute: Callable[[Any], List[Dict[str, Any]]], batch_size: int = 500) -> int:
+        """
+        Online migráció: a régi (lapos oszlopos) beküldésekből kis kötegekben feltölti a
+        submission_workers táblát. A határ (cutoff) az első futáskori MAX(id) – az újabb sorokat
+        már a beszúrás írja. A haladás a schema_meta-ban van, így megszakítás után folytatható.
+        """
+        with self._transaction() as c:
+            state = self._meta_get(c, BACKFILL_KEY)
+            if state is None:
+                row = c.execute("SELECT COALESCE(MAX(id), 0) AS m FROM submissions").fetchone()
+                state = f"0/{int(row['m'])}"
+                self._meta_set(c, BACKFILL_KEY, state)
+        done_id, cutoff = (int(x) for x in state.split("/"))
+        total = 0
+        while done_id < cutoff:
+            with self._transaction() as c:
+                rows = c.execute(
+                    self._sql("SELECT * FROM submissions WHERE id > ? AND id <= ? ORDER BY id LIMIT ?"),
+                    (done_id, cutoff, batch_size),
+                ).fetchall()
+                if not rows:
+                    done_id = cutoff
+                for r in rows:
+                    self._insert_workers(c, r["id"], compute(r))
+                    done_id = r["id"]
+                self._meta_set(c, BACKFILL_KEY, f"{done_id}/{cutoff}")
+            total += len(rows)
+        return total
+
+    def backfill_state(self) -> Optional[str]:
+        with self._transaction() as c:
+            return self._meta_get(c, BACKFILL_KEY)
+
+    @abstractmethod
+    def init_schema(self) -> None:
+        """Táblák, indexek, triggerek létrehozása (idempotens)."""
+
+    @abstractmethod
+    def insert_submissions(self, rows: Sequence[Dict[str, Any]]) -> List[int]:
+        """Egy tranzakcióban szúrja be a sorokat; a kiosztott id-ket adja vissza."""
+
+    def insert_submission(self, row: Dict[str, Any]) -> int:
+        return self.insert_submissions([row])[0]
+
+    @abstractmethod
+    def _text_filter(self, q: str, bau: str):
+        """Háttértár-specifikus szövegszűrés: (join SQL, feltételek, paraméterek)."""
+
+    def list_submissions(self, q: str = "", bau: str = "", datum: str = "",
+                         after: Optional[str] = None, before: Optional[str] = None, limit: int = 50):
+        """
+        Kulcshalmaz-lapozás (created_at, id) szerint, újabbak elöl: a mélyebb oldalak ugyanolyan
+        olcsók, mint az első. after: a lap utolsó sorának kurzora (régebbiek), before: az első
+        soré (újabbak). Visszatér: (sorok, régebbi-kurzor|None, újabb-kurzor|None).
+        """
+        join, where, params = self._text_filter(q, bau)
+        if datum.strip():
+            if _ISO_DATE.match(datum.strip()):
+                where.append("s.datum = ?"); params.append(datum.strip())
+            else:
+                where.append("s.datum LIKE ?"); params.append(f"%{datum.strip()}%")
+        cur = decode_cursor(after) if after else (decode_cursor(before) if before else None)
+        backwards = bool(before) and not after and cur is not None
+        if cur is not None:
+            where.append("(s.created_at, s.id) > (?, ?)" if backwards else "(s.created_at, s.id) < (?, ?)")
+            params += [cur[0], cur[1]]
+        order = "ASC" if backwards else "DESC"
+        sql = (f"SELECT {ADMIN_LIST_COLUMNS} FROM submissions s {join} "
+               + ("WHERE " + " AND ".join(where) + " " if where else "")
+               + f"ORDER BY s.created_at {order}, s.id {order} LIMIT ?")
+        params.append(int(limit) + 1)
+        with self._transaction() as c:
+            rows = c.execute(self._sql(sql), params).fetchall()
+        more = len(rows) > limit
+        rows = list(rows[:limit])
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return rows, None, None
+        older = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if (more or backwards) else None
+        newer = encode_cursor(rows[0]["created_at"], rows[0]["id"]) if (cur is not None and (not backwards or more)) else None
+        return rows, older, newer
+
+    @abstractmethod
+    def get_submission(self, sid: int):
+        """Egy beküldés sora, vagy None."""
+
+    def iter_export(self, date_from: str = "", date_to: str = "", bau: str = "", batch_size: int = 500):
+        """
+        (beküldés, [dolgozósorok]) párok datum, id sorrendben, kötegenként lekérdezve: a memóriaigény
+        a köteg méretétől függ, nem az exportált sorok számától. Minden köteg külön rövid lekérdezés
+        (kulcshalmaz-lapozás), így a generátor szálkészletből, szálak között is léptethető.
+        """
+        where, params = [], []
+        if date_from.strip():
+            where.append("s.datum >= ?"); params.append(date_from.strip())
+        if date_to.strip():
+            where.append("s.datum <= ?"); params.append(date_to.strip())
+        if bau.strip():
+            where.append("s.bau = ?"); params.append(bau.strip())
+        cursor = None
+        while True:
+            w = list(where); p = list(params)
+            if cursor is not None:
+                w.append("(s.datum, s.id) > (?, ?)"); p += list(cursor)
+            sql = ("SELECT s.id, s.created_at, s.datum, s.bau, s.basf_beauftragter, s.beschreibung, "
+                   "s.break_minutes, s.excel_filename FROM submissions s "
+                   + ("WHERE " + " AND ".join(w) + " " if w else "")
+                   + "ORDER BY s.datum, s.id LIMIT ?")
+            with self._transaction() as c:
+                subs = c.execute(self._sql(sql), p + [int(batch_size)]).fetchall()
+                if not subs:
+                    return
+                ids = [r["id"] for r in subs]
+                workers = c.execute(self._sql(
+                    f"SELECT * FROM submission_workers WHERE submission_id IN ({', '.join('?' * len(ids))}) "
+                    "ORDER BY submission_id, slot"), ids).fetchall()
+            by_sub: Dict[int, list] = {}
+            for wr in workers:
+                by_sub.setdefault(wr["submission_id"], []).append(wr)
+            for r in subs:
+                yield r, by_sub.get(r["id"], [])
+            cursor = (subs[-1]["datum"], subs[-1]["id"])
+
+    @abstractmethod
+    def company_id_for_slug(self, slug: str) -> Optional[int]:
+        """A cég id-je a slug alapján, vagy None."""
+
+    @abstractmethod
+    def workers_for_company(self, company_id: int, q: str = "", limit: Optional[int] = None) -> list:
+        """q üres: mind (limit nélkül a CSV-hez); egyébként név/Ausweis részszó-keresés."""
+
+    def companies(self) -> list:
+        """Az összes cég (id, slug, name) – a tenant-nyilvántartás egyszeri betöltéséhez."""
+        with self._transaction() as c:
+            return c.execute("SELECT id, slug, name FROM companies ORDER BY id").fetchall()
+
+    def tenant_registry_version(self) -> int:
+        """A companies tábla verziója (a worker_directory_versions 0-s sora; companies-triggerek léptetik)."""
+        return self.worker_directory_version(0)
+
+    def worker_directory_version(self, company_id: int) -> int:
+        """A cég dolgozólistájának verziója – a workers tábla triggerei léptetik minden változáskor."""
+        with self._transaction() as c:
+            row = c.execute(self._sql("SELECT version FROM worker_directory_versions WHERE company_id = ?"),
+                            (company_id,)).fetchone()
+        return int(row["version"]) if row else 0
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.backend}
+
+
+# ---------- SQLite ----------
+class SQLiteStorage(Storage):
+    backend = "sqlite"
+
+    # állandó SQL-szövegek: a tartós kapcsolat utasítás-gyorsítótára újrahasznosítja őket
+    SQL_INSERT_SUBMISSION = (
+        f"INSERT INTO submissions ({', '.join(SUBMISSION_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(SUBMISSION_COLUMNS))})"
+    )
+    SQL_COMPANY_BY_SLUG = "SELECT id FROM companies WHERE slug = ?"
+    SQL_WORKERS_CSV = ("SELECT last_name, first_name, COALESCE(badge,'') AS badge "
+                       "FROM workers WHERE company_id = ? ORDER BY last_name, first_name")
+    SQL_WORKERS_LIST = """
+        SELECT first_name, last_name, badge
+          FROM workers
+         WHERE company_id = ?
+         ORDER BY last_name COLLATE NOCASE, first_name COLLATE NOCASE
+         LIMIT ?
+    """
+    SQL_WORKERS_SEARCH = """
+        SELECT first_name, last_name, badge
+          FROM workers
+         WHERE company_id = ? AND (LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ? OR badge LIKE ?)
+         ORDER BY last_name COLLATE NOCASE, first_name COLLATE NOCASE
+         LIMIT ?
+    """
+
+    def __init__(self, pool: SQLitePool):
+        self.pool = pool
+
+    def conn(self):
+        return self.pool.connection()
+
+    @contextmanager
+    def _transaction(self):
+        with self.conn() as c:
+            yield c
+
+    def init_schema(self) -> None:
+        with self.conn() as c:
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                datum TEXT,
+                bau TEXT,
+                basf_beauftragter TEXT,
+                beschreibung TEXT,
+                break_minutes INTEGER,
+                vorname1 TEXT, nachname1 TEXT, ausweis1 TEXT, beginn1 TEXT, ende1 TEXT, vorhaltung1 TEXT,
+                vorname2 TEXT, nachname2 TEXT, ausweis2 TEXT, beginn2 TEXT, ende2 TEXT, vorhaltung2 TEXT,
+                vorname3 TEXT, nachname3 TEXT, ausweis3 TEXT, beginn3 TEXT, ende3 TEXT, vorhaltung3 TEXT,
+                vorname4 TEXT, nachname4 TEXT, ausweis4 TEXT, beginn4 TEXT, ende4 TEXT, vorhaltung4 TEXT,
+                vorname5 TEXT, nachname5 TEXT, ausweis5 TEXT, beginn5 TEXT, ende5 TEXT, vorhaltung5 TEXT,
+                excel_filename TEXT,
+                payload_json TEXT
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS submission_workers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                submission_id INTEGER NOT NULL REFERENCES submissions(id),
+                slot INTEGER NOT NULL,
+                vorname TEXT, nachname TEXT, ausweis TEXT, beginn TEXT, ende TEXT, vorhaltung TEXT,
+                hours REAL NOT NULL DEFAULT 0,
+                UNIQUE (submission_id, slot)
+            )
+            """)
+            c.execute("CREATE TABLE IF NOT EXISTS schema_meta (k TEXT PRIMARY KEY, v TEXT)")
+            for ddl in INDEX_DDL:
+                c.execute(ddl)
+            self._init_worker_directory(c)
+            # a SQLite-ban a foreign_keys ki van kapcsolva (a replikáció INSERT OR REPLACE-e miatt): kaszkád triggerrel
+            c.execute("""CREATE TRIGGER IF NOT EXISTS submissions_workers_ad AFTER DELETE ON submissions BEGIN
+                DELETE FROM submission_workers WHERE submission_id = OLD.id; END""")
+            self._init_fts(c)
+
+    def _init_worker_directory(self, c) -> None:
+        """companies/workers (ha még nincsenek) + cégenkénti verziószámláló, triggerekkel léptetve."""
+        c.execute("CREATE TABLE IF NOT EXISTS companies (id INTEGER PRIMARY KEY, slug TEXT NOT NULL UNIQUE, name TEXT)")
+        c.execute("""CREATE TABLE IF NOT EXISTS workers (id INTEGER PRIMARY KEY, company_id INTEGER NOT NULL,
+                     first_name TEXT, last_name TEXT, badge TEXT)""")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_workers_company ON workers(company_id)")
+        c.execute("CREATE TABLE IF NOT EXISTS worker_directory_versions (company_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+        bump = lambda ref: (f"INSERT INTO worker_directory_versions (company_id, version) VALUES ({ref}.company_id, 1) "
+                            f"ON CONFLICT (company_id) DO UPDATE SET version = version + 1;")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS workers_version_ai AFTER INSERT ON workers BEGIN {bump('NEW')} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS workers_version_au AFTER UPDATE ON workers BEGIN {bump('OLD')} {bump('NEW')} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS workers_version_ad AFTER DELETE ON workers BEGIN {bump('OLD')} END")
+        # a companies változásai a 0-s sort léptetik (tenant-nyilvántartás); a cég-id-k 1-től indulnak
+        bump0 = ("INSERT INTO worker_directory_versions (company_id, version) VALUES (0, 1) "
+                 "ON CONFLICT (company_id) DO UPDATE SET version = version + 1;")
+        for op, suffix in (("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad")):
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS companies_version_{suffix} AFTER {op} ON companies BEGIN {bump0} END")
+
+    def _init_fts(self, c) -> None:
+        """FTS5-index a submissions fölött; triggerek tartják szinkronban (a replikációs
+        visszajátszás INSERT OR REPLACE-ét is kezeli). Első alkalommal feltöltjük a meglévő sorokból."""
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(
+                bau, basf_beauftragter, beschreibung, workers,
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        """)
+        values = lambda ref: (f"{ref}.id, {ref}.bau, {ref}.basf_beauftragter, {ref}.beschreibung, "
+                              f"{_fts_workers_expr(ref)}")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS submissions_fts_ai AFTER INSERT ON submissions BEGIN
+            INSERT OR REPLACE INTO submissions_fts (rowid, bau, basf_beauftragter, beschreibung, workers)
+            VALUES ({values('NEW')}); END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS submissions_fts_au AFTER UPDATE ON submissions BEGIN
+            DELETE FROM submissions_fts WHERE rowid = OLD.id;
+            INSERT OR REPLACE INTO submissions_fts (rowid, bau, basf_beauftragter, beschreibung, workers)
+            VALUES ({values('NEW')}); END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS submissions_fts_ad AFTER DELETE ON submissions BEGIN
+            DELETE FROM submissions_fts WHERE rowid = OLD.id; END""")
+        if self._meta_get(c, FTS_KEY) is None:
+            c.execute(f"""INSERT OR REPLACE INTO submissions_fts (rowid, bau, basf_beauftragter, beschreibung, workers)
+                          SELECT {values('s')} FROM submissions s""")
+            self._meta_set(c, FTS_KEY, "1")
+
+    def insert_submissions(self, rows):
+        ids = []
+        with self.conn() as c:
+            for row in rows:
+                cur = c.execute(self.SQL_INSERT_SUBMISSION, [row.get(k) for k in SUBMISSION_COLUMNS])
+                ids.append(cur.lastrowid)
+                self._insert_workers(c, cur.lastrowid, row.get("workers") or ())
+        return ids
+
+    def _text_filter(self, q, bau):
+        match = [f'"{t}"*' for t in search_tokens(q)]
+        match += [f'bau : "{t}"*' for t in search_tokens(bau)]
+        if not match:
+            return "", [], []
+        return "JOIN submissions_fts f ON f.rowid = s.id", ["submissions_fts MATCH ?"], [" ".join(match)]
+
+    def get_submission(self, sid):
+        with self.conn() as c:
+            return c.execute("SELECT * FROM submissions WHERE id = ?", (sid,)).fetchone()
+
+    def company_id_for_slug(self, slug):
+        with self.conn() as c:
+            row = c.execute(self.SQL_COMPANY_BY_SLUG, (slug,)).fetchone()
+        return int(row["id"]) if row else None
+
+    def workers_for_company(self, company_id, q="", limit=None):
+        with self.conn() as c:
+            if q.strip():
+                like = f"%{q.strip().lower()}%"
+                return c.execute(self.SQL_WORKERS_SEARCH, (company_id, like, like, f"%{q.strip()}%", limit or -1)).fetchall()
+            if limit is None:
+                return c.execute(self.SQL_WORKERS_CSV, (company_id,)).fetchall()
+            return c.execute(self.SQL_WORKERS_LIST, (company_id, limit)).fetchall()
+
+    def close(self):
+        self.pool.close_all()
+
+    def stats(self):
+        return {"backend": self.backend, **self.pool.stats()}
+
+
+# ---------- PostgreSQL ----------
+class PostgresStorage(Storage):
+    backend = "postgres"
+    P = "%s"
+
+    SQL_INSERT_SUBMISSION = (
+        f"INSERT INTO submissions ({', '.join(SUBMISSION_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(SUBMISSION_COLUMNS))}) RETURNING id"
+    )
+    SQL_COMPANY_BY_SLUG = "SELECT id FROM companies WHERE slug = %s"
+    SQL_WORKERS_CSV = ("SELECT last_name, first_name, COALESCE(badge,'') AS badge "
+                       "FROM workers WHERE company_id = %s ORDER BY last_name, first_name")
+    SQL_WORKERS_LIST = """
+        SELECT first_name, last_name, badge
+          FROM workers
+         WHERE company_id = %s
+         ORDER BY LOWER(last_name), LOWER(first_name)
+         LIMIT %s
+    """
+    SQL_WORKERS_SEARCH = """
+        SELECT first_name, last_name, badge
+          FROM workers
+         WHERE company_id = %s AND (LOWER(first_name) LIKE %s OR LOWER(last_name) LIKE %s OR badge LIKE %s)
+         ORDER BY LOWER(last_name), LOWER(first_name)
+         LIMIT %s
+    """
+
+    @staticmethod
+    def _fts_document(ref: str) -> str:
+        return (f"coalesce({ref}.bau,'') || ' ' || coalesce({ref}.basf_beauftragter,'') || ' ' || "
+                f"coalesce({ref}.beschreibung,'') || ' ' || " + _fts_workers_expr(ref))
+
+    # több példány egyszerre is indulhat: a sémát tranzakciós advisory lock alatt hozzuk létre
+    SCHEMA_LOCK_ID = 0x4C4E4157
+
+    def __init__(self, dsn: str, *, min_size: int = 1, max_size: int = 10, prepare_threshold: int = 1,
+                 connect_timeout: float = 10.0):
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+        self.dsn = dsn
+        # prepare_threshold=1: a gyakori lekérdezések már a második futástól szerveroldali előkészített utasítások
+        self.pool = ConnectionPool(
+            dsn, min_size=min_size, max_size=max_size, open=True, name="app",
+            kwargs={"row_factory": dict_row, "prepare_threshold": prepare_threshold},
+        )
+        # induláskor gyors, egyértelmű hiba, ha az adatbázis nem érhető el
+        self.pool.wait(timeout=connect_timeout)
+
+    @contextmanager
+    def _transaction(self):
+        with self.pool.connection() as c:
+            with c.transaction():
+                yield c
+
+    def init_schema(self) -> None:
+        with self.pool.connection() as c:
+            c.execute("SELECT pg_advisory_xact_lock(%s)", (self.SCHEMA_LOCK_ID,))
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id BIGSERIAL PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                datum TEXT,
+                bau TEXT,
+                basf_beauftragter TEXT,
+                beschreibung TEXT,
+                break_minutes INTEGER,
+                vorname1 TEXT, nachname1 TEXT, ausweis1 TEXT, beginn1 TEXT, ende1 TEXT, vorhaltung1 TEXT,
+                vorname2 TEXT, nachname2 TEXT, ausweis2 TEXT, beginn2 TEXT, ende2 TEXT, vorhaltung2 TEXT,
+                vorname3 TEXT, nachname3 TEXT, ausweis3 TEXT, beginn3 TEXT, ende3 TEXT, vorhaltung3 TEXT,
+                vorname4 TEXT, nachname4 TEXT, ausweis4 TEXT, beginn4 TEXT, ende4 TEXT, vorhaltung4 TEXT,
+                vorname5 TEXT, nachname5 TEXT, ausweis5 TEXT, beginn5 TEXT, ende5 TEXT, vorhaltung5 TEXT,
+                excel_filename TEXT,
+                payload_json TEXT
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS companies (
+                id SERIAL PRIMARY KEY,
+                slug TEXT NOT NULL UNIQUE,
+                name TEXT
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                id SERIAL PRIMARY KEY,
+                company_id INTEGER NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+                first_name TEXT,
+                last_name TEXT,
+                badge TEXT
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS ix_workers_company ON workers(company_id)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS worker_directory_versions (
+                company_id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+            """)
+            c.execute("""
+            CREATE OR REPLACE FUNCTION bump_worker_directory_version() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO worker_directory_versions (company_id, version) VALUES (OLD.company_id, 1)
+                    ON CONFLICT (company_id) DO UPDATE SET version = worker_directory_versions.version + 1;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO worker_directory_versions (company_id, version) VALUES (NEW.company_id, 1)
+                    ON CONFLICT (company_id) DO UPDATE SET version = worker_directory_versions.version + 1;
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+            """)
+            c.execute("DROP TRIGGER IF EXISTS workers_version ON workers")
+            c.execute("""CREATE TRIGGER workers_version AFTER INSERT OR UPDATE OR DELETE ON workers
+                         FOR EACH ROW EXECUTE FUNCTION bump_worker_directory_version()""")
+            # a companies változásai a 0-s sort léptetik (tenant-nyilvántartás)
+            c.execute("""
+            CREATE OR REPLACE FUNCTION bump_tenant_registry_version() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO worker_directory_versions (company_id, version) VALUES (0, 1)
+                ON CONFLICT (company_id) DO UPDATE SET version = worker_directory_versions.version + 1;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+            """)
+            c.execute("DROP TRIGGER IF EXISTS companies_version ON companies")
+            c.execute("""CREATE TRIGGER companies_version AFTER INSERT OR UPDATE OR DELETE ON companies
+                         FOR EACH STATEMENT EXECUTE FUNCTION bump_tenant_registry_version()""")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS submission_workers (
+                id BIGSERIAL PRIMARY KEY,
+                submission_id BIGINT NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+                slot INTEGER NOT NULL,
+                vorname TEXT, nachname TEXT, ausweis TEXT, beginn TEXT, ende TEXT, vorhaltung TEXT,
+                hours DOUBLE PRECISION NOT NULL DEFAULT 0,
+                UNIQUE (submission_id, slot)
+            )
+            """)
+            c.execute("CREATE TABLE IF NOT EXISTS schema_meta (k TEXT PRIMARY KEY, v TEXT)")
+            for ddl in INDEX_DDL:
+                c.execute(ddl)
+            # ugyanaz a kifejezés, mint a keresésben – így a GIN-index használható
+            c.execute("CREATE INDEX IF NOT EXISTS ix_submissions_fts ON submissions "
+                      f"USING GIN (to_tsvector('simple', {self._fts_document('submissions')}))")
+
+    def insert_submissions(self, rows):
+        ids = []
+        with self._transaction() as c:
+            for row in rows:
+                sid = c.execute(self.SQL_INSERT_SUBMISSION, [row.get(k) for k in SUBMISSION_COLUMNS]).fetchone()["id"]
+                ids.append(sid)
+                self._insert_workers(c, sid, row.get("workers") or ())
+        return ids
+
+    def _text_filter(self, q, bau):
+        where, params = [], []
+        tokens = search_tokens(q)
+        if tokens:
+            where.append(f"to_tsvector('simple', {self._fts_document('s')}) @@ to_tsquery('simple', ?)")
+            params.append(" & ".join(f"{t}:*" for t in tokens))
+        if bau.strip():
+            where.append("s.bau ILIKE ?"); params.append(f"%{bau.strip()}%")
+        return "", where, params
+
+    def get_submission(self, sid):
+        with self.pool.connection() as c:
+            return c.execute("SELECT * FROM submissions WHERE id = %s", (sid,)).fetchone()
+
+    def company_id_for_slug(self, slug):
+        with self.pool.connection() as c:
+            row = c.execute(self.SQL_COMPANY_BY_SLUG, (slug,)).fetchone()
+        return int(row["id"]) if row else None
+
+    def workers_for_company(self, company_id, q="", limit=None):
+        with self.pool.connection() as c:
+            if q.strip():
+                like = f"%{q.strip().lower()}%"
+                return c.execute(self.SQL_WORKERS_SEARCH, (company_id, like, like, f"%{q.strip()}%", limit)).fetchall()
+            if limit is None:
+                return c.execute(self.SQL_WORKERS_CSV, (company_id,)).fetchall()
+            return c.execute(self.SQL_WORKERS_LIST, (company_id, limit)).fetchall()
+
+    def close(self):
+        self.pool.close()
+
+    def stats(self):
+        s = self.pool.get_stats()
+        return {"backend": self.backend, "pool_size": s.get("pool_size"), "pool_available": s.get("pool_available"),
+                "requests_waiting": s.get("requests_waiting")}
+
+
+def open_storage(backend: str, *, sqlite_pool: Optional[SQLitePool] = None, dsn: str = "",
+                 pool_min: int = 1, pool_max: int = 10) -> Storage:
+    backend = (backend or "sqlite").strip().lower()
+    if backend in ("postgres", "postgresql", "pg"):
+        if not dsn:
+            raise RuntimeError("DB_BACKEND=postgres requires DATABASE_URL")
+        return PostgresStorage(dsn, min_size=pool_min, max_size=pool_max)
+    if backend != "sqlite":
+        raise RuntimeError(f"unknown DB_BACKEND {backend!r}")
+    if sqlite_pool is None:
+        raise RuntimeError("SQLite backend requires a pool")
+    return SQLiteStorage(sqlite_pool)
@@ -3,6 +3,8 @@ from typing import Iterable, Optional, Set
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import RedirectResponse
 
+from app.tenants import request_host, tenant_slug
+
 class TenantRootRedirectMiddleware(BaseHTTPMiddleware):
     """
     Multitenant gyökér-átirányítás:
@@ -11,6 +13,11 @@ class TenantRootRedirectMiddleware(BaseHTTPMiddleware):
       - akkor átirányít loginra (/login?next=/form).
 
     Skálázható: nem kell felsorolni az aldomaineket; minden jövőbeni *.metori.de-re működik.
+
+    registry (app.tenants.TenantRegistry) megadásakor a tenantot is feloldja és a kérésre teszi:
+    request.state.tenant_slug, request.state.tenant – a végpontoknak már nem kell a DB-hez fordulniuk.
+
+    trust_forwarded_host: az X-Forwarded-Host használata (csak megbízható proxy mögött).
     """
 
     def __init__(
@@ -19,6 +26,8 @@ class TenantRootRedirectMiddleware(BaseHTTPMiddleware):
         base_domain: str,
         main_domains: Optional[Iterable[str]] = None,
         login_target: str = "/login?next=/form",
+        registry=None,
+        trust_forwarded_host: bool = False,
     ):
         super().__init__(app)
         self.base_domain = (base_domain or "").lower().lstrip(".")
@@ -27,15 +36,21 @@ class TenantRootRedirectMiddleware(BaseHTTPMiddleware):
         # Biztonság kedvéért tisztítjuk a portot is
         self.main_domains = {d.split(":", 1)[0] for d in mains}
         self.login_target = login_target
+        self.registry = registry
+        self.trust_forwarded_host = bool(trust_forwarded_host)
 
     async def dispatch(self, request, call_next):
-        host = (request.headers.get("host") or request.url.hostname or "").lower()
-        host = host.split(":", 1)[0]  # port lecsupaszítása
+        host = request_host(request, self.trust_forwarded_host)
         path = (request.url.path or "/")
-        # Tenant-aldomain detektálása: *.base_domain és nem a fő/main domainek egyike
-        is_tenant = host.endswith("." + self.base_domain) and host not in self.main_domains
+        if self.registry is not None:
+            slug, tenant = await self.registry.resolve(host)
+            request.state.tenant_slug = slug
+            request.state.tenant = tenant
+        else:
+            slug = tenant_slug(host, self.base_domain, self.main_domains)
 
-        if is_tenant and path == "/":
+        # Tenant-aldomain: *.base_domain és nem a fő/main domainek egyike
+        if slug and path == "/":
             return RedirectResponse(self.login_target, status_code=302)
 
         return await call_next(request)
@@ -0,0 +1,145 @@
+"""
+Tenant-nyilvántartás: Host → cég (slug, company_id), kérésenként adatbázis-hívás nélkül.
+
+Egyetlen hely, ahol a Hostból tenant lesz:
+  * tenant_slug(host): *.BASE_DOMAIN aldomain → slug; a fődomaineken (metori.de, www) nincs slug;
+  * TenantRegistry: a companies tábla teljes slug → cég térképe memóriában. A frissesség a
+    tárolóban lévő verziószámlálón múlik (companies-triggerek léptetik): legfeljebb recheck_s
+    másodpercenként kérdezzük le, és csak változáskor töltünk újra.
+    Ismeretlen slug (új cég, vagy elgépelt/kitalált aldomain) egyszer azonnali ellenőrzést kap,
+    utána negative_ttl másodpercig "nincs ilyen" – a botok aldomain-próbálgatása sem ér el a DB-ig.
+A köztesréteg (tenant_redirect_middleware.py) kérésenként feloldja és a request.state-re teszi:
+request.state.tenant_slug, request.state.tenant (Tenant vagy None).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+NEGATIVE_MAX = 10000   # ennyi ismeretlen slug felett a negatív cache-t ürítjük
+
+
+@dataclass(frozen=True)
+class Tenant:
+    company_id: int
+    slug: str
+    name: Optional[str] = None
+
+
+def request_host(request, trust_forwarded: bool = False) -> str:
+    """
+    A kérés hostja port nélkül, kisbetűvel. Az X-Forwarded-Host-ot (első elem) csak
+    trust_forwarded=True esetén vesszük figyelembe – azt bármelyik kliens beállíthatja, így csak
+    olyan proxy mögött szabad, amely felülírja (TRUST_FORWARDED_HOST); egyébként a Host számít.
+    """
+    forwarded = request.headers.get("x-forwarded-host") if trust_forwarded else None
+    host = (forwarded or request.headers.get("host") or request.url.hostname or "")
+    return host.split(",")[0].strip().split(":", 1)[0].lower()
+
+
+def tenant_slug(host: str, base_domain: str, main_domains: Iterable[str] = ()) -> Optional[str]:
+    """pl. 'muster.metori.de' -> 'muster'; a fődomaineken és idegen hostokon None."""
+    host = (host or "").split(":", 1)[0].lower()
+    base = (base_domain or "").lower().lstrip(".")
+    if not host or not base or host in main_domains or not host.endswith("." + base):
+        return None
+    # az első komponens az aldomain
+    return host[: -len(base) - 1].split(".")[0] or None
+
+
+class TenantRegistry:
+    """
+    load() → [{"id", "slug", "name"}…] és version() → int szinkron tárolóhívások (szálkészletből);
+    lookup()/needs_check() a kérés-szálon zár nélkül futnak.
+    """
+
+    def __init__(self, load: Callable[[], list], version: Callable[[], int], *, base_domain: str,
+                 main_domains: Optional[Iterable[str]] = None, recheck_s: float = 5.0, negative_ttl: float = 60.0):
+        self._load = load
+        self._version = version
+        self.base_domain = (base_domain or "").lower().lstrip(".")
+        mains = main_domains or [self.base_domain, f"www.{self.base_domain}"]
+        self.main_domains = {d.lower().split(":", 1)[0] for d in mains if d}
+        self.recheck_s = float(recheck_s)
+        self.negative_ttl = float(negative_ttl)
+        self._by_slug: Dict[str, Tenant] = {}
+        self._negative: Dict[str, float] = {}   # ismeretlen slug -> utolsó ellenőrzés ideje
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.checks = 0
+        self.hits = 0
+        self.negative_hits = 0
+
+    def slug_for_host(self, host: str) -> Optional[str]:
+        return tenant_slug(host, self.base_domain, self.main_domains)
+
+    def needs_check(self, slug: Optional[str] = None) -> bool:
+        """Kell-e most verziót ellenőrizni (lejárt recheck_s, vagy még nem látott ismeretlen slug)."""
+        now = time.monotonic()
+        if self.version is None or now - self._checked_at >= self.recheck_s:
+            return True
+        if slug is None or slug in self._by_slug:
+            return False
+        seen = self._negative.get(slug)
+        return seen is None or now - seen >= self.negative_ttl
+
+    def refresh(self, slug: Optional[str] = None) -> None:
+        """Verzió-ellenőrzés, és csak változáskor újratöltés; a még mindig ismeretlen slugot megjegyezzük."""
+        with self._lock:
+            version = self._version()
+            self.checks += 1
+            if version != self.version:
+                t0 = time.perf_counter()
+                by_slug = {}
+                for r in self._load():
+                    r = dict(r)
+                    slug_ = (r.get("slug") or "").strip().lower()
+                    if slug_:
+                        by_slug[slug_] = Tenant(int(r["id"]), slug_, r.get("name"))
+                self._by_slug = by_slug
+                self._negative = {}
+                self.version = version
+                self.loads += 1
+                print(f"Tenant registry: v{version}, {len(by_slug)} tenants "
+                      f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+            now = time.monotonic()
+            self._checked_at = now
+            if slug is not None and slug not in self._by_slug:
+                if len(self._negative) >= NEGATIVE_MAX:
+                    self._negative.clear()
+                self._negative[slug] = now
+
+    def lookup(self, slug: Optional[str]) -> Optional[Tenant]:
+        if not slug:
+            return None
+        tenant = self._by_slug.get(slug)
+        if tenant is not None:
+            self.hits += 1
+        else:
+            self.negative_hits += 1
+        return tenant
+
+    async def resolve(self, host: str):
+        """(slug, Tenant | None) – DB-hívás csak ha needs_check (szálkészletben)."""
+        slug = self.slug_for_host(host)
+        if self.needs_check(slug):
+            try:
+                await run_in_threadpool(self.refresh, slug)
+            except Exception as e:
+                # a tároló átmenetileg nem elérhető: a meglévő térképpel szolgálunk ki
+                print(f"Tenant registry refresh failed: {e}")
+        return slug, self.lookup(slug)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version, "tenants": len(self._by_slug), "negative": len(self._negative),
+            "loads": self.loads, "version_checks": self.checks, "hits": self.hits,
+            "negative_hits": self.negative_hits, "recheck_s": self.recheck_s, "negative_ttl": self.negative_ttl,
+        }
@@ -0,0 +1,212 @@
+"""
+Kétszintű fordítási gyorsítótár az Azure / LibreTranslate hívások elé.
+
+  1. szint: folyamaton belüli LRU (OrderedDict, zárral) – a napi ismétlődő szövegek
+     ("montaža", "demontaža skele", …) hálózat és lemez nélkül jönnek vissza;
+  2. szint: SQLite tábla (data/translations.db – szándékosan nem az app.db-ben, hogy ne
+     kerüljön a tükrözött adatbázisba), újraindítás után is megmarad.
+
+Kulcs: (a normalizált szöveg SHA-1 hash-e, forrásnyelv, célnyelv) – a motortól független,
+így egy Azure-ral lefordított szöveget a LibreTranslate-re váltás után sem kérünk le újra.
+Lejárat (TTL) és méretkorlát mindkét szinten; a lejárt bejegyzés „tartalékként” még
+visszaadható, ha egyik fordító sem érhető el.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC + szóközök összevonása; a kis-/nagybetűt megtartjuk (a fordítás is megtartja)."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, db_path: Path, *, memory_items: int = 2048, max_rows: int = 50000,
+                 ttl_seconds: float = 90 * 86400):
+        self.db_path = Path(db_path)
+        self.memory_items = max(0, int(memory_items))
+        self.max_rows = max(1, int(max_rows))
+        self.ttl = float(ttl_seconds)
+        self._mem: "OrderedDict[tuple, Tuple[str, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts_since_trim = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._init_db()
+
+    # --- tárolás ---
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def _init_db(self) -> None:
+        c = self._conn()
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                text_hash TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                translated TEXT NOT NULL,
+                engine TEXT,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (text_hash, source, target)
+            ) WITHOUT ROWID
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS ix_translations_last_used ON translations(last_used)")
+
+    def _remember(self, key: tuple, value: Tuple[str, str, float]) -> None:
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_items:
+                self._mem.popitem(last=False)
+
+    # --- API ---
+    def get(self, text: str, source: str, target: str, *, allow_stale: bool = False) -> Optional[Tuple[str, str]]:
+        """(fordítás, motor) vagy None. allow_stale: a TTL-en túli bejegyzés is jó (fordító-kiesés)."""
+        key = (text_key(text), source, target)
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and (allow_stale or now - hit[2] < self.ttl):
+                self._mem.move_to_end(key)
+                self.memory_hits += 1
+                return hit[0], hit[1]
+        row = self._conn().execute(
+            "SELECT translated, engine, created_at FROM translations WHERE text_hash = ? AND source = ? AND target = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        translated, engine, created_at = row
+        fresh = now - created_at < self.ttl
+        if not fresh and not allow_stale:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._conn().execute(
+            "UPDATE translations SET last_used = ?, hits = hits + 1 WHERE text_hash = ? AND source = ? AND target = ?",
+            (now, *key),
+        )
+        with self._lock:
+            if fresh:
+                self.db_hits += 1
+            else:
+                self.stale_hits += 1
+        if fresh:
+            self._remember(key, (translated, engine or "", created_at))
+        return translated, engine or ""
+
+    def get_many(self, texts: Iterable[str], source: str, target: str, *,
+                 allow_stale: bool = False) -> Dict[str, Tuple[str, str]]:
+        """{szöveg: (fordítás, motor)} a megtalált szövegekre (szegmensenkénti kereséshez)."""
+        out = {}
+        for t in texts:
+            hit = self.get(t, source, target, allow_stale=allow_stale)
+            if hit is not None:
+                out[t] = hit
+        return out
+
+    def put(self, text: str, source: str, target: str, translated: str, engine: str) -> None:
+        self.put_many({text: translated}, source, target, engine)
+
+    def put_many(self, items: Dict[str, str], source: str, target: str, engine: str) -> None:
+        """{szöveg: fordítás} egy tranzakcióban."""
+        now = time.time()
+        rows = [((text_key(t), source, target), tr) for t, tr in items.items() if normalize_text(t) and tr]
+        if not rows:
+            return
+        c = self._conn()
+        c.execute("BEGIN")
+        try:
+            c.executemany(
+                "INSERT INTO translations (text_hash, source, target, translated, engine, created_at, last_used) "
+                "VALUES (?,?,?,?,?,?,?) ON CONFLICT(text_hash, source, target) DO UPDATE SET "
+                "translated = excluded.translated, engine = excluded.engine, created_at = excluded.created_at, "
+                "last_used = excluded.last_used",
+                [(*key, tr, engine, now, now) for key, tr in rows],
+            )
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        for key, tr in rows:
+            self._remember(key, (tr, engine, now))
+        with self._lock:
+            self.stores += len(rows)
+            self._puts_since_trim += len(rows)
+            trim = self._puts_since_trim >= 100
+            if trim:
+                self._puts_since_trim = 0
+        if trim:
+            self.trim()
+
+    def trim(self) -> int:
+        """
+        Kiürítés: a 2×TTL-nél régebbi sorok (tartaléknak sem kellenek), majd méret szerint a
+        legrégebben használtak a max_rows 90%-áig. A törölt sorok száma.
+        """
+        purged = self.purge_expired(keep_stale=self.ttl)
+        c = self._conn()
+        n = c.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if n <= self.max_rows:
+            return purged
+        drop = n - int(self.max_rows * 0.9)
+        c.execute("DELETE FROM translations WHERE (text_hash, source, target) IN "
+                  "(SELECT text_hash, source, target FROM translations ORDER BY last_used LIMIT ?)", (drop,))
+        with self._lock:
+            self.evicted += drop
+        return purged + drop
+
+    def purge_expired(self, keep_stale: float = 0.0) -> int:
+        """A TTL + keep_stale másodpercnél régebbi sorok törlése (a tartalék-használathoz keep_stale > 0)."""
+        cur = self._conn().execute("DELETE FROM translations WHERE created_at < ?",
+                                   (time.time() - self.ttl - keep_stale,))
+        with self._lock:
+            self.evicted += cur.rowcount or 0
+        return cur.rowcount or 0
+
+    def stats(self) -> dict:
+        rows = self._conn().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            total = hits + self.misses
+            return {
+                "memory_items": len(self._mem), "memory_max": self.memory_items,
+                "rows": rows, "max_rows": self.max_rows, "ttl_s": self.ttl,
+                "memory_hits": self.memory_hits, "db_hits": self.db_hits, "stale_hits": self.stale_hits,
+                "misses": self.misses, "stores": self.stores, "evicted": self.evicted,
+                "hit_ratio": round(hits / total, 3) if total else 0.0,
+            }
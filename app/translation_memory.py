@@ -0,0 +1,311 @@
+"""
+Helyi fordítási motor: glosszárium + fordítási memória (TM), hálózati hívás nélkül.
+
+  * GlossaryMatcher: a glossary.json kifejezéseiből egyszer felépített Aho–Corasick automata;
+    egy menetben (a szöveg hosszával arányosan, a szótármérettől függetlenül) megtalálja az
+    összes szakkifejezést (KTZ, HHW, BEHÄLTER, GREIFZUG…), szóhatárra illesztve, kis-/nagybetű
+    nélkül. A fordító felé menő szövegben helyőrzőre cseréljük őket, hogy a fordító ne
+    "fordítsa le" / ne rontsa el, utána a glosszárium szerinti alakot írjuk vissza.
+  * TranslationMemory: jóváhagyott (forrás, fordítás) párok. Találat:
+      - pontos: a normalizált kulcs (kisbetű, ékezet nélkül, írásjelek/szóközök összevonva,
+        számok helyén #) egyezik – az eltérő számokat a fordításban sorrendben kicseréljük;
+      - közel pontos (csak ha min_similarity < 1.0; alapból ki van kapcsolva): a trigram-index
+        adja a jelölteket, de elfogadni csak szavanként lehet – ugyanannyi szó, ugyanabban a
+        sorrendben, szavanként legfeljebb egy elgépelés (a szó eleje nem változhat, így a
+        "demontaža" ≠ "montaža", "nemoguće" ≠ "moguće" típusú előtagok sosem egyeznek).
+    A párok a data/translations.db translation_memory táblájában élnek, a keresés memóriából
+    megy (mikroszekundumok).
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# --- glosszárium ---
+
+
+def _fold_char(ch: str) -> str:
+    low = ch.lower()
+    return low if len(low) == 1 else ch   # a hossz maradjon (pozíciók az eredeti szövegben)
+
+
+class GlossaryMatcher:
+    def __init__(self, terms: Dict[str, str]):
+        self.terms = {k: v for k, v in terms.items() if k and k.strip()}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for term in self.terms:
+            node = 0
+            for ch in term:
+                ch = _fold_char(ch)
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({}); self._fail.append(0); self._out.append([])
+                node = nxt
+            self._out[node].append(term)
+        # hibamutatók szélességi bejárással
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """(kezdet, vég, kifejezés) – szóhatáron, balról a leghosszabb, átfedés nélkül."""
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            ch = _fold_char(ch)
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for term in self._out[node]:
+                start = i - len(term) + 1
+                end = i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    hits.append((start, end, term))
+        hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+        out, pos = [], 0
+        for h in hits:
+            if h[0] >= pos:
+                out.append(h); pos = h[1]
+        return out
+
+    def protect(self, text: str) -> Tuple[str, List[str]]:
+        """A kifejezések helyén ⟦n⟧ helyőrző; visszatér a cél-alakok listájával (n szerint)."""
+        parts, targets, pos = [], [], 0
+        for start, end, term in self.find(text):
+            parts.append(text[pos:start])
+            parts.append(f"⟦{len(targets)}⟧")
+            targets.append(self.terms[term])
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts), targets
+
+    def only_terms(self, text: str) -> Optional[str]:
+        """Ha a szöveg csak kifejezésekből (és írásjelekből) áll: a helyben előállított fordítás."""
+        hits = self.find(text)
+        if not hits:
+            return None
+        rest = text
+        for start, end, _ in reversed(hits):
+            rest = rest[:start] + rest[end:]
+        if any(ch.isalpha() for ch in rest):
+            return None
+        protected, targets = self.protect(text)
+        return restore_placeholders(protected, targets)
+
+
+_PLACEHOLDER_RE = re.compile(r"⟦\s*(\d+)\s*⟧")
+
+
+def restore_placeholders(text: str, targets: List[str]) -> Optional[str]:
+    """A helyőrzők visszacserélése; None, ha a fordító elhagyott/elrontott egyet."""
+    seen = set()
+
+    def sub(m):
+        i = int(m.group(1))
+        if i >= len(targets):
+            return m.group(0)
+        seen.add(i)
+        return targets[i]
+
+    out = _PLACEHOLDER_RE.sub(sub, text)
+    return out if len(seen) == len(targets) else None
+
+
+# --- fordítási memória ---
+
+_NUM_RE = re.compile(r"\d+(?:[.,:]\d+)*")
+_PUNCT_RE = re.compile(r"[\W_]+")
+
+
+def tm_key(text: str) -> Tuple[str, List[str]]:
+    """(normalizált kulcs, a szöveg számai) – ékezet, kis-/nagybetű, írásjel és szám független."""
+    nums = _NUM_RE.findall(text or "")
+    s = _NUM_RE.sub(" # ", text or "")
+    s = "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch)).lower()
+    s = s.replace("đ", "d").replace("ß", "ss")
+    return " ".join(_PUNCT_RE.sub(" ", s).split()), nums
+
+
+def _trigrams(key: str) -> Counter:
+    s = f"  {key} "
+    return Counter(s[i:i + 3] for i in range(len(s) - 2))
+
+
+class TranslationMemory:
+    def __init__(self, db_path: Path, *, min_similarity: float = 1.0):
+        self.db_path = Path(db_path)
+        self.min_similarity = float(min_similarity)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (source, target) -> {kulcs: (forrás, fordítás)}
+        self._exact: Dict[Tuple[str, str], Dict[str, Tuple[str, str]]] = {}
+        # (source, target) -> trigram -> kulcsok
+        self._grams: Dict[Tuple[str, str], Dict[str, set]] = {}
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._init_db()
+        self._load()
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = c
+        return c
+
+    def _init_db(self) -> None:
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                tm_key TEXT NOT NULL,
+                src_text TEXT NOT NULL,
+                tgt_text TEXT NOT NULL,
+                approved_at REAL NOT NULL,
+                PRIMARY KEY (source, target, tm_key)
+            ) WITHOUT ROWID
+        """)
+
+    def _load(self) -> None:
+        rows = self._conn().execute("SELECT source, target, src_text, tgt_text FROM translation_memory").fetchall()
+        for source, target, src, tgt in rows:
+            self._index(source, target, src, tgt)
+
+    def _index(self, source: str, target: str, src: str, tgt: str) -> str:
+        key, _ = tm_key(src)
+        lang = (source, target)
+        with self._lock:
+            exact = self._exact.setdefault(lang, {})
+            grams = self._grams.setdefault(lang, {})
+            if key not in exact:
+                for g in _trigrams(key):
+                    grams.setdefault(g, set()).add(key)
+            exact[key] = (src, tgt)
+        return key
+
+    def add(self, source: str, target: str, src: str, tgt: str) -> None:
+        """Jóváhagyott pár felvétele (azonos kulcsnál felülírja a korábbit)."""
+        src, tgt = (src or "").strip(), (tgt or "").strip()
+        if not src or not tgt:
+            raise ValueError("source and target text are required")
+        key = self._index(source, target, src, tgt)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO translation_memory (source, target, tm_key, src_text, tgt_text, approved_at) "
+            "VALUES (?,?,?,?,?,?)", (source, target, key, src, tgt, time.time()),
+        )
+
+    def lookup(self, text: str, source: str, target: str) -> Optional[Tuple[str, float]]:
+        """(fordítás, hasonlóság) vagy None."""
+        key, nums = tm_key(text)
+        lang = (source, target)
+        with self._lock:
+            hit = self._exact.get(lang, {}).get(key)
+            score = 1.0
+            if hit is None and self.min_similarity < 1.0:
+                hit, score = self._fuzzy(lang, key)
+            translated = _swap_numbers(hit, nums) if hit is not None else None
+            if translated is None:
+                self.misses += 1
+                return None
+            if score >= 1.0:
+                self.exact_hits += 1
+            else:
+                self.fuzzy_hits += 1
+        return translated, score
+
+    def _fuzzy(self, lang, key: str):
+        grams = self._grams.get(lang)
+        if not grams:
+            return None, 0.0
+        shared: Counter = Counter()
+        for g in _trigrams(key):
+            for cand in grams.get(g, ()):
+                shared[cand] += 1
+        best, best_score = None, 0.0
+        for cand, _ in shared.most_common(20):
+            score = _typo_similarity(key, cand)
+            if score is not None and score > best_score:
+                best, best_score = cand, score
+        if best is None or best_score < self.min_similarity:
+            return None, 0.0
+        return self._exact[lang][best], best_score
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": sum(len(v) for v in self._exact.values()),
+                "exact_hits": self.exact_hits, "fuzzy_hits": self.fuzzy_hits, "misses": self.misses,
+                "min_similarity": self.min_similarity,
+            }
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Legfeljebb egy beszúrás/törlés/csere/szomszédos felcserélés (Damerau)."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) <= 1:
+            return True
+        i, j = diff[0], diff[-1]
+        return len(diff) == 2 and j == i + 1 and a[i] == b[j] and a[j] == b[i]
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def _typo_similarity(key: str, cand: str) -> Optional[float]:
+    """
+    Szavankénti egyezés: ugyanazok a szavak ugyanabban a sorrendben, az eltérő szavak
+    legalább 4 betűsek, az első két betűjük azonos, és legfeljebb egy elgépelésnyire vannak.
+    Hasonlóság: 1 - eltérő szavak aránya; None, ha nem elfogadható.
+    """
+    a, b = key.split(), cand.split()
+    if len(a) != len(b) or not a:
+        return None
+    typos = 0
+    for x, y in zip(a, b):
+        if x == y:
+            continue
+        if "#" in x or "#" in y or min(len(x), len(y)) < 4 or x[:2] != y[:2] or not _within_one_edit(x, y):
+            return None
+        typos += 1
+    return 1.0 - typos / (2.0 * len(a))
+
+
+def _swap_numbers(hit: Tuple[str, str], nums: List[str]) -> Optional[str]:
+    """
+    A TM-fordítás számait a kérdezett szöveg számaira cseréli, ha azok sorrendben megfeleltethetők;
+    None, ha nem (ilyenkor inkább a fordító dolgozik, mint hogy rossz szám kerüljön a lapra).
+    """
+    src, tgt = hit
+    old = _NUM_RE.findall(src)
+    if old == nums:
+        return tgt
+    if len(old) != len(nums) or _NUM_RE.findall(tgt) != old:
+        return None
+    it = iter(nums)
+    return _NUM_RE.sub(lambda m: next(it), tgt)
@@ -0,0 +1,195 @@
+"""
+Fordító-végpontok láncolása: végpontonkénti megszakító (circuit breaker) + fedezett (hedged) kérések.
+
+  * CircuitBreaker: egymás utáni failure_threshold hiba után a végpont "nyitott" – a kérések
+    kihagyják, amíg reset_timeout el nem telik; utána egyetlen próbakérés (félig nyitott)
+    dönti el, hogy visszazár-e. A háttér-próbák (probe) ugyanígy táplálják az állapotot.
+  * run_hedged: a lánc első engedélyezett végpontját hívja; ha hedge_after mp alatt nem
+    válaszol, a következőt is elindítja, és az első sikeres válasz nyer (a lassabb kérés a
+    háttérben végigfut, csak a megszakító állapotát frissíti).
+    Hibánál azonnal a következő jön, az egész láncra deadline mp a felső korlát.
+    Fedezés nélkül minden kísérlet a hátralévő időnek csak a rá eső részét kapja (maradék /
+    hátralévő végpontok), így egy beragadt első végpont után is marad idő a következőre.
+    A saját idejét túllépő kísérlet hibának számít; amit csak a teljes lánc határideje vágott el,
+    az nem (release) – egy halott végpont ne nyissa meg az utána következő egészséges megszakítóját.
+
+Minden az eseményhurok szálán fut, ezért nincs szükség zárra.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, *, failure_threshold: int = 3, reset_timeout: float = 30.0, history: int = 256):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.last_error: Optional[str] = None
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self._latencies = deque(maxlen=history)
+
+    def allow(self) -> bool:
+        """Mehet-e kérés a végpontra; félig nyitott állapotban egyszerre csak egy próba."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.trial_running:
+            self.trial_running = True
+            return True
+        self.skipped += 1
+        return False
+
+    def due_for_probe(self) -> bool:
+        return self.state != CLOSED and time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_running
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self._latencies.append(latency)
+        self.consecutive_failures = 0
+        self.trial_running = False
+        self.state = CLOSED
+
+    def record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.last_error = error
+        self.consecutive_failures += 1
+        self.trial_running = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"Translator breaker {self.name}: open ({error})")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Megszakított (hedge-vesztes) hívás: se siker, se hiba – csak a próba-jelzőt engedjük el."""
+        self.trial_running = False
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 1) if lat else 0.0
+        return {
+            "state": self.state, "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes, "failures": self.failures, "skipped": self.skipped,
+            "last_error": self.last_error, "p50_ms": pct(0.5), "p99_ms": pct(0.99),
+        }
+
+
+# (breaker, hívás) – a hívás a fordított szöveget adja vagy kivételt dob
+Attempt = Tuple[CircuitBreaker, Callable[[], Awaitable[str]]]
+
+_background = set()
+
+
+def _finish_in_background(task: asyncio.Future, br: CircuitBreaker, started: float) -> None:
+    def done(t):
+        _background.discard(t)
+        if t.cancelled():
+            br.release()
+        elif t.exception() is not None:
+            br.record_failure(repr(t.exception()))
+        else:
+            br.record_success(time.monotonic() - started)
+    _background.add(task)
+    task.add_done_callback(done)
+
+
+async def run_hedged(chain: Sequence[Attempt], *, hedge_after: float = 0.0,
+                     deadline: float = 30.0) -> Tuple[str, CircuitBreaker, List[str]]:
+    """
+    (fordítás, nyertes végpont breakere, hibák) vagy RuntimeError, ha egyik sem sikerült.
+    hedge_after <= 0: nincs fedezés, csak hibánál lépünk tovább.
+    A nyertes mellett még futó (lassú) kérések a háttérben végigfutnak, hogy az eredményük
+    a megszakítót táplálja – különben egy mindig lassú végpont sosem nyitna.
+    """
+    queue = list(chain)
+    errors: List[str] = []
+    running = {}   # task -> (breaker, indulás)
+    budgets = {}   # task -> a kísérlet saját határideje (csak fedezés nélkül)
+    end = time.monotonic() + deadline
+
+    def launch_next() -> bool:
+        while queue:
+            br, call = queue.pop(0)
+            if not br.allow():
+                errors.append(f"{br.name}: circuit open")
+                continue
+            now = time.monotonic()
+            if end - now <= 0:
+                br.release()
+                errors.append(f"{br.name}: no time left")
+                return False
+            t = asyncio.ensure_future(call())
+            running[t] = (br, now)
+            if hedge_after <= 0:
+                budgets[t] = now + (end - now) / (1 + len(queue))
+            return True
+        return False
+
+    def expire_budgets() -> bool:
+        now = time.monotonic()
+        expired = [t for t, b in budgets.items() if b <= now]
+        for t in expired:
+            budgets.pop(t)
+            br, started = running.pop(t)
+            t.cancel()
+            br.record_failure(f"timeout after {now - started:.1f}s")
+            errors.append(f"{br.name}: timeout after {now - started:.1f}s")
+        return bool(expired)
+
+    launch_next()
+    try:
+        while running:
+            if expire_budgets():
+                if not running:
+                    launch_next()
+                continue
+            now = time.monotonic()
+            left = end - now
+            if left <= 0:
+                break
+            if hedge_after > 0 and queue:
+                wait = min(left, hedge_after)
+            elif budgets:
+                wait = max(0.0, min(left, min(budgets.values()) - now))
+            else:
+                wait = left
+            done, _ = await asyncio.wait(list(running), timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_after > 0:
+                    launch_next()   # lassú a futó kérés: fedezzük a következő végponttal
+                continue
+            for t in done:
+                budgets.pop(t, None)
+                br, started = running.pop(t)
+                exc = t.exception()
+                if exc is None:
+                    br.record_success(time.monotonic() - started)
+                    for rest, (rbr, rstarted) in running.items():
+                        _finish_in_background(rest, rbr, rstarted)
+                    running.clear()
+                    return t.result(), br, errors
+                br.record_failure(repr(exc))
+                errors.append(f"{br.name}: {exc!r}")
+            if not running:
+                launch_next()
+        for br, _ in running.values():
+            errors.append(f"{br.name}: deadline exceeded")   # a finally release-eli, nem hiba
+        raise RuntimeError("; ".join(errors) or "no translator available")
+    finally:
+        for t, (br, _) in running.items():
+            t.cancel()
+            br.release()
@@ -0,0 +1,197 @@
+"""
+Cégenkénti, memóriában tartott dolgozókereső az /api/workers autocomplete-hez.
+
+A teljes dolgozólista (név + Ausweis) egyszer betöltődik, és két indexet kap:
+  * előtag-index: a szavak (keresztnév, vezetéknév, Ausweis) rendezett listája – bisect-tel
+    a "jür" → Jürgen típusú gépelés szavankénti előtagként;
+  * trigram-index: 3 karakteres darabok → sorok, a régi LIKE '%q%' részszó-keresés helyett
+    (a jelölteket a metszet után a teljes szövegen ellenőrizzük).
+Mindkét oldal ékezet- és kisbetű-független (Jürgen = Jurgen = JURGEN, Đurić = Duric).
+
+A frissesség a tárolóban lévő verziószámlálón múlik (workers-triggerek léptetik): a
+verziót legfeljebb recheck_s másodpercenként kérdezzük le, és csak változáskor építünk újra.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+_FOLD_EXTRA = str.maketrans({"ß": "ss", "đ": "d", "ø": "o", "æ": "ae", "œ": "oe", "ł": "l", "ı": "i"})
+
+
+def fold(text: str) -> str:
+    s = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).translate(_FOLD_EXTRA)
+
+
+def _grams(s: str):
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class WorkerIndex:
+    """Egy cég pillanatképe; felépítés után csak olvasott (szálak között zár nélkül megosztható)."""
+
+    def __init__(self, rows: List[dict], version: int):
+        self.version = version
+        self.responses: Dict[tuple, tuple] = {}   # a verzióhoz előre elkészített válaszok (main.py)
+        self.rows = sorted(
+            ({"first_name": r["first_name"] or "", "last_name": r["last_name"] or "", "badge": r["badge"] or ""}
+             for r in rows),
+            key=lambda r: (r["last_name"].lower(), r["first_name"].lower()),
+        )
+        self._blob: List[str] = []
+        words: List[Tuple[str, int]] = []
+        self._trigrams: Dict[str, List[int]] = {}
+        for i, r in enumerate(self.rows):
+            blob = fold(f"{r['first_name']} {r['last_name']} {r['badge']}")
+            self._blob.append(blob)
+            for w in blob.split():
+                words.append((w, i))
+            for g in _grams(blob):
+                self._trigrams.setdefault(g, []).append(i)
+        words.sort()
+        self._words = [w for w, _ in words]
+        self._word_rows = [i for _, i in words]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _prefix_range(self, term: str) -> Tuple[int, int]:
+        return bisect_left(self._words, term), bisect_left(self._words, term + "\uffff")
+
+    def _candidates(self, term: str) -> Tuple[int, Callable[[], set]]:
+        """(becsült találatszám, a jelölthalmazt előállító függvény) – a legszelektívebb szó kiválasztásához."""
+        if len(term) < 3:
+            lo, hi = self._prefix_range(term)
+            return hi - lo, lambda: set(self._word_rows[lo:hi])
+        postings = sorted((self._trigrams.get(g, ()) for g in _grams(term)), key=len)
+
+        def build() -> set:
+            cand = set(postings[0])
+            for p in postings[1:]:
+                cand.intersection_update(p)
+                if not cand:
+                    break
+            return cand
+        return len(postings[0]), build
+
+    @staticmethod
+    def _matches(blob: str, term: str) -> bool:
+        if len(term) >= 3:
+            return term in blob
+        return blob.startswith(term) or (" " + term) in blob
+
+    @staticmethod
+    def _word_start(blob: str, term: str) -> bool:
+        return blob.startswith(term) or (" " + term) in blob
+
+    def search(self, q: str = "", limit: Optional[int] = None) -> List[dict]:
+        """
+        Minden keresőszónak illeszkednie kell (név vagy Ausweis): 3+ karakternél bárhol a
+        szövegben, rövidebbnél szó elején. Az első szóval szó elején kezdődő találatok elöl,
+        egyébként névsorrendben.
+
+        A legszelektívebb szó jelöltjeiből indulunk; ha az is sok (gyakori névrész), inkább
+        névsorban végigmegyünk és a limit elérésekor megállunk – sűrű találatnál ez a gyorsabb.
+        """
+        terms = fold(q).split()
+        if not terms:
+            return self.rows[:limit] if limit else list(self.rows)
+        est = [self._candidates(t) for t in terms]
+        size, build = min(est, key=lambda e: e[0])
+        if size == 0:
+            return []
+        blob = self._blob
+        ok = lambda i: all(self._matches(blob[i], t) for t in terms)
+        head = terms[0]
+        if limit and size > 40 * limit:
+            lo, hi = self._prefix_range(head)
+            if hi - lo <= 40 * limit:
+                # kevés szó kezdődik így: az elöl állók közvetlenül, a maradék helyet névsorban töltjük fel
+                front = sorted({i for i in self._word_rows[lo:hi] if ok(i)})[:limit]
+                taken = set(front)
+                back = []
+                for i in range(len(self.rows)):
+                    if len(front) + len(back) >= limit:
+                        break
+                    if i not in taken and ok(i):
+                        back.append(i)
+            else:
+                front, back = [], []
+                for i in range(len(self.rows)):
+                    if ok(i):
+                        if self._word_start(blob[i], head):
+                            front.append(i)
+                            if len(front) >= limit:
+                                break
+                        elif len(back) < limit:
+                            back.append(i)
+            ordered = (front + back)[:limit]
+        else:
+            hits = [i for i in sorted(build()) if ok(i)]
+            ordered = sorted(hits, key=lambda i: not self._word_start(blob[i], head))
+            if limit:
+                ordered = ordered[:limit]
+        return [self.rows[i] for i in ordered]
+
+
+class WorkerDirectory:
+    """
+    company_id → WorkerIndex. version(company_id) és load(company_id) szinkron tárolóhívások
+    (szálkészletből); fresh() a kérés-szálon zár nélkül megmondja, kell-e egyáltalán ellenőrizni.
+    """
+
+    def __init__(self, version: Callable[[int], int], load: Callable[[int], list], *, recheck_s: float = 1.0):
+        self._version = version
+        self._load = load
+        self.recheck_s = float(recheck_s)
+        self._indexes: Dict[int, Tuple[WorkerIndex, float]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.fast_hits = 0
+        self.checks = 0
+
+    def fresh(self, company_id: int) -> Optional[WorkerIndex]:
+        """Az index, ha recheck_s-en belül ellenőriztük (ilyenkor nincs DB-hívás); egyébként None."""
+        entry = self._indexes.get(company_id)
+        if entry is not None and time.monotonic() - entry[1] < self.recheck_s:
+            self.fast_hits += 1
+            return entry[0]
+        return None
+
+    def get(self, company_id: int) -> WorkerIndex:
+        """Verzió-ellenőrzés, és csak változáskor újraépítés (a régi index addig is kiszolgál)."""
+        version = self._version(company_id)
+        self.checks += 1
+        entry = self._indexes.get(company_id)
+        if entry is not None and entry[0].version == version:
+            self._indexes[company_id] = (entry[0], time.monotonic())
+            return entry[0]
+        with self._lock:
+            entry = self._indexes.get(company_id)
+            if entry is not None and entry[0].version == version:
+                return entry[0]
+            t0 = time.perf_counter()
+            index = WorkerIndex([dict(r) for r in self._load(company_id)], version)
+            self._indexes[company_id] = (index, time.monotonic())
+            self.builds += 1
+            print(f"Worker index: company {company_id} v{version}, {len(index)} workers "
+                  f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+            return index
+
+    def invalidate(self, company_id: Optional[int] = None) -> None:
+        if company_id is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(company_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": {cid: {"version": ix.version, "workers": len(ix), "responses": len(ix.responses)} for cid, (ix, _) in self._indexes.items()},
+            "builds": self.builds, "version_checks": self.checks, "fast_hits": self.fast_hits,
+            "recheck_s": self.recheck_s,
+        }
@@ -0,0 +1,540 @@
+"""
+Közvetlen OOXML-foltozó motor a GP-t.xlsx sablonhoz.
+
+A sablont egyszer "lefordítjuk": a zip részeit nyers (már tömörített) formában
+megtartjuk, a munkalap XML-jét soronként feldaraboljuk. Kérésenként csak a
+sheet1.xml, a workbook.xml (nyomtatási terület), a drawing + rels és az új kép
+készül el újra; minden más rész bájtra pontosan, újratömörítés nélkül kerül át.
+
+A kimenet tartalmilag megegyezik az openpyxl-es úttal (ugyanazok a cellaértékek,
+igazítások, nyomtatási beállítások és kép), csak az openpyxl objektummodellje nélkül.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+REL_IMAGE = REL_NS + "/image"
+REL_CALC_CHAIN = REL_NS + "/calcChain"
+
+EMU_PER_PX = 9525
+
+# Egy cellaírás: (sor, oszlop, érték, wrap, vízszintes, függőleges|None).
+# A függőleges None esetén a sablon cellájának igazítása marad (vagy "center"),
+# pontosan úgy, mint a main.set_text() esetén.
+CellWrite = Tuple[int, int, object, bool, str, Optional[str]]
+
+_ROW_RE = re.compile(r"<row\b[^>]*?(?:/>|>.*?</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b[^>]*?(?:/>|>.*?</c>)", re.S)
+_ATTR_RE = r'\b{0}="([^"]*)"'
+_XF_RE = re.compile(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", re.S)
+_ILLEGAL_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+
+class PatchError(RuntimeError):
+    """A sablon vagy a kérés nem kezelhető a foltozó motorral (openpyxl fallback kell)."""
+
+
+def col_letter(col: int) -> str:
+    out = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        out = chr(65 + rem) + out
+    return out
+
+
+def split_ref(ref: str) -> Tuple[int, int]:
+    m = re.match(r"^([A-Z]+)(\d+)$", ref)
+    if not m:
+        raise PatchError(f"bad cell ref: {ref!r}")
+    col = 0
+    for ch in m.group(1):
+        col = col * 26 + (ord(ch) - 64)
+    return int(m.group(2)), col
+
+
+def _attr(tag: str, name: str) -> Optional[str]:
+    m = re.search(_ATTR_RE.format(re.escape(name)), tag)
+    return m.group(1) if m else None
+
+
+def _set_attr(tag: str, name: str, value: str) -> str:
+    """Attribútum cseréje/beszúrása egy nyitó (vagy önzáró) tagben."""
+    pat = re.compile(_ATTR_RE.format(re.escape(name)))
+    if pat.search(tag):
+        return pat.sub(f'{name}="{value}"', tag, count=1)
+    end = -2 if tag.endswith("/>") else -1
+    return f'{tag[:end]} {name}="{value}"{tag[end:]}'
+
+
+def _del_attr(tag: str, name: str) -> str:
+    return re.sub(r"\s" + _ATTR_RE.format(re.escape(name)), "", tag, count=1)
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _resolve(base_part: str, target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _rels_path(part: str) -> str:
+    d, f = posixpath.split(part)
+    return posixpath.join(d, "_rels", f + ".rels")
+
+
+def _rels(xml: str) -> List[Tuple[str, str, str]]:
+    out = []
+    for m in re.finditer(r"<Relationship\b[^>]*/?>", xml):
+        tag = m.group(0)
+        out.append((_attr(tag, "Id") or "", _attr(tag, "Type") or "", _attr(tag, "Target") or ""))
+    return out
+
+
+# ---------- nyers zip-részek (újratömörítés nélküli másoláshoz) ----------
+class _RawPart:
+    __slots__ = ("name", "method", "crc", "csize", "usize", "dostime", "dosdate", "data")
+
+    def __init__(self, name, method, crc, csize, usize, dostime, dosdate, data):
+        self.name = name; self.method = method; self.crc = crc
+        self.csize = csize; self.usize = usize
+        self.dostime = dostime; self.dosdate = dosdate; self.data = data
+
+
+def _dos_datetime(ts: Optional[float] = None) -> Tuple[int, int]:
+    t = time.localtime(ts)
+    dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dosdate = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dostime, dosdate
+
+
+def _raw_part_from_zip(blob: bytes, info: zipfile.ZipInfo) -> _RawPart:
+    off = info.header_offset
+    if blob[off:off + 4] != b"PK\x03\x04":
+        raise PatchError(f"bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", blob[off + 26:off + 30])
+    start = off + 30 + name_len + extra_len
+    data = blob[start:start + info.compress_size]
+    y, mo, d, h, mi, s = info.date_time
+    return _RawPart(info.filename, info.compress_type, info.CRC, info.compress_size, info.file_size,
+                    (h << 11) | (mi << 5) | (s // 2), ((y - 1980) << 9) | (mo << 5) | d, data)
+
+
+def _raw_part_from_bytes(name: str, payload: bytes, dostime: int, dosdate: int) -> _RawPart:
+    comp = zlib.compressobj(6, zlib.DEFLATED, -15)
+    data = comp.compress(payload) + comp.flush()
+    return _RawPart(name, zipfile.ZIP_DEFLATED, zlib.crc32(payload) & 0xFFFFFFFF,
+                    len(data), len(payload), dostime, dosdate, data)
+
+
+def _write_zip(parts: Iterable[_RawPart]) -> bytes:
+    out = BytesIO(); central = []
+    for p in parts:
+        name = p.name.encode("utf-8")
+        flags = 0x800 if any(b > 0x7F for b in name) else 0
+        offset = out.tell()
+        out.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, p.method, p.dostime, p.dosdate,
+                              p.crc, p.csize, p.usize, len(name), 0))
+        out.write(name); out.write(p.data)
+        central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, p.method, p.dostime,
+                                   p.dosdate, p.crc, p.csize, p.usize, len(name), 0, 0, 0, 0, 0, offset) + name)
+    cd_start = out.tell()
+    for entry in central:
+        out.write(entry)
+    cd_size = out.tell() - cd_start
+    out.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), cd_size, cd_start, 0))
+    return out.getvalue()
+
+
+# ---------- stílusváltozatok (cellXfs) ----------
+class _Styles:
+    def __init__(self, xml: str):
+        m = re.search(r"<cellXfs\b[^>]*>(.*?)</cellXfs>", xml, re.S)
+        if not m:
+            raise PatchError("styles.xml has no cellXfs")
+        self._head = xml[:m.start()]
+        self._tail = xml[m.end():]
+        self._open = xml[m.start():m.start(1)]
+        self.base: List[str] = _XF_RE.findall(m.group(1))
+        self.extra: List[str] = []
+        self._variants: Dict[Tuple[int, bool, str, str], int] = {}
+        self._lock = threading.Lock()
+        self._xml: Optional[bytes] = None
+
+    def vertical_of(self, s: int) -> Optional[str]:
+        xf = self.base[s] if 0 <= s < len(self.base) else ""
+        m = re.search(r"<alignment\b[^>]*/?>", xf)
+        return _attr(m.group(0), "vertical") if m else None
+
+    def variant(self, s: int, wrap: bool, horizontal: str, vertical: str) -> int:
+        key = (s, bool(wrap), horizontal, vertical)
+        idx = self._variants.get(key)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self._variants.get(key)
+            if idx is not None:
+                return idx
+            xf = self.base[s] if 0 <= s < len(self.base) else '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            align = f'<alignment horizontal="{horizontal}" vertical="{vertical}"' + (' wrapText="1"' if wrap else "") + "/>"
+            xf = re.sub(r"<alignment\b[^>]*?(?:/>|>.*?</alignment>)", "", xf, flags=re.S)
+            if xf.endswith("/>"):
+                head = _set_attr(xf, "applyAlignment", "1")[:-2].rstrip()
+                xf = f"{head}>{align}</xf>"
+            else:
+                i = xf.index(">")
+                head = _set_attr(xf[:i + 1], "applyAlignment", "1")
+                xf = head + align + xf[i + 1:]
+            self.extra.append(xf)
+            idx = len(self.base) + len(self.extra) - 1
+            self._variants[key] = idx
+            self._xml = None
+            return idx
+
+    def xml(self) -> bytes:
+        data = self._xml
+        if data is None:
+            with self._lock:
+                xfs = self.base + self.extra
+                opened = _set_attr(self._open, "count", str(len(xfs)))
+                data = (self._head + opened + "".join(xfs) + "</cellXfs>" + self._tail).encode("utf-8")
+                self._xml = data
+        return data
+
+
+# ---------- munkalap sorai ----------
+class _Row:
+    __slots__ = ("num", "open", "cells", "xml")
+
+    def __init__(self, num: int, open_tag: str, cells: Dict[int, str], xml: str):
+        self.num = num; self.open = open_tag; self.cells = cells; self.xml = xml
+
+    def render(self, replaced: Dict[int, str], extra_open_attrs: Optional[Dict[str, str]] = None) -> str:
+        open_tag = self.open
+        if any(c not in self.cells for c in replaced):
+            open_tag = _del_attr(open_tag, "spans")
+        for k, v in (extra_open_attrs or {}).items():
+            open_tag = _set_attr(open_tag, k, v)
+        cells = dict(self.cells); cells.update(replaced)
+        return open_tag + "".join(cells[c] for c in sorted(cells)) + "</row>"
+
+
+def _parse_row(xml: str) -> _Row:
+    head_end = xml.index(">") + 1
+    open_tag = xml[:head_end]
+    if open_tag.endswith("/>"):
+        open_tag = open_tag[:-2].rstrip() + ">"
+    num = int(_attr(open_tag, "r") or 0)
+    if not num:
+        raise PatchError("row without r attribute")
+    cells: Dict[int, str] = {}
+    for m in _CELL_RE.finditer(xml, head_end):
+        ref = _attr(m.group(0)[:m.group(0).index(">")], "r")
+        if not ref:
+            raise PatchError("cell without r attribute")
+        cells[split_ref(ref)[1]] = m.group(0)
+    return _Row(num, open_tag, cells, xml)
+
+
+def _cell_is_nonempty(cell_xml: str) -> bool:
+    if "<f" in cell_xml or "<is>" in cell_xml:
+        return True
+    m = re.search(r"<v>(.*?)</v>", cell_xml, re.S)
+    return bool(m and m.group(1) != "")
+
+
+class PatchTemplate:
+    """
+    Lefordított sablon. A konstruktor a drága részt végzi (zip- és XML-elemzés),
+    a render() kérésenként csak a változó részeket állítja elő.
+    """
+
+    def __init__(self, blob: bytes, *, default_row_heights: Optional[Dict[int, float]] = None):
+        zf = zipfile.ZipFile(BytesIO(blob))
+        self._parts: Dict[str, _RawPart] = {}
+        self._order: List[str] = []
+        for info in zf.infolist():
+            self._parts[info.filename] = _raw_part_from_zip(blob, info)
+            self._order.append(info.filename)
+
+        def text(name: str) -> str:
+            return zf.read(name).decode("utf-8")
+
+        # workbook + első munkalap
+        wb_rels_path = "xl/_rels/workbook.xml.rels"
+        wb_xml = text("xl/workbook.xml")
+        wb_rels_xml = text(wb_rels_path)
+        first_sheet = re.search(r"<sheet\b[^>]*/>", wb_xml)
+        if not first_sheet:
+            raise PatchError("workbook has no sheets")
+        sheet_rid = _attr(first_sheet.group(0), "r:id")
+        self.sheet_name = _attr(first_sheet.group(0), "name") or "Sheet1"
+        rels = {rid: (typ, tgt) for rid, typ, tgt in _rels(wb_rels_xml)}
+        self.sheet_part = _resolve("xl/workbook.xml", rels[sheet_rid][1])
+
+        # calcChain: az openpyxl sem viszi tovább, és a felülírt képletcellák miatt el is avulna
+        ct_xml = text("[Content_Types].xml")
+        for rid, (typ, tgt) in rels.items():
+            if typ == REL_CALC_CHAIN:
+                part = _resolve("xl/workbook.xml", tgt)
+                self._drop_part(part)
+                wb_rels_xml = re.sub(r'<Relationship\b[^>]*\bId="%s"[^>]*/>' % re.escape(rid), "", wb_rels_xml)
+                ct_xml = re.sub(r'<Override\b[^>]*PartName="/%s"[^>]*/>' % re.escape(part), "", ct_xml)
+        if 'Extension="png"' not in ct_xml:
+            ct_xml = ct_xml.replace("</Types>", '<Default Extension="png" ContentType="image/png"/></Types>', 1)
+        self._set_static(wb_rels_path, wb_rels_xml)
+        self._set_static("[Content_Types].xml", ct_xml)
+
+        self._split_workbook(wb_xml)
+        self.styles = _Styles(text("xl/styles.xml"))
+        self._styles_cache: Optional[Tuple[bytes, _RawPart]] = None
+        self._split_sheet(text(self.sheet_part), default_row_heights or {})
+
+        # drawing (a sablonban már van logó, ahhoz fűzzük az új képet)
+        sheet_rels = {rid: (typ, tgt) for rid, typ, tgt in _rels(text(_rels_path(self.sheet_part)))}
+        m = re.search(r'<drawing\b[^>]*r:id="([^"]+)"', self._sheet_tail)
+        if not m:
+            raise PatchError("template sheet has no drawing part")
+        self.drawing_part = _resolve(self.sheet_part, sheet_rels[m.group(1)][1])
+        self.drawing_rels_part = _rels_path(self.drawing_part)
+        drawing_xml = text(self.drawing_part)
+        close = drawing_xml.rindex("</")
+        self._drawing_head, self._drawing_tail = drawing_xml[:close], drawing_xml[close:]
+        self._drawing_prefix = "xdr:" if "<xdr:wsDr" in drawing_xml else ""
+        ids = [int(x) for x in re.findall(r'<(?:\w+:)?cNvPr\b[^>]*\bid="(\d+)"', drawing_xml)]
+        self._next_shape_id = max(ids or [1]) + 1
+        drels_xml = text(self.drawing_rels_part) if self.drawing_rels_part in self._parts else \
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"></Relationships>'
+        rel_ids = [int(x) for x in re.findall(r'Id="rId(\d+)"', drels_xml)]
+        self._image_rid = f"rId{max(rel_ids or [0]) + 1}"
+        close = drels_xml.rindex("</Relationships>")
+        self._drels_head, self._drels_tail = drels_xml[:close], drels_xml[close:]
+        n = 1
+        while f"xl/media/image{n}.png" in self._parts:
+            n += 1
+        self.image_part = f"xl/media/image{n}.png"
+
+    # --- fordítási lépések ---
+    def _drop_part(self, name: str) -> None:
+        self._parts.pop(name, None)
+        if name in self._order:
+            self._order.remove(name)
+
+    def _set_static(self, name: str, xml: str) -> None:
+        old = self._parts.get(name)
+        dostime, dosdate = (old.dostime, old.dosdate) if old else _dos_datetime()
+        self._parts[name] = _raw_part_from_bytes(name, xml.encode("utf-8"), dostime, dosdate)
+        if name not in self._order:
+            self._order.append(name)
+
+    def _split_workbook(self, xml: str) -> None:
+        m = re.search(r'(<definedName\b[^>]*name="_xlnm\.Print_Area"[^>]*localSheetId="0"[^>]*>)(.*?)(</definedName>)', xml, re.S)
+        if m:
+            self._wb_head, self._wb_tail = xml[:m.end(1)], xml[m.start(3):]
+        elif "<definedNames>" in xml:
+            i = xml.index("<definedNames>") + len("<definedNames>")
+            self._wb_head = xml[:i] + '<definedName name="_xlnm.Print_Area" localSheetId="0">'
+            self._wb_tail = "</definedName>" + xml[i:]
+        else:
+            i = xml.index("</sheets>") + len("</sheets>")
+            self._wb_head = xml[:i] + '<definedNames><definedName name="_xlnm.Print_Area" localSheetId="0">'
+            self._wb_tail = "</definedName></definedNames>" + xml[i:]
+
+    def _split_sheet(self, xml: str, default_row_heights: Dict[int, float]) -> None:
+        m = re.search(r"<sheetData\b[^>]*?(?:/>|>(.*?)</sheetData>)", xml, re.S)
+        if not m:
+            raise PatchError("sheet has no sheetData")
+        head, body, tail = xml[:m.start()], m.group(1) or "", xml[m.end():]
+        head, tail = self._apply_print_defaults(head, tail)
+        self._sheet_head = head + "<sheetData>"
+        self._sheet_tail = "</sheetData>" + tail
+
+        self.rows: Dict[int, _Row] = {}
+        for rm in _ROW_RE.finditer(body):
+            row = _parse_row(rm.group(0))
+            self.rows[row.num] = row
+        # leírásblokk sormagasságai: ugyanaz, mint az openpyxl-es útban (height None -> 22)
+        for r, h in default_row_heights.items():
+            row = self.rows.get(r)
+            if row is None:
+                row = _Row(r, f'<row r="{r}">', {}, "")
+                self.rows[r] = row
+            if _attr(row.open, "ht") is None:
+                row.open = _set_attr(_set_attr(row.open, "ht", f"{h:g}"), "customHeight", "1")
+            row.xml = row.render({})
+        self._row_order = sorted(self.rows)
+
+        self.cell_style: Dict[Tuple[int, int], int] = {}
+        self.nonempty: set = set()
+        for row in self.rows.values():
+            for c, cell in row.cells.items():
+                self.cell_style[(row.num, c)] = int(_attr(cell[:cell.index(">")], "s") or 0)
+                if _cell_is_nonempty(cell):
+                    self.nonempty.add((row.num, c))
+
+    @staticmethod
+    def _apply_print_defaults(head: str, tail: str) -> Tuple[str, str]:
+        # a main.set_print_defaults() megfelelője: A4 fekvő, 95%, 0.2" margók, nincs fit-to-page
+        if "<pageSetUpPr" in head:
+            head = re.sub(r"<pageSetUpPr\b[^>]*/>", lambda m: _set_attr(m.group(0), "fitToPage", "0"), head, count=1)
+        elif re.search(r"<sheetPr\b[^>]*/>", head):
+            head = re.sub(r"<sheetPr\b([^>]*)/>", r'<sheetPr\1><pageSetUpPr fitToPage="0"/></sheetPr>', head, count=1)
+        elif "<sheetPr" in head:
+            head = head.replace("</sheetPr>", '<pageSetUpPr fitToPage="0"/></sheetPr>', 1)
+        else:
+            i = re.search(r"<worksheet\b[^>]*>", head).end()
+            head = head[:i] + '<sheetPr><pageSetUpPr fitToPage="0"/></sheetPr>' + head[i:]
+
+        margins = '<pageMargins left="0.2" right="0.2" top="0.2" bottom="0.2" header="0" footer="0"/>'
+        options = '<printOptions horizontalCentered="0" verticalCentered="0"/>'
+        tail = re.sub(r"<printOptions\b[^>]*/>", "", tail)
+        if "<pageMargins" in tail:
+            tail = re.sub(r"<pageMargins\b[^>]*/>", options + margins, tail, count=1)
+        else:
+            anchor = re.search(r"<(pageSetup|headerFooter|rowBreaks|colBreaks|customProperties|cellWatches|"
+                               r"ignoredErrors|smartTags|drawing|legacyDrawing|picture|oleObjects|controls|"
+                               r"webPublishItems|tableParts|extLst)\b|</worksheet>", tail)
+            tail = tail[:anchor.start()] + options + margins + tail[anchor.start():]
+
+        def fix_setup(m):
+            tag = m.group(0)
+            for k, v in (("paperSize", "9"), ("scale", "95"), ("fitToWidth", "0"),
+                         ("fitToHeight", "0"), ("orientation", "landscape")):
+                tag = _set_attr(tag, k, v)
+            return tag
+        if "<pageSetup" in tail:
+            tail = re.sub(r"<pageSetup\b[^>]*/>", fix_setup, tail, count=1)
+        else:
+            i = tail.index(margins) + len(margins)
+            tail = tail[:i] + '<pageSetup paperSize="9" scale="95" fitToWidth="0" fitToHeight="0" orientation="landscape"/>' + tail[i:]
+        return head, tail
+
+    def _styles_part(self) -> _RawPart:
+        # a stílusváltozatok készlete gyorsan telítődik, addig csak változáskor tömörítünk újra
+        xml = self.styles.xml()
+        cached = self._styles_cache
+        if cached is None or cached[0] is not xml:
+            old = self._parts["xl/styles.xml"]
+            cached = (xml, _raw_part_from_bytes("xl/styles.xml", xml, old.dostime, old.dosdate))
+            self._styles_cache = cached
+        return cached[1]
+
+    # --- kérésenkénti előállítás ---
+    def _cell_xml(self, r: int, c: int, value, wrap: bool, horizontal: str, vertical: Optional[str]) -> str:
+        base = self.cell_style.get((r, c), 0)
+        vert = vertical or self.styles.vertical_of(base) or "center"
+        s = self.styles.variant(base, wrap, horizontal, vert)
+        ref = f"{col_letter(c)}{r}"
+        if value is None or value == "":
+            return f'<c r="{ref}" s="{s}"/>'
+        if isinstance(value, bool):
+            return f'<c r="{ref}" s="{s}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}" s="{s}" t="n"><v>{"%.16g" % value}</v></c>'
+        text = str(value)
+        if _ILLEGAL_RE.search(text):
+            raise PatchError("illegal character in cell text")
+        if text.startswith("=") and len(text) > 1:
+            raise PatchError("formula-like cell text")
+        space = ' xml:space="preserve"' if text.strip() and text != text.strip() else ""
+        return f'<c r="{ref}" s="{s}" t="inlineStr"><is><t{space}>{_xml_escape(text)}</t></is></c>'
+
+    def print_area(self, writes: Sequence[CellWrite]) -> str:
+        filled = set(self.nonempty)
+        for r, c, value, *_ in writes:
+            if value is None or value == "":
+                filled.discard((r, c))
+            else:
+                filled.add((r, c))
+        last_row = max([1] + [r for r, _ in filled])
+        last_col = max([1] + [c for _, c in filled])
+        return f"A1:{col_letter(last_col)}{last_row}"
+
+    def _sheet_xml(self, writes: Sequence[CellWrite]) -> bytes:
+        per_row: Dict[int, Dict[int, str]] = {}
+        for r, c, value, wrap, horizontal, vertical in writes:
+            per_row.setdefault(r, {})[c] = self._cell_xml(r, c, value, wrap, horizontal, vertical)
+        order = self._row_order
+        if any(r not in self.rows for r in per_row):
+            order = sorted(set(order) | set(per_row))
+        parts = [self._sheet_head]
+        for r in order:
+            row = self.rows.get(r)
+            replaced = per_row.get(r)
+            if row is None:
+                row = _Row(r, f'<row r="{r}">', {}, "")
+            parts.append(row.render(replaced) if replaced else row.xml)
+        parts.append(self._sheet_tail)
+        return "".join(parts).encode("utf-8")
+
+    def _workbook_xml(self, area: str) -> bytes:
+        r1, r2 = area.split(":")
+        (ra, ca), (rb, cb) = split_ref(r1), split_ref(r2)
+        name = self.sheet_name.replace("'", "''")
+        ref = f"'{name}'!${col_letter(ca)}${ra}:${col_letter(cb)}${rb}"
+        return (self._wb_head + _xml_escape(ref) + self._wb_tail).encode("utf-8")
+
+    def _drawing_xml(self, anchor_row: int, anchor_col: int, w_px: int, h_px: int) -> Tuple[bytes, bytes]:
+        x = self._drawing_prefix
+        sid = self._next_shape_id
+        anchor = (
+            f"<{x}oneCellAnchor><{x}from><{x}col>{anchor_col - 1}</{x}col><{x}colOff>0</{x}colOff>"
+            f"<{x}row>{anchor_row - 1}</{x}row><{x}rowOff>0</{x}rowOff></{x}from>"
+            f'<{x}ext cx="{w_px * EMU_PER_PX}" cy="{h_px * EMU_PER_PX}"/>'
+            f'<{x}pic><{x}nvPicPr><{x}cNvPr id="{sid}" name="Image {sid}" descr="Picture"/><{x}cNvPicPr/></{x}nvPicPr>'
+            f'<{x}blipFill><a:blip xmlns:r="{REL_NS}" cstate="print" r:embed="{self._image_rid}"/>'
+            f"<a:stretch><a:fillRect/></a:stretch></{x}blipFill>"
+            f'<{x}spPr><a:prstGeom prst="rect"><a:avLst/></a:prstGeom></{x}spPr></{x}pic>'
+            f"<{x}clientData/></{x}oneCellAnchor>"
+        )
+        target = "../media/" + posixpath.basename(self.image_part)
+        rel = f'<Relationship Id="{self._image_rid}" Type="{REL_IMAGE}" Target="{target}"/>'
+        return ((self._drawing_head + anchor + self._drawing_tail).encode("utf-8"),
+                (self._drels_head + rel + self._drels_tail).encode("utf-8"))
+
+    def render(self, writes: Sequence[CellWrite], image: Optional[Tuple[bytes, int, int, int, int]] = None,
+               print_area: Optional[str] = None) -> bytes:
+        """
+        writes:     cellaírások (bal felső cellára feloldva), sorrendben; későbbi írás felülírja a korábbit.
+        image:      (png_bytes, anchor_row, anchor_col, width_px, height_px) vagy None.
+        print_area: pl. "A1:G29"; ha None, a sablon kitöltött celláiból + az írásokból számoljuk.
+        """
+        dostime, dosdate = _dos_datetime()
+        changed: Dict[str, bytes] = {
+            self.sheet_part: self._sheet_xml(writes),
+            "xl/workbook.xml": self._workbook_xml(print_area or self.print_area(writes)),
+        }
+        extra: List[_RawPart] = []
+        if image is not None:
+            png, ar, ac, w_px, h_px = image
+            drawing, drels = self._drawing_xml(ar, ac, w_px, h_px)
+            changed[self.drawing_part] = drawing
+            changed[self.drawing_rels_part] = drels
+            extra.append(_RawPart(self.image_part, zipfile.ZIP_STORED, zlib.crc32(png) & 0xFFFFFFFF,
+                                  len(png), len(png), dostime, dosdate, png))
+        parts: List[_RawPart] = []
+        for name in self._order:
+            if name == "xl/styles.xml":
+                parts.append(self._styles_part())
+            elif name in changed:
+                parts.append(_raw_part_from_bytes(name, changed.pop(name), dostime, dosdate))
+            else:
+                parts.append(self._parts[name])
+        for name, payload in changed.items():
+            parts.append(_raw_part_from_bytes(name, payload, dostime, dosdate))
+        parts.extend(extra)
+        return _write_zip(parts)
@@ -0,0 +1,118 @@
+"""
+Benchmark: kérésenkénti sqlite3.connect (régi db_conn) vs. SQLitePool (WAL + pragmák).
+
+Vegyes terhelés szálakból: form-beszúrások (submissions) és admin/dolgozó-olvasások
+(slug-keresés + dolgozókeresés + admin lista), ahogy az éles app szálkészlete futtatja őket.
+
+    python -m bench.db_pool_bench --threads 8 --ops 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.db_pool import SQLitePool
+
+INSERT = ("INSERT INTO submissions (created_at, datum, bau, beschreibung, excel_filename, payload_json) "
+          "VALUES (?,?,?,?,?,?)")
+SLUG = "SELECT id FROM companies WHERE slug = ?"
+WORKERS = ("SELECT first_name, last_name, badge FROM workers WHERE company_id = ? AND "
+           "(LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ? OR badge LIKE ?) "
+           "ORDER BY last_name COLLATE NOCASE, first_name COLLATE NOCASE LIMIT ?")
+ADMIN = "SELECT id, created_at, datum, bau FROM submissions ORDER BY created_at DESC LIMIT 200"
+
+
+def setup(path: Path, n_submissions: int = 5000, n_workers: int = 2000) -> None:
+    c = sqlite3.connect(path)
+    c.executescript("""
+        CREATE TABLE submissions (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT NOT NULL, datum TEXT,
+            bau TEXT, beschreibung TEXT, excel_filename TEXT, payload_json TEXT);
+        CREATE TABLE companies (id INTEGER PRIMARY KEY, slug TEXT UNIQUE);
+        CREATE TABLE workers (id INTEGER PRIMARY KEY, company_id INTEGER, first_name TEXT, last_name TEXT, badge TEXT);
+        CREATE INDEX ix_workers_company ON workers(company_id);
+    """)
+    c.execute("INSERT INTO companies (id, slug) VALUES (1, 'muster')")
+    c.executemany("INSERT INTO workers (company_id, first_name, last_name, badge) VALUES (1,?,?,?)",
+                  [(f"Vor{i}", f"Nach{i}", f"{100000 + i}") for i in range(n_workers)])
+    c.executemany(INSERT, [(f"2025-01-01T00:{i % 60:02d}:00", "01.01.2025", f"Bau {i % 50}", "x" * 200,
+                            f"f{i}.xlsx", "{}") for i in range(n_submissions)])
+    c.commit(); c.close()
+
+
+def run(conn_factory, threads: int, ops: int, write_ratio: float) -> dict:
+    lat_w, lat_r = [], []
+    lock = threading.Lock()
+    errors = [0]
+
+    def worker(tid: int):
+        lw, lr = [], []
+        for i in range(ops):
+            t0 = time.perf_counter()
+            try:
+                c = conn_factory()
+                with c:
+                    if (i * 7919 + tid) % 100 < write_ratio * 100:
+                        c.execute(INSERT, (time.strftime("%Y-%m-%dT%H:%M:%S"), "01.01.2025", "Bau", "y" * 200,
+                                           f"t{tid}_{i}.xlsx", "{}"))
+                        lw.append(time.perf_counter() - t0)
+                    else:
+                        c.execute(SLUG, ("muster",)).fetchone()
+                        c.execute(WORKERS, (1, "%vor1%", "%vor1%", "%1%", 50)).fetchall()
+                        c.execute(ADMIN).fetchall()
+                        lr.append(time.perf_counter() - t0)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            lat_w.extend(lw); lat_r.extend(lr)
+
+    ts = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    wall = time.perf_counter() - t0
+
+    def pct(xs, q):
+        xs = sorted(xs)
+        return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000 if xs else 0.0
+
+    return {
+        "ops_per_s": round((len(lat_w) + len(lat_r)) / wall, 1),
+        "write_p50_ms": round(pct(lat_w, 0.5), 2), "write_p95_ms": round(pct(lat_w, 0.95), 2),
+        "read_p50_ms": round(pct(lat_r, 0.5), 2), "read_p95_ms": round(pct(lat_r, 0.95), 2),
+        "read_avg_ms": round(statistics.mean(lat_r) * 1000, 2) if lat_r else 0.0,
+        "errors": errors[0],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--ops", type=int, default=400, help="műveletek szálanként")
+    ap.add_argument("--write-ratio", type=float, default=0.3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        old_db, new_db = Path(d) / "old.db", Path(d) / "new.db"
+        setup(old_db); setup(new_db)
+
+        def per_request():
+            c = sqlite3.connect(old_db)   # a régi db_conn(): új kapcsolat, rollback journal
+            c.row_factory = sqlite3.Row
+            return c
+
+        pool = SQLitePool(new_db)
+        for label, factory in (("connect-per-request", per_request), ("SQLitePool (WAL)", pool.connection)):
+            res = run(factory, args.threads, args.ops, args.write_ratio)
+            print(f"{label:22s} " + "  ".join(f"{k}={v}" for k, v in res.items()))
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
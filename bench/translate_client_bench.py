@@ -0,0 +1,123 @@
+"""
+Benchmark: kérésenként új szinkron httpx.Client (a régi _lt_translate) vs. közös httpx.AsyncClient.
+
+Helyi LibreTranslate-csonk (stdlib HTTP/1.1 szerver, keep-alive) ellen, az eseményhurokból
+párhuzamos kérésekkel, ahogy az /api/translate-et a böngészők hívják. A csonk minden *új*
+kapcsolatnál --handshake-ms ideig vár (a valódi végpont TCP+TLS felépítésének közelítése),
+kérésenként pedig --service-ms ideig "fordít".
+
+    python -m bench.translate_client_bench --requests 200 --concurrency 10 --handshake-ms 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+
+def make_stub(handshake_s: float, service_s: float):
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+        connections = 0
+
+        def setup(self):
+            super().setup()
+            type(self).connections += 1
+            time.sleep(handshake_s)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            time.sleep(service_s)
+            out = json.dumps({"translatedText": "DE:" + str(body.get("q", ""))}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, Stub
+
+
+DATA = {"source": "hr", "target": "de", "format": "text"}
+HEADERS = {"Accept": "application/json", "Content-Type": "application/json", "User-Agent": "pdf-edit/lt"}
+
+
+async def old_style(ep: str, text: str) -> str:
+    # a régi kód: async handlerben szinkron kliens, minden hívásnál új kapcsolat
+    with httpx.Client(timeout=12, follow_redirects=True) as cli:
+        r = cli.post(ep, headers=HEADERS, json={**DATA, "q": text})
+    return r.json()["translatedText"]
+
+
+def new_style(cli: httpx.AsyncClient):
+    async def call(ep: str, text: str) -> str:
+        r = await cli.post(ep, headers=HEADERS, json={**DATA, "q": text})
+        return r.json()["translatedText"]
+    return call
+
+
+async def run(call, ep: str, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    lat = []
+
+    async def one(i):
+        async with sem:
+            t0 = time.perf_counter()
+            await call(ep, f"montaža {i}")
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "req_per_s": round(n / wall, 1),
+        "p50_ms": round(lat[len(lat) // 2] * 1000, 1),
+        "p95_ms": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))] * 1000, 1),
+        "avg_ms": round(statistics.mean(lat) * 1000, 1),
+    }
+
+
+async def main_async(args) -> None:
+    srv, stub = make_stub(args.handshake_ms / 1000.0, args.service_ms / 1000.0)
+    ep = f"http://127.0.0.1:{srv.server_address[1]}/translate"
+    try:
+        stub.connections = 0
+        res = await run(old_style, ep, args.requests, args.concurrency)
+        print(f"{'per-call httpx.Client':24s} " + "  ".join(f"{k}={v}" for k, v in res.items())
+              + f"  connections={stub.connections}")
+        stub.connections = 0
+        async with httpx.AsyncClient(timeout=12, follow_redirects=True,
+                                     limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)) as cli:
+            res = await run(new_style(cli), ep, args.requests, args.concurrency)
+        print(f"{'shared httpx.AsyncClient':24s} " + "  ".join(f"{k}={v}" for k, v in res.items())
+              + f"  connections={stub.connections}")
+    finally:
+        srv.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--handshake-ms", type=float, default=40.0, help="késleltetés új kapcsolatonként")
+    ap.add_argument("--service-ms", type=float, default=5.0, help="késleltetés kérésenként")
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
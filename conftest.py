@@ -0,0 +1 @@
+# A tesztek az "app" csomagot a repó gyökeréből importálják (pytest így a gyökeret teszi a sys.path-ra).
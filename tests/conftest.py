@@ -0,0 +1,26 @@
+"""
+Közös fixture: az app.main modul. Az app a munkakönyvtárhoz képest dolgozik (data/, generated/,
+app/static, GP-t.xlsx), ezért egy ideiglenes könyvtárban importáljuk, hogy a tesztek ne
+írjanak a fejlesztői adatbázisba; startup-események nem futnak.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    work = tmp_path_factory.mktemp("app")
+    (work / "app").symlink_to(REPO / "app", target_is_directory=True)
+    (work / "GP-t.xlsx").symlink_to(REPO / "GP-t.xlsx")
+    cwd = os.getcwd()
+    os.chdir(work)
+    try:
+        import app.main as m
+    finally:
+        os.chdir(cwd)
+    return m
@@ -0,0 +1,113 @@
+"""
+Inkrementális replikáció: pillanatkép + szegmensek → visszaállítás, memóriabeli "Drive"-val.
+Az induláskori visszaállítás útja – ha egy sémaváltozás elrontja, itt derüljön ki.
+"""
+
+import sqlite3
+import uuid
+
+from app.db_pool import SQLitePool
+from app.db_replication import DbReplicator, ensure_replication_schema, replicated_tables
+from app.storage import SUBMISSION_COLUMNS, SQLiteStorage
+
+
+class FakeDrive:
+    def __init__(self):
+        self.files = {}   # id -> (név, bájtok)
+
+    def upload(self, name, data, existing):
+        fid = existing or uuid.uuid4().hex
+        self.files[fid] = (name, data)
+        return fid
+
+    def list_files(self, part):
+        return [(fid, name) for fid, (name, _) in self.files.items() if part in name]
+
+    def download(self, fid):
+        return self.files[fid][1] if fid in self.files else None
+
+    def delete(self, fid):
+        return self.files.pop(fid, None) is not None
+
+    def names(self):
+        return sorted(name for name, _ in self.files.values())
+
+
+def _replicator(path, drive):
+    return DbReplicator(path, "app.db", upload=drive.upload, list_files=drive.list_files,
+                        download=drive.download, delete=drive.delete, snapshot_every=3)
+
+
+def _open(path):
+    pool = SQLitePool(path)
+    store = SQLiteStorage(pool)
+    store.init_schema()
+    with pool.connection() as c:
+        ensure_replication_schema(c)
+    return pool, store
+
+
+def _row(i):
+    row = {k: None for k in SUBMISSION_COLUMNS}
+    row.update(created_at=f"2026-01-01T00:00:{i:02d}", datum="2026-01-01", bau=f"Bau {i}",
+               beschreibung=f"Montage Nummer{i}", vorname1="Anna", nachname1=f"Nagy{i}", ausweis1=f"A{i}")
+    row["workers"] = [{"slot": 1, "vorname": "Anna", "nachname": f"Nagy{i}", "ausweis": f"A{i}",
+                       "beginn": "07:00", "ende": "15:00", "vorhaltung": None, "hours": 7.0}]
+    return row
+
+
+def _dump(path):
+    c = sqlite3.connect(path)
+    try:
+        return {t: c.execute(f'SELECT * FROM "{t}" ORDER BY rowid').fetchall() for t in replicated_tables(c)}
+    finally:
+        c.close()
+
+
+def _search(store, q):
+    return [r["id"] for r in store.list_submissions(q=q, limit=100)[0]]
+
+
+def test_snapshot_and_segments_restore_identical_db(tmp_path):
+    drive = FakeDrive()
+    src = tmp_path / "app.db"
+    pool, store = _open(src)
+    rep = _replicator(src, drive)
+    rep.sync()                                            # első pillanatkép (üres)
+    with pool.connection() as c:
+        c.execute("INSERT INTO companies (slug, name) VALUES ('muster', 'Muster GmbH')")
+        c.execute("INSERT INTO workers (company_id, first_name, last_name, badge) VALUES (1, 'Ivan', 'Horvat', 'B1')")
+    for i in range(1, 8):                                 # 7 beszúrás, mindegyik után szinkron
+        store.insert_submission(_row(i))
+        rep.sync()
+    with pool.connection() as c:
+        c.execute("DELETE FROM submissions WHERE bau = 'Bau 3'")
+        c.execute("UPDATE submissions SET beschreibung = 'Demontage geändert' WHERE bau = 'Bau 5'")
+        c.execute("UPDATE companies SET name = 'Muster AG' WHERE slug = 'muster'")
+    rep.sync()
+    assert rep.snapshots_uploaded >= 2 and rep.segments_uploaded >= 1
+    assert any(".seg." in n for n in drive.names())      # a legutóbbi pillanatkép után is van szegmens
+    with pool.connection() as c:
+        last_seq = c.execute("SELECT MAX(seq) FROM repl_log").fetchone()[0] or \
+                   int(c.execute("SELECT v FROM repl_meta WHERE k = 'shipped_seq'").fetchone()[0])
+    expected = _dump(src)
+    searches = {q: _search(store, q) for q in ("montage", "Demont", "Nagy5", "A7", "geändert")}
+    pool.close_all()
+
+    dst = tmp_path / "restored.db"
+    assert _replicator(dst, drive).restore()
+    assert _dump(dst) == expected
+    pool2, store2 = _open(dst)                            # mint induláskor: séma + triggerek újra
+    try:
+        assert {q: _search(store2, q) for q in searches} == searches
+        assert searches["Demont"] and searches["montage"]
+        store2.insert_submission(_row(8))
+        with pool2.connection() as c:
+            seqs = [r[0] for r in c.execute("SELECT seq FROM repl_log WHERE tbl != '' ORDER BY seq")]
+        assert seqs and min(seqs) > last_seq              # a számozás a visszajátszott utolsó után folytatódik
+    finally:
+        pool2.close_all()
+
+
+def test_restore_without_snapshot_returns_false(tmp_path):
+    assert not _replicator(tmp_path / "x.db", FakeDrive()).restore()
@@ -0,0 +1,128 @@
+"""
+DriveOutbox a helyi Drive-szolgáltatással (app/drive_local.py): a fail_next-tel
+szimulált kiesések a handleren át a visszalépésig, összevonásig és újraindításig.
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from app.drive_local import LocalDriveService, LocalMedia
+from app.drive_outbox import DriveOutbox, DropJob
+
+BASE_DELAY = 10.0
+
+
+@pytest.fixture
+def drive(tmp_path):
+    return LocalDriveService(str(tmp_path / "drive"))
+
+
+def _upload_handler(drive):
+    def handler(job):
+        fp = Path(job["path"])
+        if not fp.exists():
+            raise DropJob(f"{fp} missing")
+        meta = {"name": job["name"]}
+        return drive.files().create(body=meta, media_body=LocalMedia(fp.read_bytes(), "text/plain")).execute()["id"]
+    return handler
+
+
+def _outbox(tmp_path, handlers):
+    return DriveOutbox(tmp_path / "outbox.db", handlers, concurrency=2, base_delay=BASE_DELAY, max_delay=25.0)
+
+
+def _rows(box):
+    return [dict(r) for r in box._conn().execute("SELECT * FROM outbox ORDER BY id").fetchall()]
+
+
+def _make_due(box):
+    box._conn().execute("UPDATE outbox SET next_at = 0 WHERE done_at IS NULL")
+
+
+def test_upload_success(tmp_path, drive):
+    f = tmp_path / "a.txt"; f.write_text("hello")
+    box = _outbox(tmp_path, {"file": _upload_handler(drive)})
+    box.enqueue("file", "a.txt", path=str(f))
+    assert box.drain()
+    fid = box.result_for("a.txt")
+    assert fid and drive._read(fid) == b"hello"
+    assert box.stats()["pending"] == 0 and box.uploaded == 1
+
+
+def test_failure_backs_off_exponentially(tmp_path, drive):
+    f = tmp_path / "a.txt"; f.write_text("x")
+    box = _outbox(tmp_path, {"file": _upload_handler(drive)})
+    box.enqueue("file", "a.txt", path=str(f))
+    drive.fail_next = 3
+    for attempt, delay in ((1, BASE_DELAY), (2, 2 * BASE_DELAY), (3, 25.0)):   # a 3. már max_delay-jel vágva
+        t0 = time.time()
+        assert box.drain()
+        [row] = _rows(box)
+        assert row["attempts"] == attempt and row["claimed_at"] is None and row["done_at"] is None
+        assert "simulated outage" in row["last_error"]
+        assert 0.8 * delay - 1 <= row["next_at"] - t0 <= 1.2 * delay + 1
+        assert box.drain() and _rows(box)[0]["attempts"] == attempt   # még nem esedékes
+        _make_due(box)
+    assert box.drain()
+    [row] = _rows(box)
+    assert row["done_at"] is not None and row["result_id"] and box.failures == 3
+
+
+def test_coalesce_keeps_one_pending_job(tmp_path):
+    calls = []
+    box = _outbox(tmp_path, {"db": lambda job: calls.append(job["name"]) or "id-1"})
+    for _ in range(5):
+        box.enqueue("db", "app.db", coalesce_key="db", delay=0.0)
+    assert len(_rows(box)) == 1
+    assert box.drain() and calls == ["app.db"]
+    box.enqueue("db", "app.db", coalesce_key="db")   # a kész feladat után újra sorba állítható
+    assert box.drain() and calls == ["app.db", "app.db"]
+
+
+def test_failed_job_is_superseded_by_newer_one(tmp_path, drive):
+    def handler(job):
+        # futás közben új változás érkezik ugyanarra a kulcsra, majd a feltöltés elbukik
+        box.enqueue("db", "app.db", coalesce_key="db", delay=60.0)
+        drive.fail_next = 1
+        return drive.files().create(body={"name": "app.db"}, media_body=LocalMedia(b"db", "x")).execute()["id"]
+
+    box = _outbox(tmp_path, {"db": handler})
+    box.enqueue("db", "app.db", coalesce_key="db")
+    first_id = _rows(box)[0]["id"]
+    assert box.drain()
+    [row] = _rows(box)
+    assert row["id"] != first_id and row["attempts"] == 0 and row["coalesce_key"] == "db"
+
+
+def test_failed_job_without_newer_keeps_its_key(tmp_path, drive):
+    box = _outbox(tmp_path, {"db": lambda job: None})
+    box.enqueue("db", "app.db", coalesce_key="db")
+    assert box.drain()
+    [row] = _rows(box)
+    assert row["attempts"] == 1 and row["coalesce_key"] == "db"
+    box.enqueue("db", "app.db", coalesce_key="db")   # az újrapróbálandó feladat fedezi
+    assert len(_rows(box)) == 1
+
+
+def test_drop_job_is_not_retried(tmp_path, drive):
+    box = _outbox(tmp_path, {"file": _upload_handler(drive)})
+    box.enqueue("file", "gone.txt", path=str(tmp_path / "gone.txt"))
+    assert box.drain()
+    [row] = _rows(box)
+    assert row["done_at"] is not None and row["result_id"] is None and "missing" in row["last_error"]
+    assert box.stats()["pending"] == 0
+
+
+def test_claimed_jobs_recovered_after_restart(tmp_path, drive):
+    f = tmp_path / "a.txt"; f.write_text("again")
+    box = _outbox(tmp_path, {"file": _upload_handler(drive)})
+    box.enqueue("file", "a.txt", path=str(f))
+    assert len(box._claim(10)) == 1             # folyamat "összeomlik" a feltöltés közben
+    assert box.stats()["running"] == 1 and box.drain() and _rows(box)[0]["done_at"] is None
+
+    restarted = _outbox(tmp_path, {"file": _upload_handler(drive)})
+    assert restarted.stats()["running"] == 0
+    assert restarted.drain()
+    assert drive._read(restarted.result_for("a.txt")) == b"again"
@@ -0,0 +1,76 @@
+"""
+Az OOXML-foltozó motor (app/xlsx_patch.py) kimenete openpyxl-lel visszaolvasva ugyanaz, mint az
+openpyxl-es úté: cellaértékek és stílusok, egyesítések, nyomtatási beállítások, kép és horgonya.
+A patch motort közvetlenül hívjuk, hogy a render_excel csendes openpyxl-fallbackje ne takarja el a hibát.
+"""
+
+import copy
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+WORKERS = [
+    ("Anna", "Nagy", "A100", "07:00", "15:30", ""),
+    ("Ivan", "Horvat", "B200", "06:00", "16:00", "Kran 2 Std"),
+    ("Marko", "Kovač", "", "07:00", "12:00", ""),
+]
+DESCRIPTION = "Montaža skele na objektu KTZ.\nSutra demontaža, čišćenje i odvoz materijala."
+
+
+@pytest.fixture(scope="module")
+def engines(main):
+    saved = main.EXCEL_ENGINE
+    main.EXCEL_ENGINE = "ooxml"
+    try:
+        tpl = main.CompiledTemplate(main.TEMPLATE_PATH, main.TEMPLATE_PATH.stat().st_mtime_ns)
+    finally:
+        main.EXCEL_ENGINE = saved
+    assert tpl.patch is not None, "the OOXML engine must accept GP-t.xlsx"
+    plain = copy.copy(tpl)
+    plain.patch = None
+    return tpl, plain
+
+
+def _render_both(main, engines, description):
+    tpl, plain = engines
+    plan = main.build_excel_plan(tpl.layout, "2026-10-18", "Bau Süd / Halle 4", "Dr. Weber",
+                                 description, WORKERS, 60)
+    ooxml = tpl.patch.render(plan.writes, plan.image, plan.print_area())
+    reference = main.render_excel(plain, plan)
+    return load_workbook(BytesIO(ooxml)).active, load_workbook(BytesIO(reference)).active
+
+
+def _style(cell):
+    # a cell.font stb. StyleProxy – copy() adja vissza az összehasonlítható stílusobjektumot
+    return (copy.copy(cell.font), copy.copy(cell.fill), copy.copy(cell.border), copy.copy(cell.alignment),
+            cell.number_format, copy.copy(cell.protection))
+
+
+@pytest.mark.parametrize("description", [DESCRIPTION, ""])
+def test_ooxml_engine_matches_openpyxl(main, engines, description):
+    got, ref = _render_both(main, engines, description)
+
+    max_row, max_col = max(got.max_row, ref.max_row), max(got.max_column, ref.max_column)
+    for row in range(1, max_row + 1):
+        for col in range(1, max_col + 1):
+            g, r = got.cell(row=row, column=col), ref.cell(row=row, column=col)
+            assert g.value == r.value, g.coordinate
+            assert _style(g) == _style(r), g.coordinate
+
+    assert sorted(map(str, got.merged_cells.ranges)) == sorted(map(str, ref.merged_cells.ranges))
+    assert got.print_area == ref.print_area
+    for attr in ("orientation", "paperSize", "fitToWidth", "fitToHeight", "scale"):
+        assert getattr(got.page_setup, attr) == getattr(ref.page_setup, attr), attr
+    assert got.page_margins.__dict__ == ref.page_margins.__dict__
+    assert got.sheet_properties.pageSetUpPr.fitToPage == ref.sheet_properties.pageSetUpPr.fitToPage
+    assert (got.print_options.horizontalCentered, got.print_options.verticalCentered) == \
+           (ref.print_options.horizontalCentered, ref.print_options.verticalCentered)
+    for row in range(1, max_row + 1):
+        assert got.row_dimensions[row].height == ref.row_dimensions[row].height, row
+
+    # képek: openpyxl-ben nincs nyilvános API, a _images lista a beolvasott rajzokat adja
+    anchors = lambda ws: sorted((i.anchor._from.row, i.anchor._from.col, i.width, i.height) for i in ws._images)
+    base = len(load_workbook(main.TEMPLATE_PATH).active._images)   # a sablon saját képei (logó)
+    assert len(got._images) == len(ref._images) == base + (1 if description else 0)
+    assert anchors(got) == anchors(ref)
@@ -0,0 +1,34 @@
+"""
+/api/translate az alkalmazáson át (TestClient, startup nélkül; a main fixture a conftest.py-ban).
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.translation_cache import TranslationCache
+from app.translation_memory import TranslationMemory
+
+
+@pytest.fixture
+def client(main, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "translation_cache", TranslationCache(tmp_path / "cache.db"))
+    monkeypatch.setattr(main, "translation_memory", TranslationMemory(tmp_path / "tm.db"))
+    return TestClient(main.app)
+
+
+def test_cache_only_serves_text_from_cached_segments(main, client, monkeypatch):
+    async def no_remote(*args, **kwargs):
+        raise AssertionError("cache-only mode must not call a translator")
+
+    monkeypatch.setattr(main, "TRANSLATE_CACHE_ONLY", True)
+    monkeypatch.setattr(main, "_translate_remote", no_remote)
+    main.translation_cache.put_many({"Montaža skele gotova.": "Gerüstaufbau fertig.",
+                                     "Sutra demontaža.": "Morgen Abbau."}, "hr", "de", "azure")
+    r = client.post("/api/translate", json={"text": "Montaža skele gotova. Sutra demontaža.", "source": "hr", "target": "de"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["translated"] == "Gerüstaufbau fertig. Morgen Abbau."
+    assert body["cached_segments"] == 2 and body.get("cached") is True
+
+    r = client.post("/api/translate", json={"text": "Montaža skele gotova. Nešto novo.", "source": "hr", "target": "de"})
+    assert r.status_code == 503 and r.json()["cached_segments"] == 1
@@ -0,0 +1,37 @@
+from app.translation_memory import TranslationMemory
+
+
+def _tm(tmp_path, **kw):
+    return TranslationMemory(tmp_path / "tm.db", **kw)
+
+
+def test_exact_only_by_default(tmp_path):
+    tm = _tm(tmp_path)
+    tm.add("hr", "de", "demontaža skele na objektu KTZ", "Gerüstabbau am Objekt KTZ")
+    assert tm.lookup("Demontaža skele na objektu KTZ.", "hr", "de") == ("Gerüstabbau am Objekt KTZ", 1.0)
+    assert tm.lookup("demontaža skele na objektu KTZ tijekom dana", "hr", "de") is None
+
+
+def test_prefix_changing_meaning_never_matches(tmp_path):
+    tm = _tm(tmp_path, min_similarity=0.5)
+    tm.add("hr", "de", "demontaža skele na objektu KTZ", "Gerüstabbau am Objekt KTZ")
+    assert tm.lookup("montaža skele na objektu KTZ", "hr", "de") is None
+    tm.add("hr", "de", "montaža skele na objektu KTZ", "Gerüstaufbau am Objekt KTZ")
+    assert tm.lookup("montaža skele na objektu KTZ", "hr", "de")[0] == "Gerüstaufbau am Objekt KTZ"
+    assert tm.lookup("demontaža skele na objektu KTZ", "hr", "de")[0] == "Gerüstabbau am Objekt KTZ"
+
+
+def test_fuzzy_accepts_single_typo_when_enabled(tmp_path):
+    tm = _tm(tmp_path, min_similarity=0.9)
+    tm.add("hr", "de", "demontaža skele na objektu KTZ", "Gerüstabbau am Objekt KTZ")
+    hit = tm.lookup("demontaža skele na objketu KTZ", "hr", "de")
+    assert hit is not None and hit[0] == "Gerüstabbau am Objekt KTZ" and hit[1] < 1.0
+    # szócsere / hiányzó szó nem elgépelés
+    assert tm.lookup("demontaža cijevi na objektu KTZ", "hr", "de") is None
+    assert tm.lookup("demontaža skele objektu KTZ", "hr", "de") is None
+
+
+def test_numbers_are_swapped(tmp_path):
+    tm = _tm(tmp_path)
+    tm.add("hr", "de", "montaža 3 cijevi", "Montage von 3 Rohren")
+    assert tm.lookup("montaža 5 cijevi", "hr", "de")[0] == "Montage von 5 Rohren"
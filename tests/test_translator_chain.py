@@ -0,0 +1,76 @@
+"""
+run_hedged csonk-végpontokkal: beragadó / egészséges / hibázó hívások, megszakító-állapotok.
+"""
+
+import asyncio
+
+import pytest
+
+from app.translator_chain import CLOSED, OPEN, CircuitBreaker, run_hedged
+
+
+async def _hang():
+    await asyncio.sleep(3600)
+
+
+async def _ok():
+    await asyncio.sleep(0.01)
+    return "ok"
+
+
+async def _fail():
+    raise RuntimeError("boom")
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_hung_first_backend_fails_over_without_hedging():
+    hung, healthy = CircuitBreaker("azure"), CircuitBreaker("lt_primary")
+
+    async def main():
+        out = []
+        for _ in range(3):
+            out.append(await run_hedged([(hung, _hang), (healthy, _ok)], hedge_after=0.0, deadline=0.5))
+        return out
+
+    results = _run(main())
+    assert [(text, br.name) for text, br, _ in results] == [("ok", "lt_primary")] * 3
+    assert healthy.state == CLOSED and healthy.failures == 0 and healthy.successes == 3
+    assert hung.state == OPEN and hung.failures == 3
+
+
+def test_deadline_cutoff_is_not_a_failure():
+    a, b = CircuitBreaker("a"), CircuitBreaker("b")
+
+    async def main():
+        return await run_hedged([(a, _hang), (b, _hang)], hedge_after=0.1, deadline=0.3)
+
+    with pytest.raises(RuntimeError, match="deadline exceeded"):
+        _run(main())
+    # mindkettő futott (fedezés), de csak a lánc határideje vágta el őket
+    assert a.failures == 0 and b.failures == 0 and a.state == CLOSED and b.state == CLOSED
+
+
+def test_error_moves_on_immediately_and_open_breaker_is_skipped():
+    bad, good, skipped = CircuitBreaker("bad"), CircuitBreaker("good"), CircuitBreaker("skipped", failure_threshold=1)
+    skipped.record_failure("down")
+
+    async def main():
+        return await run_hedged([(skipped, _ok), (bad, _fail), (good, _ok)], deadline=1.0)
+
+    text, br, errors = _run(main())
+    assert (text, br.name) == ("ok", "good")
+    assert errors[0] == "skipped: circuit open" and errors[1].startswith("bad: RuntimeError")
+    assert bad.failures == 1 and good.failures == 0
+
+
+def test_hedged_request_wins_with_faster_backend():
+    slow, fast = CircuitBreaker("slow"), CircuitBreaker("fast")
+
+    async def main():
+        return await run_hedged([(slow, _hang), (fast, _ok)], hedge_after=0.05, deadline=1.0)
+
+    text, br, _ = _run(main())
+    assert (text, br.name) == ("ok", "fast") and fast.state == CLOSED